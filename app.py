@@ -3,13 +3,33 @@
 Flask web application for DeFi Portfolio Tracker
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+import hmac
+import json
+import logging
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from defi_tracker import calculate_defi_score
+from defi_tracker import (P2_P3_SHARDING, PROTOCOLS, BitqueryClient, calculate_defi_score, score_deadline_from_env,
+                          score_landed_pillars)
+from batch import AdaptiveChunkSize, BatchSummary, score_wallets, score_wallets_chunked
+from cache import QueryCache, ScoreCache
+from checkpoints import CheckpointStore
+from concurrency import SingleFlight, flow_control_stats
+from jobs import JobQueue, JobQueueFull
+from leaderboard import LeaderboardStore
+from logging_config import configure_logging
+from recent import recent_store_from_env
+import metrics
 
 # Load environment variables
 load_dotenv()
+configure_logging()
+
+logger = logging.getLogger(__name__)
 
 # Application root path for subpath deployment
 # Can be overridden via SCRIPT_NAME environment variable
@@ -20,8 +40,56 @@ app = Flask(__name__)
 # Configure application root for subpath deployment
 app.config['APPLICATION_ROOT'] = APPLICATION_ROOT
 
-# In-memory storage for recent wallets (max 5)
-recent_wallets = []
+# Shared per-pillar result cache (in-process LRU + optional SQLite tier)
+score_cache = ScoreCache.from_env()
+
+# Shared per-query GraphQL response cache
+query_cache = QueryCache.from_env()
+
+# Per-wallet daily buckets for delta re-scoring (enabled by CHECKPOINT_DB)
+checkpoint_store = CheckpointStore.from_env()
+
+# Scoring engine: "threads" (ThreadPoolExecutor per request) or "async"
+# (one shared asyncio loop for all in-flight wallets, requires httpx)
+SCORING_ENGINE = os.environ.get('SCORING_ENGINE', 'threads').lower()
+
+# Long-lived Bitquery client holding pooled keep-alive connections
+bitquery_client = None
+async_engine = None
+bitquery_client_lock = threading.Lock()
+
+# Bulk scoring limits for /api/calculate/batch
+BATCH_MAX_ADDRESSES = int(os.environ.get('BATCH_MAX_ADDRESSES', '10000'))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '16'))
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', '50'))
+
+# Seconds between SSE keep-alive comments while no query has landed
+STREAM_KEEPALIVE = float(os.environ.get('STREAM_KEEPALIVE', '15'))
+
+# Streamed scores run on a bounded pool; requests beyond STREAM_MAX_CONCURRENCY get a 503
+STREAM_MAX_CONCURRENCY = int(os.environ.get('STREAM_MAX_CONCURRENCY', '8'))
+stream_executor = ThreadPoolExecutor(max_workers=STREAM_MAX_CONCURRENCY, thread_name_prefix='score-stream')
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_CONCURRENCY)
+
+# Overall budget (seconds) for one wallet; families still running are reported as partial.
+# Defaults to just above the slowest family deadline
+SCORE_DEADLINE = score_deadline_from_env()
+
+# Shared secret for /api/admin/* endpoints (X-Admin-Token header); unset disables them
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Concurrent scores of the same wallet share one computation
+score_flight = SingleFlight()
+
+# Every complete score, indexed for the leaderboard and percentiles
+# (LEADERBOARD_DB shares it between workers; otherwise in-memory per process)
+leaderboard = LeaderboardStore.from_env() or LeaderboardStore()
+
+# Largest page served by /api/leaderboard
+LEADERBOARD_MAX_LIMIT = int(os.environ.get('LEADERBOARD_MAX_LIMIT', '100'))
+
+# Most recently scored wallets (in-process, or shared via RECENT_WALLETS_DB)
+recent_store = recent_store_from_env()
 
 
 def get_base_path():
@@ -42,6 +110,116 @@ def get_base_path():
     return APPLICATION_ROOT
 
 
+def get_bitquery_client(api_key):
+    """Return the shared Bitquery client, creating it on first use."""
+    global bitquery_client
+    with bitquery_client_lock:
+        if bitquery_client is None or bitquery_client.api_key != api_key:
+            if bitquery_client is not None:
+                bitquery_client.close()
+            bitquery_client = BitqueryClient.from_env(api_key, query_cache=query_cache)
+        return bitquery_client
+
+
+def get_async_engine(api_key):
+    """Return the shared async scoring engine, creating it on first use."""
+    global async_engine
+    from async_tracker import AsyncScoringEngine
+    with bitquery_client_lock:
+        if async_engine is None or async_engine.api_key != api_key:
+            if async_engine is not None:
+                async_engine.close()
+            async_engine = AsyncScoringEngine(api_key, cache=score_cache, query_cache=query_cache,
+                                               checkpoints=checkpoint_store)
+        return async_engine
+
+
+def score_wallet(address, api_key, verbose=False, on_result=None, detail=None):
+    """Calculate a wallet score, joining an in-flight computation for the same wallet.
+
+    on_result(family, result, failed) receives every query family of the
+    computation, including the families that landed before this caller joined.
+    """
+    # Bounded and exact scores of the same wallet are different computations
+    key = address.lower() if detail is None else (address.lower(), detail)
+    return score_flight.do_with_events(
+        key, lambda publish: _compute_score(address, api_key, verbose, publish, detail), on_result
+    )
+
+
+def _compute_score(address, api_key, verbose, on_result=None, detail=None):
+    """Calculate a wallet score with the configured engine and shared caches."""
+    metrics.SCORES_IN_FLIGHT.inc(engine=SCORING_ENGINE)
+    start_time = time.time()
+    try:
+        if SCORING_ENGINE == 'async':
+            result = get_async_engine(api_key).score(address, verbose=verbose, deadline=SCORE_DEADLINE,
+                                                     on_result=on_result, detail=detail)
+        else:
+            result = calculate_defi_score(address, api_key, verbose=verbose, cache=score_cache,
+                                          client=get_bitquery_client(api_key), deadline=SCORE_DEADLINE,
+                                          on_result=on_result, checkpoints=checkpoint_store, detail=detail)
+    finally:
+        metrics.SCORES_IN_FLIGHT.dec(engine=SCORING_ENGINE)
+    metrics.SCORE_DURATION.observe(time.time() - start_time, engine=SCORING_ENGINE)
+    if result.get('partial'):
+        metrics.SCORE_PARTIAL.inc(engine=SCORING_ENGINE)
+    leaderboard.record(result)
+    return result
+
+
+def collect_runtime_metrics():
+    """Scrape-time metrics read from the caches and flow controls."""
+    caches = {'score': score_cache.stats(), 'query': query_cache.stats()}
+    yield ('defi_cache_hit_ratio', 'gauge', 'Cache hit ratio since start',
+           [('defi_cache_hit_ratio', {'cache': name}, stats['hit_ratio']) for name, stats in caches.items()])
+    yield ('defi_cache_lookups_total', 'counter', 'Cache lookups by result', [
+        ('defi_cache_lookups_total', {'cache': 'score', 'result': 'hit'}, caches['score']['hits']),
+        ('defi_cache_lookups_total', {'cache': 'score', 'result': 'disk_hit'}, caches['score']['disk_hits']),
+        ('defi_cache_lookups_total', {'cache': 'score', 'result': 'miss'}, caches['score']['misses']),
+        ('defi_cache_lookups_total', {'cache': 'query', 'result': 'hit'}, caches['query']['hits']),
+        ('defi_cache_lookups_total', {'cache': 'query', 'result': 'stale_hit'}, caches['query']['stale_hits']),
+        ('defi_cache_lookups_total', {'cache': 'query', 'result': 'miss'}, caches['query']['misses']),
+    ])
+    flows = flow_control_stats()
+    yield ('bitquery_concurrency_limit', 'gauge', 'Current AIMD concurrency limit per endpoint',
+           [('bitquery_concurrency_limit', {'endpoint': label}, stats['governor']['limit'])
+            for label, stats in flows.items()])
+    yield ('bitquery_rate_limit_wait_seconds_total', 'counter', 'Time spent waiting on the rate limiter',
+           [('bitquery_rate_limit_wait_seconds_total', {'endpoint': label}, stats['rate_limiter']['waited_seconds'])
+            for label, stats in flows.items()])
+
+
+metrics.REGISTRY.register_collector(collect_runtime_metrics)
+
+
+def remember_wallet(result):
+    """Put a scored wallet at the front of the recent wallets list."""
+    recent_store.add({
+        'address': result['address'],
+        'p1': result['p1']['score'],
+        'p1_tx_count': result['p1'].get('tx_count'),
+        'p2': result['p2']['score'],
+        'p2_unique_types': result['p2'].get('unique_types'),
+        'p3': result['p3']['score'],
+        'p3_unique_protocols': result['p3'].get('unique_protocols'),
+        'p4': result['p4']['score'],
+        'p4_unique_assets': result['p4'].get('unique_assets'),
+        'final_score': result['final_score_rounded']
+    })
+
+
+def run_score_job(address, on_result, detail=None):
+    """Score a wallet for the background job queue."""
+    result = score_wallet(address, os.getenv('BITQUERY_API_KEY'), on_result=on_result, detail=detail)
+    remember_wallet(result)
+    return result
+
+
+# Background jobs for POST /api/calculate?mode=job
+job_queue = JobQueue.from_env(run_score_job)
+
+
 # ============================================================================
 # ROUTES - Dual registration for subpath deployment
 # ============================================================================
@@ -74,37 +252,28 @@ def calculate():
         if not api_key:
             return jsonify({'error': 'API key not configured'}), 500
         
-        # Calculate score with debug output
-        print(f"\n{'='*80}")
-        print(f"DEBUG: Calculating DeFi Score for {address}")
-        print(f"{'='*80}")
-        result = calculate_defi_score(address, api_key, verbose=True)
-        
-        # Create new wallet entry
-        new_wallet = {
-            'address': result['address'],
-            'p1': result['p1']['score'],
-            'p1_tx_count': result['p1'].get('tx_count'),
-            'p2': result['p2']['score'],
-            'p2_unique_types': result['p2'].get('unique_types'),
-            'p3': result['p3']['score'],
-            'p3_unique_protocols': result['p3'].get('unique_protocols'),
-            'p4': result['p4']['score'],
-            'p4_unique_assets': result['p4'].get('unique_assets'),
-            'final_score': result['final_score_rounded']
-        }
-        
-        # Update module-level recent_wallets list
-        global recent_wallets
+        # Optional "detail": true forces exact counts, false bounded queries (default: SATURATION_QUERIES)
+        detail = data.get('detail')
+        if detail is None and request.args.get('detail') is not None:
+            detail = request.args.get('detail').lower() in ('1', 'true', 'yes')
+        detail = None if detail is None else bool(detail)
         
-        # Remove any existing entry with the same address to avoid duplicates
-        recent_wallets = [w for w in recent_wallets if w['address'].lower() != address.lower()]
+        # Job mode: queue the score and return immediately for polling
+        if request.args.get('mode') == 'job' or data.get('mode') == 'job':
+            try:
+                job = job_queue.submit(address, detail)
+            except JobQueueFull as e:
+                return jsonify({'error': str(e)}), 503
+            job['status_url'] = f"{get_base_path()}/api/jobs/{job['job_id']}"
+            return jsonify({
+                'success': True,
+                'data': job
+            }), 202
         
-        # Add new entry to the front
-        recent_wallets.insert(0, new_wallet)
-        
-        # Keep only the most recent 5
-        recent_wallets = recent_wallets[:5]
+        # Calculate score; the per-pillar breakdown is logged at DEBUG
+        logger.info("Calculating DeFi Score for %s", address)
+        result = score_wallet(address, api_key, detail=detail)
+        remember_wallet(result)
         
         return jsonify({
             'success': True,
@@ -112,28 +281,315 @@ def calculate():
         })
     
     except Exception as e:
-        import traceback
         error_msg = str(e)
-        print(f"ERROR in calculate endpoint: {error_msg}")
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Error in calculate endpoint: %s", error_msg)
         return jsonify({'error': error_msg}), 500
 
 
+@app.route(f'{APPLICATION_ROOT}/api/calculate/batch', methods=['POST'])
+@app.route('/api/calculate/batch', methods=['POST'])
+def calculate_batch():
+    """API endpoint to score many wallets, streamed as NDJSON as each one finishes"""
+    data = request.get_json(silent=True) or {}
+    addresses = data.get('addresses')
+    if not isinstance(addresses, list) or not addresses:
+        return jsonify({'error': 'addresses must be a non-empty list'}), 400
+    if len(addresses) > BATCH_MAX_ADDRESSES:
+        return jsonify({'error': f'At most {BATCH_MAX_ADDRESSES} addresses per batch'}), 400
+    
+    api_key = os.getenv('BITQUERY_API_KEY')
+    if not api_key:
+        return jsonify({'error': 'API key not configured'}), 500
+    
+    try:
+        concurrency = int(data.get('concurrency', 8))
+        chunk_size = int(data.get('chunk_size', BATCH_CHUNK_SIZE))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency and chunk_size must be integers'}), 400
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    
+    # Resume support: callers pass the addresses they already have results for
+    skip = {str(a).strip().lower() for a in data.get('skip', [])}
+    pending = []
+    seen = set()
+    for address in addresses:
+        address = str(address).strip()
+        if address.lower() in skip or address.lower() in seen:
+            continue
+        seen.add(address.lower())
+        pending.append(address)
+    summary = BatchSummary(total=len(addresses), skipped=len(addresses) - len(pending))
+    
+    def generate():
+        if chunk_size > 1:
+            # Multi-address queries: one GraphQL call per family per chunk
+            records = score_wallets_chunked(pending, get_bitquery_client(api_key), score_cache,
+                                            concurrency, AdaptiveChunkSize(initial=chunk_size), summary)
+        else:
+            records = score_wallets(pending, lambda a: score_wallet(a, api_key),
+                                    concurrency, summary)
+        for record in records:
+            if chunk_size > 1 and 'error' not in record:
+                leaderboard.record(record)
+            yield json.dumps(record) + '\n'
+        yield json.dumps({'summary': summary.to_dict()}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route(f'{APPLICATION_ROOT}/api/calculate/stream', methods=['GET'])
+@app.route('/api/calculate/stream', methods=['GET'])
+def calculate_stream():
+    """API endpoint streaming Server-Sent Events as each query family lands, then the final score"""
+    address = request.args.get('address', '').strip()
+    
+    if not address:
+        return jsonify({'error': 'Address is required'}), 400
+    
+    if not address.startswith('0x') or len(address) != 42:
+        return jsonify({'error': 'Invalid Ethereum address format'}), 400
+    
+    api_key = os.getenv('BITQUERY_API_KEY')
+    if not api_key:
+        return jsonify({'error': 'API key not configured'}), 500
+    
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many streamed scores in progress, try again later'}), 503
+    
+    events = queue.Queue()
+    landed = {}
+    failed_queries = []
+    
+    def on_result(name, result, failed):
+        landed[name] = result
+        if failed:
+            failed_queries.append(name)
+        events.put(('query', {
+            'family': name,
+            'failed': failed,
+            'pillars': score_landed_pillars(address, landed, failed_queries)
+        }))
+    
+    def run():
+        try:
+            result = score_wallet(address, api_key, on_result=on_result)
+            remember_wallet(result)
+            events.put(('result', result))
+        except Exception as e:
+            events.put(('error', {'error': str(e)}))
+        finally:
+            stream_slots.release()
+    
+    stream_executor.submit(run)
+    
+    def generate():
+        while True:
+            try:
+                event, payload = events.get(timeout=STREAM_KEEPALIVE)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+            if event != 'query':
+                break
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route(f'{APPLICATION_ROOT}/api/jobs/<job_id>', methods=['GET'])
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """API endpoint to poll a background score job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify({
+        'success': True,
+        'data': job
+    })
+
+
+@app.route(f'{APPLICATION_ROOT}/api/protocols', methods=['GET'])
+@app.route('/api/protocols', methods=['GET'])
+def get_protocols():
+    """API endpoint to get the active protocol registry version and size"""
+    return jsonify({
+        'success': True,
+        'data': PROTOCOLS.stats()
+    })
+
+
+@app.route(f'{APPLICATION_ROOT}/api/admin/protocols/reload', methods=['POST'])
+@app.route('/api/admin/protocols/reload', methods=['POST'])
+def reload_protocols():
+    """API endpoint to re-read the protocol registry file now"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled (ADMIN_TOKEN is not set)'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    try:
+        changed, registry = PROTOCOLS.reload()
+    except Exception as e:
+        return jsonify({'error': f'Failed to load protocol registry: {e}'}), 400
+    return jsonify({
+        'success': True,
+        'data': dict(PROTOCOLS.stats(), changed=changed)
+    })
+
+
 @app.route(f'{APPLICATION_ROOT}/api/recent', methods=['GET'])
 @app.route('/api/recent', methods=['GET'])
 def get_recent():
     """API endpoint to get recent wallet results"""
     return jsonify({
         'success': True,
-        'data': list(recent_wallets)
+        'data': recent_store.snapshot()
+    })
+
+
+@app.route(f'{APPLICATION_ROOT}/api/leaderboard', methods=['GET'])
+@app.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """API endpoint to get a page of the highest-scoring wallets"""
+    try:
+        limit = int(request.args.get('limit', 20))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({'error': 'limit must be positive and offset non-negative'}), 400
+    return jsonify({
+        'success': True,
+        'data': leaderboard.leaderboard(min(limit, LEADERBOARD_MAX_LIMIT), offset)
+    })
+
+
+@app.route(f'{APPLICATION_ROOT}/api/percentile/<address>', methods=['GET'])
+@app.route('/api/percentile/<address>', methods=['GET'])
+def get_percentile(address):
+    """API endpoint to get a scored wallet's rank and percentile"""
+    address = address.strip()
+    if not address.startswith('0x') or len(address) != 42:
+        return jsonify({'error': 'Invalid Ethereum address format'}), 400
+    data = leaderboard.percentile(address)
+    if data is None:
+        return jsonify({'error': 'Wallet has not been scored yet'}), 404
+    return jsonify({
+        'success': True,
+        'data': data
+    })
+
+
+@app.route(f'{APPLICATION_ROOT}/api/distribution', methods=['GET'])
+@app.route('/api/distribution', methods=['GET'])
+def get_distribution():
+    """API endpoint to get final score and per-pillar score histograms"""
+    return jsonify({
+        'success': True,
+        'data': dict(leaderboard.histograms(), wallets=leaderboard.stats()['wallets'])
     })
 
 
+@app.route(f'{APPLICATION_ROOT}/api/cache/stats', methods=['GET'])
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """API endpoint to get score and query cache hit/miss counters"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'score_cache': score_cache.stats(),
+            'query_cache': query_cache.stats(),
+            'checkpoints': checkpoint_store.stats() if checkpoint_store is not None else None
+        }
+    })
+
+
+@app.route(f'{APPLICATION_ROOT}/metrics', methods=['GET'])
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route(f'{APPLICATION_ROOT}/api/flow/stats', methods=['GET'])
+@app.route('/api/flow/stats', methods=['GET'])
+def get_flow_stats():
+    """API endpoint to get rate limiter, concurrency governor and retry stats"""
+    data = flow_control_stats()
+    data['score_coalescing'] = score_flight.stats()
+    data['jobs'] = job_queue.stats()
+    data['p2_p3_sharding'] = P2_P3_SHARDING.stats() if P2_P3_SHARDING is not None else None
+    if bitquery_client is not None:
+        data['client'] = bitquery_client.stats()
+    if async_engine is not None:
+        data['async_client'] = async_engine.client.stats()
+    return jsonify({
+        'success': True,
+        'data': data
+    })
+
+
+# ============================================================================
+# PROCESS LIFECYCLE - used by wsgi.py and gunicorn.conf.py
+# ============================================================================
+
+def create_app():
+    """WSGI application factory; warms shared read-only state before workers fork
+
+    With gunicorn's preload_app, the protocol registry and the compiled page
+    template are loaded once in the master and inherited by every worker.
+    """
+    PROTOCOLS.current()
+    app.jinja_env.get_template('index.html')
+    return app
+
+
+def reinit_after_fork():
+    """Give a forked worker its own SQLite connections, HTTP pools and job threads
+
+    Everything created at import in a preloading master is replaced, since
+    sockets, SQLite handles and thread pools must not be shared across
+    processes. The Bitquery client and async engine are rebuilt on first use.
+    """
+    global score_cache, query_cache, checkpoint_store, leaderboard, recent_store, bitquery_client, async_engine, job_queue
+    score_cache = ScoreCache.from_env()
+    query_cache = QueryCache.from_env()
+    checkpoint_store = CheckpointStore.from_env()
+    leaderboard = LeaderboardStore.from_env() or LeaderboardStore()
+    recent_store = recent_store_from_env()
+    bitquery_client = None
+    async_engine = None
+    job_queue = JobQueue.from_env(run_score_job)
+
+
+def shutdown():
+    """Drain in-flight background jobs, then close the HTTP pools and SQLite stores
+
+    Queued jobs that have not started are dropped; requests still being
+    served are drained by the WSGI server before this runs.
+    """
+    logger.info("Shutting down: draining %d running jobs", job_queue.stats()['running'])
+    job_queue.shutdown(wait=True, cancel_pending=True)
+    with bitquery_client_lock:
+        if bitquery_client is not None:
+            bitquery_client.close()
+        if async_engine is not None:
+            async_engine.close()
+    if checkpoint_store is not None:
+        checkpoint_store.close()
+    leaderboard.close()
+    recent_store.close()
+
+
 if __name__ == '__main__':
+    # Development server only; use gunicorn with gunicorn.conf.py in production
+    port = int(os.environ.get('PORT', '5001'))
     print(f"\n{'='*60}")
     print(f"Ethereum Wallet DeFi Score")
     print(f"APPLICATION_ROOT: {APPLICATION_ROOT}")
-    print(f"Access at: http://localhost:5001/")
-    print(f"      or: http://localhost:5001{APPLICATION_ROOT}/")
+    print(f"Access at: http://localhost:{port}/")
+    print(f"      or: http://localhost:{port}{APPLICATION_ROOT}/")
     print(f"{'='*60}\n")
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1').lower() in ('1', 'true', 'yes'), host='0.0.0.0', port=port)
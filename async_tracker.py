@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+Async scoring engine - asyncio variant of the DeFi Strategy Score calculation
+
+All GraphQL calls for a wallet (including the ERC-20 and NFT halves of P4)
+are fanned out concurrently on a single event loop, so many wallets can be
+scored at once without one OS thread per in-flight HTTP call.
+Requires httpx (pip install httpx).
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Set, Tuple
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from cache import QueryCache, ScoreCache
+from checkpoints import CHECKPOINT_FAMILIES, CheckpointStore
+from protocols import ProtocolRegistry
+from concurrency import LatencyTracker, RetryPolicy, flow_control_for
+import metrics
+from defi_tracker import (
+    BITQUERY_ENDPOINT_V1,
+    BITQUERY_ENDPOINT_V2,
+    DEFAULT_QUERY_DEADLINE,
+    DEFAULT_QUERY_DEADLINES,
+    DEX_NFT_QUERY,
+    GOVERNANCE_EXISTS_QUERY,
+    GOVERNANCE_QUERY,
+    GOVERNANCE_QUERY_MODE,
+    MULTI_QUERY_ROW_LIMIT,
+    P2_P3_QUERY,
+    P2_P3_SHARDING,
+    PROTOCOLS,
+    QUERY_FAMILIES,
+    SAMPLE_WALLET_ADDRESS,
+    SAMPLE_WALLET_RESPONSE,
+    BitqueryGraphQLError,
+    BitqueryThrottledError,
+    BitqueryTimeoutError,
+    build_score_result,
+    checkpoint_version,
+    decode_query_result,
+    daily_query_request,
+    daily_response_truncated,
+    default_query_result,
+    encode_query_result,
+    endpoint_label,
+    get_time_3_years_ago,
+    merge_p2_p3_shards,
+    is_throttling_error,
+    is_timeout_error,
+    parse_daily_buckets,
+    parse_dex_nft_response,
+    parse_governance_response,
+    parse_p2_p3_response,
+    parse_p4_erc20_response,
+    parse_p4_nft_response,
+    p1_query_request,
+    p4_erc20_request,
+    p4_nft_request,
+    query_deadlines_from_env,
+    query_error_kind,
+    recorder_from_env,
+    registry_cache_version,
+    result_from_totals,
+    use_bounded_queries,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for a free concurrency-governor slot
+GOVERNOR_POLL_INTERVAL = 0.05
+
+
+class AsyncBitqueryClient:
+    """Asyncio client for the Bitquery GraphQL API backed by a pooled httpx.AsyncClient"""
+
+    def __init__(self, api_key: str, query_cache: Optional[QueryCache] = None,
+                 pool_size: int = 10, keep_alive: bool = True, http2: bool = False,
+                 deadlines: Optional[Dict[str, float]] = None,
+                 retry_policy: Optional[RetryPolicy] = None, hedge: bool = False,
+                 recorder=None):
+        if httpx is None:
+            raise Exception("The async scoring engine requires httpx (pip install httpx)")
+        self.api_key = api_key
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+        if not keep_alive:
+            self.headers["Connection"] = "close"
+        self.query_cache = query_cache
+        self.pool_size = pool_size
+        self.http2 = http2
+        self._http = None
+        self.deadlines = dict(DEFAULT_QUERY_DEADLINES)
+        if deadlines:
+            self.deadlines.update(deadlines)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self.recorder = recorder
+        self.retries = 0
+        self.hedges = 0
+        # Identical queries already in flight are awaited instead of re-sent
+        self._in_flight: Dict[Tuple, asyncio.Future] = {}
+        self.coalesced = 0
+
+    @classmethod
+    def from_env(cls, api_key: str, query_cache: Optional[QueryCache] = None) -> "AsyncBitqueryClient":
+        """Build a client from BITQUERY_* environment variables"""
+        return cls(
+            api_key,
+            query_cache=query_cache,
+            pool_size=int(os.getenv("BITQUERY_POOL_SIZE", "10")),
+            keep_alive=os.getenv("BITQUERY_KEEPALIVE", "1").lower() not in ("0", "false", "no"),
+            http2=os.getenv("BITQUERY_HTTP2", "").lower() in ("1", "true", "yes"),
+            deadlines=query_deadlines_from_env(),
+            retry_policy=RetryPolicy.from_env(),
+            hedge=os.getenv("BITQUERY_HEDGE", "").lower() in ("1", "true", "yes"),
+            recorder=recorder_from_env(),
+        )
+
+    def _http_client(self):
+        # Created lazily so it binds to the loop that first uses it
+        if self._http is None:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            self._http = httpx.AsyncClient(http2=self.http2, limits=limits)
+        return self._http
+
+    async def execute_query(self, query: str, variables: Optional[Dict] = None, endpoint: Optional[str] = None,
+                            family: Optional[str] = None) -> Tuple[Dict, float]:
+        """Execute a GraphQL query and return result with timing"""
+        endpoint = endpoint or BITQUERY_ENDPOINT_V2
+        key = QueryCache.make_key(endpoint, query, variables)
+
+        if self.query_cache is None:
+            return await self._coalesced_fetch(key, query, variables, endpoint, family)
+
+        cached, state = self.query_cache.lookup(key, family)
+        if state == QueryCache.STALE and self.query_cache.begin_refresh(key):
+            asyncio.ensure_future(self._refresh(key, query, variables, endpoint, family))
+        if cached is not None:
+            return cached, 0.0
+
+        return await self._coalesced_fetch(key, query, variables, endpoint, family)
+
+    async def _coalesced_fetch(self, key: Tuple, query: str, variables: Optional[Dict], endpoint: str,
+                               family: Optional[str]) -> Tuple[Dict, float]:
+        """Fetch and cache a query, sharing one request between concurrent identical calls"""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, query, variables, endpoint, family))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller giving up does not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: Tuple, query: str, variables: Optional[Dict], endpoint: str,
+                               family: Optional[str]) -> Tuple[Dict, float]:
+        data, elapsed_time = await self._fetch(query, variables, endpoint, family)
+        if self.query_cache is not None:
+            self.query_cache.store(key, data)
+        return data, elapsed_time
+
+    async def _refresh(self, key: Tuple, query: str, variables: Optional[Dict], endpoint: str,
+                       family: Optional[str]):
+        try:
+            await self._coalesced_fetch(key, query, variables, endpoint, family)
+        except Exception:
+            # Keep serving the stale entry; the next lookup will retry
+            pass
+        finally:
+            self.query_cache.end_refresh(key)
+
+    async def _fetch(self, query: str, variables: Optional[Dict], endpoint: str,
+                     family: Optional[str]) -> Tuple[Dict, float]:
+        """Run a query within its family deadline, retrying throttling failures"""
+        deadline = time.monotonic() + self.deadlines.get(family, DEFAULT_QUERY_DEADLINE)
+        labels = {"family": metrics.family_label(family), "endpoint": endpoint_label(endpoint)}
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise BitqueryTimeoutError(f"API request failed: {family or 'query'} deadline exceeded")
+                data, elapsed_time = await self._attempt(query, variables, endpoint, family, remaining)
+            except BitqueryThrottledError as e:
+                delay = self.retry_policy.delay(attempt)
+                if (remaining <= 0 or attempt >= self.retry_policy.max_retries
+                        or time.monotonic() + delay >= deadline):
+                    metrics.QUERY_ERRORS.inc(kind=query_error_kind(e), **labels)
+                    raise
+                attempt += 1
+                self.retries += 1
+                metrics.QUERY_RETRIES.inc(**labels)
+                await asyncio.sleep(delay)
+                continue
+            except Exception as e:
+                metrics.QUERY_ERRORS.inc(kind=query_error_kind(e), **labels)
+                raise
+            self.latency.record(family, elapsed_time)
+            metrics.QUERY_DURATION.observe(elapsed_time, **labels)
+            if self.recorder is not None:
+                self.recorder.record(labels["endpoint"], query, variables, family, data, elapsed_time)
+            return data, elapsed_time
+
+    async def _attempt(self, query: str, variables: Optional[Dict], endpoint: str,
+                       family: Optional[str], timeout: float) -> Tuple[Dict, float]:
+        """One attempt, hedged with a duplicate request once it outlives the p95 latency"""
+        hedge_after = self.latency.percentile(family) if self.hedge else None
+        if hedge_after is None or hedge_after >= timeout:
+            return await self._post_query(query, variables, endpoint, timeout)
+
+        primary = asyncio.ensure_future(self._post_query(query, variables, endpoint, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        metrics.QUERY_HEDGES.inc(family=metrics.family_label(family), endpoint=endpoint_label(endpoint))
+        backup = asyncio.ensure_future(self._post_query(query, variables, endpoint, timeout - hedge_after))
+        pending = {primary, backup}
+        errors = []
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                errors.append(task.exception())
+        raise errors[0]
+
+    async def _post_query(self, query: str, variables: Optional[Dict], endpoint: str,
+                          timeout: float = DEFAULT_QUERY_DEADLINE) -> Tuple[Dict, float]:
+        """Send a GraphQL query to Bitquery, bypassing the query cache"""
+        payload = {
+            "query": query,
+            "variables": variables or {}
+        }
+
+        # Same process-wide limiter and governor as the sync client, without blocking the loop
+        label = endpoint_label(endpoint)
+        flow = flow_control_for(label)
+        wait = flow.bucket.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        slot_deadline = time.monotonic() + timeout
+        while not flow.governor.try_acquire():
+            if time.monotonic() >= slot_deadline:
+                raise BitqueryTimeoutError("API request failed: timed out waiting for a concurrency slot")
+            await asyncio.sleep(GOVERNOR_POLL_INTERVAL)
+        throttled = False
+
+        metrics.REQUESTS_IN_FLIGHT.inc(endpoint=label)
+        start_time = time.time()
+        try:
+            response = await self._http_client().post(
+                endpoint,
+                json=payload,
+                headers=self.headers,
+                timeout=timeout
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            elapsed_time = time.time() - start_time
+
+            if "errors" in data:
+                error_msg = str(data['errors'])
+                raise BitqueryGraphQLError(f"GraphQL errors: {error_msg}")
+
+            return data.get("data", {}), elapsed_time
+        except BitqueryGraphQLError:
+            raise
+        except httpx.HTTPError as e:
+            if is_throttling_error(e):
+                throttled = True
+                error_class = BitqueryTimeoutError if is_timeout_error(e) else BitqueryThrottledError
+                raise error_class(f"API request failed: {str(e)}")
+            raise Exception(f"API request failed: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Query execution failed: {str(e)}")
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec(endpoint=label)
+            flow.governor.release(throttled=throttled)
+
+    def stats(self) -> Dict:
+        """Return retry, hedge and coalescing counters"""
+        return {"retries": self.retries, "hedges": self.hedges, "hedging_enabled": self.hedge,
+                "coalesced": self.coalesced}
+
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+async def get_p1_transaction_count_async(client: AsyncBitqueryClient, address: str,
+                                         time_3yr_ago: str, bounded: bool = False) -> Tuple[int, float]:
+    """Async variant of get_p1_transaction_count"""
+    query, variables, parse = p1_query_request(address, time_3yr_ago, bounded)
+    data, elapsed_time = await client.execute_query(query, variables, endpoint=BITQUERY_ENDPOINT_V1, family="p1")
+    return parse(data), elapsed_time
+
+
+async def get_p2_p3_data_async(client: AsyncBitqueryClient, address: str, time_3yr_ago: str,
+                               registry: ProtocolRegistry) -> Tuple[Set[str], Set[str], float]:
+    """Async variant of get_p2_p3_data, including the sharded mode"""
+    if P2_P3_SHARDING is not None:
+        return await get_p2_p3_data_sharded_async(client, address, time_3yr_ago, registry)
+    variables = {"address": address, "protocols": list(registry.addresses), "time3yr_ago": time_3yr_ago}
+    data, elapsed_time = await client.execute_query(P2_P3_QUERY, variables, endpoint=BITQUERY_ENDPOINT_V1, family="p2_p3")
+    activity_types, interacted_protocols = parse_p2_p3_response(data, registry)
+    return activity_types, interacted_protocols, elapsed_time
+
+
+async def get_p2_p3_data_sharded_async(client: AsyncBitqueryClient, address: str, time_3yr_ago: str,
+                                       registry: ProtocolRegistry) -> Tuple[Set[str], Set[str], float]:
+    """Async variant of get_p2_p3_data_sharded"""
+    shards = P2_P3_SHARDING.shards(registry)
+    outcomes = await asyncio.gather(*(
+        client.execute_query(P2_P3_QUERY, {"address": address, "protocols": shard, "time3yr_ago": time_3yr_ago},
+                             endpoint=BITQUERY_ENDPOINT_V1, family="p2_p3")
+        for shard in shards
+    ), return_exceptions=True)
+    errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    slowest = max((outcome[1] for outcome in outcomes if not isinstance(outcome, BaseException)), default=0.0)
+    P2_P3_SHARDING.observe(slowest, failed=bool(errors))
+    if errors:
+        raise errors[0]
+    activity_types, interacted_protocols = merge_p2_p3_shards(
+        [parse_p2_p3_response(data, registry) for data, _ in outcomes]
+    )
+    return activity_types, interacted_protocols, slowest
+
+
+async def get_dex_and_nft_activity_async(client: AsyncBitqueryClient,
+                                         address: str) -> Tuple[int, int, Set[str], float]:
+    """Async variant of get_dex_and_nft_activity"""
+    variables = {"network": "eth", "trader": address}
+    data, elapsed_time = await client.execute_query(DEX_NFT_QUERY, variables, endpoint=BITQUERY_ENDPOINT_V2, family="dex_nft")
+    dex_count_fungible, dex_count_nonfungible, dex_protocols = parse_dex_nft_response(data)
+    return dex_count_fungible, dex_count_nonfungible, dex_protocols, elapsed_time
+
+
+async def get_governance_activity_async(client: AsyncBitqueryClient, address: str) -> Tuple[bool, float]:
+    """Async variant of get_governance_activity"""
+    query = GOVERNANCE_QUERY if GOVERNANCE_QUERY_MODE == "count" else GOVERNANCE_EXISTS_QUERY
+    data, elapsed_time = await client.execute_query(query, {"address": address}, endpoint=BITQUERY_ENDPOINT_V2,
+                                                    family="governance")
+    return parse_governance_response(data), elapsed_time
+
+
+async def get_p4_assets_async(client: AsyncBitqueryClient, address: str, bounded: bool = False) -> Tuple[int, float]:
+    """Async variant of get_p4_assets; the ERC-20 and NFT queries run concurrently
+
+    Running both at once means bounded mode cannot skip the NFT query, so
+    each is simply capped at P4_SATURATION rows.
+    """
+    erc20_query, erc20_variables = p4_erc20_request(address, bounded)
+    nft_query, nft_variables = p4_nft_request(address, bounded)
+    (erc20_data, erc20_time), (nft_data, nft_time) = await asyncio.gather(
+        client.execute_query(erc20_query, erc20_variables, endpoint=BITQUERY_ENDPOINT_V2, family="p4_erc20"),
+        client.execute_query(nft_query, nft_variables, endpoint=BITQUERY_ENDPOINT_V2, family="p4_nft"),
+    )
+    total_assets = len(parse_p4_erc20_response(erc20_data)) + parse_p4_nft_response(nft_data)
+    # Both queries overlap, so the wall time is the slower of the two
+    return total_assets, max(erc20_time, nft_time)
+
+
+async def get_checkpointed_result_async(client: AsyncBitqueryClient, checkpoints: CheckpointStore,
+                                        family: str, address: str, registry: ProtocolRegistry) -> Tuple:
+    """Async variant of get_checkpointed_result; SQLite work runs off the event loop"""
+    loop = asyncio.get_running_loop()
+    version = checkpoint_version(family, registry)
+    since, _ = await loop.run_in_executor(None, checkpoints.delta_since, address, family, version)
+    query, variables, endpoint = daily_query_request(family, address, since, registry)
+    data, elapsed_time = await client.execute_query(query, variables, endpoint=endpoint, family=family)
+    if daily_response_truncated(family, data):
+        # Merging would checkpoint the missing days as empty; the checkpoint is left as it was
+        logger.warning("%s daily query for %s hit the %d-row limit; using the full-range query",
+                       family, address, MULTI_QUERY_ROW_LIMIT, extra={"family": family, "address": address})
+        time_3yr_ago = get_time_3_years_ago()
+        if family == "p1":
+            return await get_p1_transaction_count_async(client, address, time_3yr_ago)
+        if family == "p2_p3":
+            return await get_p2_p3_data_async(client, address, time_3yr_ago, registry)
+        return await get_dex_and_nft_activity_async(client, address)
+    totals = await loop.run_in_executor(None, checkpoints.merge, address, family, since,
+                                        parse_daily_buckets(family, data), version)
+    return result_from_totals(family, totals, elapsed_time, registry)
+
+
+async def calculate_defi_score_async(address: str, api_key: str, verbose: bool = True,
+                                     cache: Optional[ScoreCache] = None,
+                                     client: Optional[AsyncBitqueryClient] = None,
+                                     deadline: Optional[float] = None,
+                                     on_result: Optional[Callable[[str, Tuple, bool], None]] = None,
+                                     checkpoints: Optional[CheckpointStore] = None,
+                                     detail: Optional[bool] = None) -> Dict:
+    """Async variant of calculate_defi_score"""
+    if address.lower() == SAMPLE_WALLET_ADDRESS.lower():
+        return SAMPLE_WALLET_RESPONSE.copy()
+
+    owns_client = client is None
+    if owns_client:
+        client = AsyncBitqueryClient(api_key)
+    time_3yr_ago = get_time_3_years_ago()
+    registry = PROTOCOLS.current()
+    bounded = use_bounded_queries(detail)
+    versions = {name: registry_cache_version(name, registry, bounded) for name in QUERY_FAMILIES}
+    overall_start = time.time()
+
+    # Reuse fresh pillar results from the cache; its SQLite tier runs off the event loop
+    results = {}
+    if cache is not None:
+        payloads = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: {name: cache.get(address, name, versions[name]) for name in QUERY_FAMILIES}
+        )
+        for name, payload in payloads.items():
+            if payload is not None:
+                results[name] = decode_query_result(name, payload)
+                if on_result is not None:
+                    on_result(name, results[name], False)
+
+    query_coroutines = {
+        "p1": lambda: get_p1_transaction_count_async(client, address, time_3yr_ago, bounded),
+        "p2_p3": lambda: get_p2_p3_data_async(client, address, time_3yr_ago, registry),
+        "dex_nft": lambda: get_dex_and_nft_activity_async(client, address),
+        "governance": lambda: get_governance_activity_async(client, address),
+        "p4": lambda: get_p4_assets_async(client, address, bounded),
+    }
+    if checkpoints is not None:
+        for name in CHECKPOINT_FAMILIES:
+            query_coroutines[name] = (lambda family: lambda: get_checkpointed_result_async(
+                client, checkpoints, family, address, registry))(name)
+    pending = [name for name in QUERY_FAMILIES if name not in results]
+    tasks = {name: asyncio.ensure_future(query_coroutines[name]()) for name in pending}
+    if cache is not None:
+        for name, task in tasks.items():
+            # Cache from a callback so queries finishing after the deadline still warm the cache
+            task.add_done_callback(_cache_task_result(cache, address, name, versions[name]))
+    reporter = _ResultReporter(on_result) if on_result is not None else None
+    if reporter is not None:
+        for name, task in tasks.items():
+            task.add_done_callback(reporter.task_callback(name))
+
+    failed_queries = []
+    try:
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=deadline)
+    finally:
+        if owns_client:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            await client.aclose()
+
+    for name, task in tasks.items():
+        if not task.done() or task.cancelled():
+            logger.warning("%s query for %s missed the deadline", name, address,
+                           extra={"family": name, "address": address})
+            results[name] = default_query_result(name)
+            failed_queries.append(name)
+        elif task.exception() is not None:
+            logger.warning("Error in %s query for %s: %s", name, address, task.exception(),
+                           extra={"family": name, "address": address})
+            results[name] = default_query_result(name)
+            failed_queries.append(name)
+        else:
+            results[name] = task.result()
+        if reporter is not None:
+            reporter.report(name, results[name], name in failed_queries)
+    if reporter is not None:
+        # Stragglers finishing after the deadline must not contradict what was reported
+        reporter.close()
+
+    return build_score_result(address, results, verbose, time.time() - overall_start, failed_queries, bounded)
+
+
+def _cache_task_result(cache: ScoreCache, address: str, name: str, version: Optional[str] = None):
+    """Task callback that stores a successful query result in the score cache, off the event loop"""
+    def callback(task):
+        if not task.cancelled() and task.exception() is None:
+            task.get_loop().run_in_executor(None, cache.set, address, name,
+                                            encode_query_result(name, task.result()), version)
+    return callback
+
+
+class _ResultReporter:
+    """Reports each query family to on_result exactly once, as its task lands, until closed
+
+    Failed tasks are reported with the family's default result as soon as
+    they fail. Once closed at the deadline, late task callbacks are ignored.
+    """
+
+    def __init__(self, on_result: Callable[[str, Tuple, bool], None]):
+        self.on_result = on_result
+        self.reported = set()
+        self.closed = False
+
+    def report(self, name: str, result: Tuple, failed: bool):
+        if self.closed or name in self.reported:
+            return
+        self.reported.add(name)
+        self.on_result(name, result, failed)
+
+    def task_callback(self, name: str):
+        def callback(task):
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                self.report(name, default_query_result(name), True)
+            else:
+                self.report(name, task.result(), False)
+        return callback
+
+    def close(self):
+        self.closed = True
+
+
+class AsyncScoringEngine:
+    """Runs calculate_defi_score_async on one long-lived event loop thread.
+
+    Synchronous callers (e.g. Flask worker threads) submit wallets with
+    score(); all in-flight GraphQL calls share the loop and the pooled client.
+    """
+
+    def __init__(self, api_key: str, cache: Optional[ScoreCache] = None,
+                 query_cache: Optional[QueryCache] = None, checkpoints: Optional[CheckpointStore] = None):
+        self.api_key = api_key
+        self.cache = cache
+        self.checkpoints = checkpoints
+        self.client = AsyncBitqueryClient.from_env(api_key, query_cache=query_cache)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-scoring", daemon=True)
+        self._thread.start()
+
+    def score(self, address: str, verbose: bool = True, deadline: Optional[float] = None,
+              on_result: Optional[Callable[[str, Tuple, bool], None]] = None,
+              detail: Optional[bool] = None) -> Dict:
+        """Score a wallet on the engine loop and block until the result is ready"""
+        future = asyncio.run_coroutine_threadsafe(
+            calculate_defi_score_async(address, self.api_key, verbose, cache=self.cache,
+                                       client=self.client, deadline=deadline, on_result=on_result,
+                                       checkpoints=self.checkpoints, detail=detail),
+            self.loop,
+        )
+        return future.result()
+
+    def close(self):
+        """Close the HTTP pool and stop the loop thread"""
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Bulk wallet scoring - bounded-concurrency scoring of address lists
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import defi_tracker as tracker
+
+
+def is_valid_address(address: str) -> bool:
+    """Basic Ethereum address format check"""
+    return address.startswith("0x") and len(address) == 42
+
+
+def read_addresses(path: str) -> List[str]:
+    """Read one address per line, skipping blanks, comments and duplicates"""
+    addresses = []
+    seen = set()
+    with open(path) as f:
+        for line in f:
+            address = line.strip()
+            if not address or address.startswith("#"):
+                continue
+            if address.lower() in seen:
+                continue
+            seen.add(address.lower())
+            addresses.append(address)
+    return addresses
+
+
+def load_completed(path: str) -> Set[str]:
+    """Return lowercased addresses already scored successfully in a JSONL output file"""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from a crash; that address is re-scored
+                continue
+            # Records with failed queries are incomplete and get re-scored
+            if record.get("address") and "error" not in record and not record.get("failed_queries"):
+                completed.add(record["address"].lower())
+    return completed
+
+
+class BatchSummary:
+    """Throughput counters for one batch run"""
+
+    def __init__(self, total: int = 0, skipped: int = 0):
+        self.total = total
+        self.skipped = skipped
+        self.scored = 0
+        self.failed = 0
+        self.started_at = time.time()
+
+    def record(self, ok: bool):
+        if ok:
+            self.scored += 1
+        else:
+            self.failed += 1
+
+    def to_dict(self) -> Dict:
+        elapsed = time.time() - self.started_at
+        processed = self.scored + self.failed
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "scored": self.scored,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "wallets_per_second": round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+        }
+
+
+def _score_one(score_fn: Callable[[str], Dict], address: str) -> Dict:
+    if not is_valid_address(address):
+        raise ValueError("Invalid Ethereum address format")
+    return score_fn(address)
+
+
+def score_wallets(addresses: Iterable[str], score_fn: Callable[[str], Dict],
+                  concurrency: int = 8, summary: Optional[BatchSummary] = None) -> Iterator[Dict]:
+    """Score addresses with at most `concurrency` in flight, yielding records as they finish.
+
+    Successful records are the score result dict; failures are
+    {"address": ..., "error": ...}. Addresses are pulled lazily, so very
+    long inputs never queue more than `concurrency` futures.
+    """
+    addresses = iter(addresses)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = {}
+
+        def submit_next():
+            for address in addresses:
+                in_flight[executor.submit(_score_one, score_fn, address)] = address
+                return
+
+        for _ in range(concurrency):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                address = in_flight.pop(future)
+                try:
+                    record = future.result()
+                    ok = True
+                except Exception as e:
+                    record = {"address": address, "error": str(e)}
+                    ok = False
+                if summary is not None:
+                    summary.record(ok)
+                yield record
+                submit_next()
+
+
+class AdaptiveChunkSize:
+    """Chunk size for multi-address queries: halves on failure, grows slowly on success"""
+
+    def __init__(self, initial: int = 50, minimum: int = 1, maximum: int = 200):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = max(minimum, min(initial, maximum))
+        self._lock = threading.Lock()
+
+    def shrink(self):
+        with self._lock:
+            self.size = max(self.minimum, self.size // 2)
+
+    def grow(self):
+        with self._lock:
+            self.size = min(self.maximum, self.size + max(1, self.size // 10))
+
+
+def is_chunk_size_error(error: Exception) -> bool:
+    """True for failures a smaller chunk can avoid: truncated responses, timeouts and throttling"""
+    return isinstance(error, (tracker.RowLimitError, tracker.BitqueryThrottledError))
+
+
+def _fetch_family(fetch: Callable[[List[str]], Dict], addresses: List[str],
+                  chunk_size: AdaptiveChunkSize) -> Tuple[Dict, Dict[str, str]]:
+    """Run a multi-address fetcher, splitting the chunk in half when it is too big.
+
+    Returns (results keyed by lowercased address, errors keyed by address).
+    Truncated, timed-out and throttled chunks are split until single wallets
+    fail; any other error (auth, GraphQL validation, ...) fails the whole
+    chunk at once, as smaller chunks would fail the same way.
+    """
+    try:
+        results = fetch(addresses)
+        chunk_size.grow()
+        return results, {}
+    except Exception as e:
+        if len(addresses) == 1 or not is_chunk_size_error(e):
+            return {}, {address.lower(): str(e) for address in addresses}
+        # Timeouts and oversized responses: retry the halves and shrink future chunks
+        chunk_size.shrink()
+        middle = len(addresses) // 2
+        left, left_errors = _fetch_family(fetch, addresses[:middle], chunk_size)
+        right, right_errors = _fetch_family(fetch, addresses[middle:], chunk_size)
+        left.update(right)
+        left_errors.update(right_errors)
+        return left, left_errors
+
+
+def score_wallet_chunk(addresses: List[str], client, cache=None,
+                       chunk_size: Optional[AdaptiveChunkSize] = None) -> List[Dict]:
+    """Score a chunk of wallets with one multi-address query per query family.
+
+    Fresh cached pillars are reused per wallet; only wallets missing a family
+    are included in that family's query.
+    """
+    chunk_size = chunk_size or AdaptiveChunkSize(initial=len(addresses))
+    time_3yr_ago = tracker.get_time_3_years_ago()
+    registry = tracker.PROTOCOLS.current()
+    versions = {name: tracker.registry_cache_version(name, registry) for name in tracker.QUERY_FAMILIES}
+    fetchers = {
+        "p1": lambda chunk: tracker.get_p1_transaction_counts(client, chunk, time_3yr_ago),
+        "p2_p3": lambda chunk: tracker.get_p2_p3_data_multi(client, chunk, time_3yr_ago, registry),
+        "dex_nft": lambda chunk: tracker.get_dex_and_nft_activity_multi(client, chunk),
+        "governance": lambda chunk: tracker.get_governance_activity_multi(client, chunk),
+        "p4": lambda chunk: tracker.get_p4_assets_multi(client, chunk),
+    }
+
+    sample = tracker.SAMPLE_WALLET_ADDRESS.lower()
+    wallets = [a for a in addresses if a.lower() != sample]
+    results = {a.lower(): {} for a in wallets}
+    if cache is not None:
+        for address in wallets:
+            for name in tracker.QUERY_FAMILIES:
+                payload = cache.get(address, name, versions[name])
+                if payload is not None:
+                    results[address.lower()][name] = tracker.decode_query_result(name, payload)
+
+    def run_family(name: str):
+        needed = [a for a in wallets if name not in results[a.lower()]]
+        if not needed:
+            return name, {}, {}
+        fetched, errors = _fetch_family(fetchers[name], needed, chunk_size)
+        return name, fetched, errors
+
+    with ThreadPoolExecutor(max_workers=len(fetchers)) as executor:
+        outcomes = list(executor.map(run_family, fetchers))
+
+    failed = {a.lower(): [] for a in wallets}
+    for name, fetched, errors in outcomes:
+        for address in wallets:
+            key = address.lower()
+            if name in results[key]:
+                continue
+            if key in fetched:
+                results[key][name] = fetched[key]
+                if cache is not None:
+                    cache.set(address, name, tracker.encode_query_result(name, fetched[key]), versions[name])
+            else:
+                # Failed queries fall back to defaults and are never cached
+                results[key][name] = tracker.default_query_result(name)
+                failed[key].append(name)
+
+    records = []
+    for address in addresses:
+        if address.lower() == sample:
+            records.append(tracker.SAMPLE_WALLET_RESPONSE.copy())
+        else:
+            records.append(tracker.build_score_result(address, results[address.lower()], verbose=False,
+                                                      failed_queries=failed[address.lower()]))
+    return records
+
+
+def score_wallets_chunked(addresses: Iterable[str], client, cache=None, concurrency: int = 4,
+                          chunk_size: Optional[AdaptiveChunkSize] = None,
+                          summary: Optional[BatchSummary] = None) -> Iterator[Dict]:
+    """Like score_wallets, but batches wallets into multi-address GraphQL queries.
+
+    Up to `concurrency` chunks are in flight; each chunk costs one query per
+    family instead of one per wallet. Records are yielded per finished chunk.
+    """
+    chunk_size = chunk_size or AdaptiveChunkSize()
+    addresses = iter(addresses)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = {}
+        invalid = []
+
+        def submit_next():
+            chunk = []
+            for address in addresses:
+                if not is_valid_address(address):
+                    if summary is not None:
+                        summary.record(False)
+                    invalid.append({"address": address, "error": "Invalid Ethereum address format"})
+                    continue
+                chunk.append(address)
+                if len(chunk) >= chunk_size.size:
+                    break
+            if chunk:
+                in_flight[executor.submit(score_wallet_chunk, chunk, client, cache, chunk_size)] = chunk
+
+        for _ in range(concurrency):
+            submit_next()
+
+        while in_flight or invalid:
+            while invalid:
+                yield invalid.pop(0)
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = in_flight.pop(future)
+                try:
+                    records = future.result()
+                except Exception as e:
+                    records = [{"address": address, "error": str(e)} for address in chunk]
+                for record in records:
+                    if summary is not None:
+                        summary.record("error" not in record)
+                    yield record
+                submit_next()
+
+
+def run_batch_file(input_path: str, output_path: str, score_fn: Optional[Callable[[str], Dict]] = None,
+                   concurrency: int = 8, resume: bool = True,
+                   on_record: Optional[Callable[[Dict], None]] = None,
+                   client=None, cache=None, chunk_size: Optional[AdaptiveChunkSize] = None) -> Dict:
+    """Score every address in input_path and append JSONL records to output_path.
+
+    Wallets are scored one by one with score_fn, or in multi-address chunks
+    when chunk_size and client are given. With resume=True, addresses
+    already scored in output_path are skipped, so a crashed run can simply
+    be restarted. Returns the batch summary.
+    """
+    addresses = read_addresses(input_path)
+    completed = load_completed(output_path) if resume else set()
+    remaining = [a for a in addresses if a.lower() not in completed]
+    summary = BatchSummary(total=len(addresses), skipped=len(addresses) - len(remaining))
+
+    with open(output_path, "a" if resume else "w") as out:
+        if resume and out.tell() > 0:
+            # Terminate a line torn by a crash so new records start cleanly
+            with open(output_path, "rb") as existing:
+                existing.seek(-1, os.SEEK_END)
+                if existing.read(1) != b"\n":
+                    out.write("\n")
+        if chunk_size is not None:
+            records = score_wallets_chunked(remaining, client, cache, concurrency, chunk_size, summary)
+        else:
+            records = score_wallets(remaining, score_fn, concurrency, summary)
+        for record in records:
+            out.write(json.dumps(record) + "\n")
+            # Flush per record so a crash loses at most the in-flight wallets
+            out.flush()
+            if on_record is not None:
+                on_record(record)
+
+    return summary.to_dict()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - wallet-score throughput and p50/p95/p99 latency across concurrency levels
+
+In-process scoring against a local replay of recorded fixtures (no network, no quota):
+
+    python bench.py score --replay fixtures --latency 0.3 --concurrency 1,4,16 --wallets 64
+
+The running web app, end to end:
+
+    python bench.py http --url http://localhost:5001/api/calculate --concurrency 1,8
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def make_wallets(count: int, seed: int = 7) -> List[str]:
+    """Deterministic pseudo-random wallet addresses"""
+    rng = random.Random(seed)
+    return ["0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40)) for _ in range(count)]
+
+
+def run_level(score_fn: Callable[[str], Dict], wallets: List[str], concurrency: int) -> Dict:
+    """Score every wallet with `concurrency` workers and summarize latency"""
+    latencies = []
+    errors = 0
+    partial = 0
+
+    def timed(address: str):
+        start = time.perf_counter()
+        try:
+            result = score_fn(address)
+            return time.perf_counter() - start, None, result
+        except Exception as e:
+            return time.perf_counter() - start, e, None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for elapsed, error, result in executor.map(timed, wallets):
+            latencies.append(elapsed)
+            if error is not None:
+                errors += 1
+            elif result.get("partial") or result.get("failed_queries"):
+                partial += 1
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "wallets": len(wallets),
+        "errors": errors,
+        "partial": partial,
+        "elapsed_seconds": round(wall, 3),
+        "wallets_per_second": round(len(wallets) / wall, 3) if wall > 0 else 0.0,
+        "p50": round(percentile(latencies, 0.50), 4),
+        "p95": round(percentile(latencies, 0.95), 4),
+        "p99": round(percentile(latencies, 0.99), 4),
+    }
+
+
+def in_process_scorer(args) -> Callable[[str], Dict]:
+    """Build a score function using the library directly (imported after endpoints are set)"""
+    from cache import QueryCache
+    import defi_tracker as tracker
+
+    api_key = os.getenv("BITQUERY_API_KEY") or "replay"
+    query_cache = QueryCache.from_env() if args.query_cache else None
+
+    if args.engine == "async":
+        from async_tracker import AsyncScoringEngine
+        engine = AsyncScoringEngine(api_key, query_cache=query_cache)
+        return lambda address: engine.score(address, verbose=False, deadline=args.deadline)
+
+    client = tracker.BitqueryClient.from_env(api_key, query_cache=query_cache)
+    return lambda address: tracker.calculate_defi_score(address, api_key, verbose=False, client=client,
+                                                        deadline=args.deadline)
+
+
+def http_scorer(args) -> Callable[[str], Dict]:
+    """Build a score function POSTing to a running /api/calculate"""
+    import requests
+
+    session = requests.Session()
+
+    def score(address: str) -> Dict:
+        response = session.post(args.url, json={"address": address}, timeout=args.timeout)
+        response.raise_for_status()
+        return response.json()["data"]
+
+    return score
+
+
+def print_table(rows: List[Dict]):
+    header = f"{'conc':>5} {'wallets':>8} {'errors':>7} {'partial':>8} {'w/s':>9} {'p50':>8} {'p95':>8} {'p99':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['concurrency']:>5} {row['wallets']:>8} {row['errors']:>7} {row['partial']:>8} "
+              f"{row['wallets_per_second']:>9.2f} {row['p50']:>7.3f}s {row['p95']:>7.3f}s {row['p99']:>7.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark wallet scoring throughput and latency")
+    parser.add_argument("mode", choices=["score", "http"], help="score: in-process library; http: running web app")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--wallets", type=int, default=32, help="Wallets per level (random addresses)")
+    parser.add_argument("--input", help="File with one address per line instead of random wallets")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed wallets scored before the first level")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    group = parser.add_argument_group("score mode")
+    group.add_argument("--engine", choices=["threads", "async"], default="threads")
+    group.add_argument("--query-cache", action="store_true",
+                       help="Enable the query cache (off by default so every wallet hits the backend)")
+    group.add_argument("--deadline", type=float, default=None, help="Overall per-wallet deadline (seconds)")
+    group.add_argument("--no-rate-limit", action="store_true",
+                       help="Disable the per-endpoint rate limiters to measure the code path alone")
+    group.add_argument("--replay", metavar="FIXTURES", help="Start a local replay server over this fixture directory")
+    group.add_argument("--latency", type=float, default=0.0, help="Replay: injected latency per request")
+    group.add_argument("--jitter", type=float, default=0.0, help="Replay: +/- latency jitter")
+    group.add_argument("--error-rate", type=float, default=0.0, help="Replay: fraction of HTTP 503 responses")
+    group.add_argument("--throttle-rate", type=float, default=0.0, help="Replay: fraction of HTTP 429 responses")
+
+    group = parser.add_argument_group("http mode")
+    group.add_argument("--url", default="http://localhost:5001/api/calculate")
+    group.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    server = None
+    if args.replay:
+        from replay import FaultInjector, start_server
+        faults = FaultInjector(args.latency, args.jitter, args.error_rate, args.throttle_rate)
+        server = start_server(args.replay, faults=faults)
+        # Must be set before defi_tracker is imported, which reads them once
+        os.environ["BITQUERY_ENDPOINT_V1"] = server.url + "/v1"
+        os.environ["BITQUERY_ENDPOINT_V2"] = server.url + "/v2"
+        print(f"Replaying {len(server.store)} fixtures at {server.url}", file=sys.stderr)
+
+    if args.no_rate_limit:
+        os.environ["BITQUERY_V1_RATE"] = "0"
+        os.environ["BITQUERY_V2_RATE"] = "0"
+
+    if args.input:
+        from batch import read_addresses
+        wallets = read_addresses(args.input)
+    else:
+        wallets = make_wallets(args.wallets + args.warmup)
+
+    score_fn = in_process_scorer(args) if args.mode == "score" else http_scorer(args)
+
+    if args.warmup:
+        run_level(score_fn, wallets[:args.warmup], 1)
+        wallets = wallets[args.warmup:] if not args.input else wallets
+
+    rows = [run_level(score_fn, wallets, level) for level in levels]
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+    if server is not None:
+        print(f"Replay: served {server.served}, misses {server.misses}, injected errors {server.injected_errors}",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Caching layers for DeFi score computation
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Default time-to-live (seconds) per pillar query family.
+# Historical counts (P1, P2/P3, DEX/NFT) move slowly and a past governance vote stays
+# true for the whole look-back window; balances (P4) move quickly.
+DEFAULT_PILLAR_TTLS = {
+    "p1": 6 * 60 * 60,
+    "p2_p3": 6 * 60 * 60,
+    "dex_nft": 6 * 60 * 60,
+    "governance": 24 * 60 * 60,
+    "p4": 15 * 60,
+}
+
+# Default time-to-live (seconds) per GraphQL query family
+DEFAULT_QUERY_TTLS = {
+    "p1": 60 * 60,
+    "p2_p3": 60 * 60,
+    "dex_nft": 60 * 60,
+    "governance": 60 * 60,
+    "p4_erc20": 5 * 60,
+    "p4_nft": 5 * 60,
+}
+
+
+class LRUCache:
+    """Thread-safe size-bounded LRU mapping of key -> (value, stored_at)"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Return (value, stored_at) and mark the key as recently used"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, value: Any, stored_at: Optional[float] = None):
+        """Store a value, evicting the least recently used entries if full"""
+        with self._lock:
+            self._data[key] = (value, stored_at if stored_at is not None else time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]):
+        """Delete every key matching predicate"""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ScoreCache:
+    """Per-pillar result cache keyed by lowercased wallet address.
+
+    Entries live in an in-process LRU tier and, when db_path is given, in a
+    SQLite tier that survives restarts. Each pillar family has its own TTL.
+    Expired SQLite rows are deleted when a lookup finds them, on startup and
+    at most every prune_interval seconds on writes.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 10000,
+                 db_path: Optional[str] = None, prune_interval: float = 60 * 60):
+        self.ttls = dict(DEFAULT_PILLAR_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.memory = LRUCache(max_entries)
+        self.db_path = db_path
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.prune_interval = prune_interval
+        self.pruned = 0
+        self._last_prune = 0.0
+        if db_path:
+            self._open_db()
+            self.prune()
+
+    @classmethod
+    def from_env(cls) -> "ScoreCache":
+        """Build a cache from SCORE_CACHE_* environment variables"""
+        ttls = {}
+        for family in DEFAULT_PILLAR_TTLS:
+            value = os.getenv(f"SCORE_CACHE_TTL_{family.upper()}")
+            if value:
+                ttls[family] = float(value)
+        return cls(
+            ttls=ttls,
+            max_entries=int(os.getenv("SCORE_CACHE_MAX_ENTRIES", "10000")),
+            db_path=os.getenv("SCORE_CACHE_DB") or None,
+            prune_interval=float(os.getenv("SCORE_CACHE_PRUNE_INTERVAL", "3600")),
+        )
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pillar_cache (
+                address TEXT NOT NULL,
+                family TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (address, family)
+            )
+            """
+        )
+        self._db.commit()
+
+    def _is_fresh(self, family: str, stored_at: float) -> bool:
+        return time.time() - stored_at < self.ttls.get(family, 0)
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _key(address: str, family: str, version: Optional[str]) -> Tuple[str, str]:
+        # A versioned entry is stored under "family@version"; other versions are misses
+        return address.lower(), f"{family}@{version}" if version else family
+
+    def get(self, address: str, family: str, version: Optional[str] = None) -> Optional[Any]:
+        """Return the cached payload for a pillar family, or None if missing or expired
+
+        version identifies inputs the payload depends on besides the wallet
+        (e.g. the protocol registry for P2/P3); entries stored under another
+        version are treated as missing.
+        """
+        key = self._key(address, family, version)
+
+        entry = self.memory.get(key)
+        if entry is not None:
+            payload, stored_at = entry
+            if self._is_fresh(family, stored_at):
+                self._count("hits")
+                return payload
+            self.memory.delete(key)
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT payload, stored_at FROM pillar_cache WHERE address = ? AND family = ?",
+                    key,
+                ).fetchone()
+            if row is not None and self._is_fresh(family, row[1]):
+                payload = json.loads(row[0])
+                self.memory.set(key, payload, row[1])
+                self._count("disk_hits")
+                return payload
+            if row is not None:
+                with self._db_lock:
+                    # Only if no other worker has refreshed it meanwhile
+                    self._db.execute(
+                        "DELETE FROM pillar_cache WHERE address = ? AND family = ? AND stored_at = ?",
+                        key + (row[1],),
+                    )
+                    self._db.commit()
+
+        self._count("misses")
+        return None
+
+    def set(self, address: str, family: str, payload: Any, version: Optional[str] = None):
+        """Store a JSON-serializable payload for a pillar family"""
+        key = self._key(address, family, version)
+        stored_at = time.time()
+        self.memory.set(key, payload, stored_at)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pillar_cache (address, family, payload, stored_at) VALUES (?, ?, ?, ?)",
+                    (key[0], key[1], json.dumps(payload), stored_at),
+                )
+                self._db.commit()
+            if self.prune_interval and stored_at - self._last_prune >= self.prune_interval:
+                self.prune()
+
+    def prune(self) -> int:
+        """Delete expired rows, including those of superseded versions, from the SQLite tier
+
+        Returns the number of rows removed.
+        """
+        if self._db is None:
+            return 0
+        now = time.time()
+        removed = 0
+        with self._db_lock:
+            self._last_prune = now
+            for family, ttl in self.ttls.items():
+                # Matches "family" and versioned "family@version" rows
+                cursor = self._db.execute(
+                    "DELETE FROM pillar_cache WHERE stored_at <= ? AND (family = ? OR substr(family, 1, ?) = ?)",
+                    (now - ttl, family, len(family) + 1, f"{family}@"),
+                )
+                removed += cursor.rowcount
+            self._db.commit()
+        with self._stats_lock:
+            self.pruned += removed
+        return removed
+
+    def invalidate(self, address: str):
+        """Drop every cached pillar for an address"""
+        address = address.lower()
+        self.memory.delete_where(lambda key: key[0] == address)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM pillar_cache WHERE address = ?", (address,))
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes"""
+        with self._stats_lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "disk_enabled": self._db is not None,
+                "pruned": self.pruned,
+            }
+
+
+class QueryCache:
+    """Memoizes raw GraphQL responses keyed by (endpoint, query text, variables).
+
+    With stale_while_revalidate enabled, an expired entry that is younger
+    than max_stale is returned immediately while the caller schedules a
+    background refresh.
+    """
+
+    FRESH = "fresh"
+    STALE = "stale"
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, default_ttl: float = 300,
+                 max_entries: int = 1000, stale_while_revalidate: bool = False,
+                 max_stale: float = 60 * 60):
+        self.ttls = dict(DEFAULT_QUERY_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_stale = max_stale
+        self.entries = LRUCache(max_entries)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @classmethod
+    def from_env(cls) -> "QueryCache":
+        """Build a cache from QUERY_CACHE_* environment variables"""
+        ttls = {}
+        for family in DEFAULT_QUERY_TTLS:
+            value = os.getenv(f"QUERY_CACHE_TTL_{family.upper()}")
+            if value:
+                ttls[family] = float(value)
+        return cls(
+            ttls=ttls,
+            default_ttl=float(os.getenv("QUERY_CACHE_DEFAULT_TTL", "300")),
+            max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000")),
+            stale_while_revalidate=os.getenv("QUERY_CACHE_SWR", "").lower() in ("1", "true", "yes"),
+            max_stale=float(os.getenv("QUERY_CACHE_MAX_STALE", "3600")),
+        )
+
+    @staticmethod
+    def make_key(endpoint: str, query: str, variables: Optional[Dict]) -> Tuple[str, str, str]:
+        """Build a cache key; whitespace in the query text is normalized"""
+        normalized_query = " ".join(query.split())
+        return endpoint, normalized_query, json.dumps(variables or {}, sort_keys=True)
+
+    def ttl_for(self, family: Optional[str]) -> float:
+        return self.ttls.get(family, self.default_ttl) if family else self.default_ttl
+
+    def lookup(self, key: Tuple, family: Optional[str]) -> Tuple[Optional[Any], Optional[str]]:
+        """Return (data, state) where state is FRESH, STALE or None on a miss"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            data, stored_at = entry
+            age = time.time() - stored_at
+            ttl = self.ttl_for(family)
+            if age < ttl:
+                with self._lock:
+                    self.hits += 1
+                return data, self.FRESH
+            if self.stale_while_revalidate and age < ttl + self.max_stale:
+                with self._lock:
+                    self.stale_hits += 1
+                return data, self.STALE
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def store(self, key: Tuple, data: Any):
+        self.entries.set(key, data)
+
+    def begin_refresh(self, key: Tuple) -> bool:
+        """Claim the refresh of a stale key; False if one is already running"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self.refreshes += 1
+            return True
+
+    def end_refresh(self, key: Tuple):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def refresh_in_background(self, key: Tuple, fetch):
+        """Run fetch() in a daemon thread and store its result; one refresh per key at a time"""
+        if not self.begin_refresh(key):
+            return
+
+        def run():
+            try:
+                self.store(key, fetch())
+            except Exception:
+                # Keep serving the stale entry; the next lookup will retry
+                pass
+            finally:
+                self.end_refresh(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and cache size"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+            }
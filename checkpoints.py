@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Incremental checkpoints - per-wallet daily aggregates so re-scoring only fetches the delta
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+# Query families whose history is aggregated in daily buckets
+CHECKPOINT_FAMILIES = ("p1", "p2_p3", "dex_nft")
+
+# Same look-back as get_time_3_years_ago
+DEFAULT_WINDOW_DAYS = 3 * 365
+
+# day (YYYY-MM-DD) -> {key: count}
+Buckets = Dict[str, Dict[str, int]]
+
+
+def utc_now() -> datetime:
+    return datetime.utcnow()
+
+
+def utc_today() -> str:
+    """Current day (UTC), YYYY-MM-DD"""
+    return utc_now().strftime("%Y-%m-%d")
+
+
+def window_start_day(window_days: int = DEFAULT_WINDOW_DAYS) -> str:
+    """First day (UTC) still inside the look-back window"""
+    return (utc_now() - timedelta(days=window_days)).strftime("%Y-%m-%d")
+
+
+class CheckpointStore:
+    """SQLite store of per-wallet, per-family daily buckets and the day they were scanned up to.
+
+    A family's buckets hold counts keyed by what the family aggregates (the
+    transaction total, protocol address -> call count, DEX protocol names).
+    merge() replaces every bucket from the delta's first day onwards, so the
+    last, possibly incomplete day is simply re-fetched on the next pass, and
+    drops buckets that have aged out of the window.
+    """
+
+    def __init__(self, db_path: str = ":memory:", window_days: int = DEFAULT_WINDOW_DAYS):
+        self.db_path = db_path
+        self.window_days = window_days
+        self._lock = threading.Lock()
+        self.full_scans = 0
+        self.delta_scans = 0
+        self.expired_buckets = 0
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        if db_path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoint_buckets (
+                address TEXT NOT NULL,
+                family TEXT NOT NULL,
+                day TEXT NOT NULL,
+                counts TEXT NOT NULL,
+                PRIMARY KEY (address, family, day)
+            )
+            """
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                address TEXT NOT NULL,
+                family TEXT NOT NULL,
+                last_day TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (address, family)
+            )
+            """
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["CheckpointStore"]:
+        """Build a store from CHECKPOINT_DB / CHECKPOINT_WINDOW_DAYS; None when CHECKPOINT_DB is unset"""
+        db_path = os.getenv("CHECKPOINT_DB")
+        if not db_path:
+            return None
+        return cls(db_path, window_days=int(os.getenv("CHECKPOINT_WINDOW_DAYS", str(DEFAULT_WINDOW_DAYS))))
+
+    def window_start(self) -> str:
+        return window_start_day(self.window_days)
+
+    @staticmethod
+    def _family_key(family: str, version: Optional[str]) -> str:
+        return f"{family}@{version}" if version else family
+
+    def delta_since(self, address: str, family: str, version: Optional[str] = None) -> Tuple[str, bool]:
+        """Return (first day to fetch, is_delta) for a wallet's next query
+
+        With a checkpoint this is the day its last scan ran (re-fetched, as
+        that day was still incomplete); otherwise the whole window is
+        scanned. Buckets stored under another version (e.g. a different
+        protocol whitelist) do not count as a checkpoint.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_day FROM checkpoints WHERE address = ? AND family = ?",
+                (address.lower(), self._family_key(family, version)),
+            ).fetchone()
+        window_start = self.window_start()
+        if row is None or row[0] < window_start:
+            return window_start, False
+        return row[0], True
+
+    def merge(self, address: str, family: str, since: str, buckets: Buckets,
+              version: Optional[str] = None) -> Dict[str, int]:
+        """Store the buckets fetched from `since` onwards and return the window totals"""
+        address = address.lower()
+        base_family, family = family, self._family_key(family, version)
+        window_start = self.window_start()
+        # Days before `since` were not re-fetched, so only newer buckets are replaced
+        buckets = {day: counts for day, counts in buckets.items() if day >= max(since, window_start)}
+        # The scan covered every day up to today, active or not, so the next
+        # delta starts here even for a wallet that has been dormant for years
+        last_day = max([since, utc_today()] + list(buckets))
+        with self._lock:
+            if version:
+                # Buckets of superseded versions can never be reused
+                for table in ("checkpoint_buckets", "checkpoints"):
+                    self._db.execute(
+                        f"DELETE FROM {table} WHERE address = ? AND family LIKE ? AND family != ?",
+                        (address, base_family + "@%", family),
+                    )
+            self._db.execute(
+                "DELETE FROM checkpoint_buckets WHERE address = ? AND family = ? AND day >= ?",
+                (address, family, since),
+            )
+            self._db.executemany(
+                "INSERT INTO checkpoint_buckets (address, family, day, counts) VALUES (?, ?, ?, ?)",
+                [(address, family, day, json.dumps(counts)) for day, counts in buckets.items()],
+            )
+            expired = self._db.execute(
+                "DELETE FROM checkpoint_buckets WHERE address = ? AND family = ? AND day < ?",
+                (address, family, window_start),
+            ).rowcount
+            self._db.execute(
+                "INSERT OR REPLACE INTO checkpoints (address, family, last_day, updated_at) VALUES (?, ?, ?, ?)",
+                (address, family, last_day, time.time()),
+            )
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT counts FROM checkpoint_buckets WHERE address = ? AND family = ?",
+                (address, family),
+            ).fetchall()
+            self.expired_buckets += expired
+            if since > window_start:
+                self.delta_scans += 1
+            else:
+                self.full_scans += 1
+
+        totals: Dict[str, int] = {}
+        for (counts,) in rows:
+            for key, count in json.loads(counts).items():
+                totals[key] = totals.get(key, 0) + count
+        return totals
+
+    def invalidate(self, address: str):
+        """Forget a wallet's checkpoints so its next score re-scans the whole window"""
+        with self._lock:
+            self._db.execute("DELETE FROM checkpoint_buckets WHERE address = ?", (address.lower(),))
+            self._db.execute("DELETE FROM checkpoints WHERE address = ?", (address.lower(),))
+            self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            wallets = self._db.execute("SELECT COUNT(DISTINCT address) FROM checkpoints").fetchone()[0]
+            buckets = self._db.execute("SELECT COUNT(*) FROM checkpoint_buckets").fetchone()[0]
+            return {
+                "wallets": wallets,
+                "buckets": buckets,
+                "full_scans": self.full_scans,
+                "delta_scans": self.delta_scans,
+                "expired_buckets": self.expired_buckets,
+                "window_days": self.window_days,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Flow control for Bitquery calls - rate limiting, adaptive concurrency, retries,
+hedging and request coalescing
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+
+class TokenBucket:
+    """Token-bucket rate limiter; a rate of 0 disables limiting"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens now and return how long the caller must wait before using them"""
+        with self._lock:
+            self.acquired += 1
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited_seconds += wait
+            return wait
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until the tokens are available"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "capacity": self.capacity,
+                "acquired": self.acquired,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+class ConcurrencyGovernor:
+    """AIMD concurrency limit: grows by ~1 per window of successes, halves on throttling.
+
+    Throttling signals (429, 5xx, timeouts) cut the limit multiplicatively,
+    at most once per cooldown so one burst of failures counts as one signal.
+    """
+
+    def __init__(self, initial: float = 8, minimum: float = 1, maximum: float = 64,
+                 decrease_factor: float = 0.5, cooldown: float = 1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.successes = 0
+        self.throttled = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free"""
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a slot is free; False if the timeout expired"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, throttled: bool = False):
+        """Return a slot and feed the outcome into the AIMD limit"""
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.successes += 1
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "successes": self.successes,
+                "throttled": self.throttled,
+                "decreases": self.decreases,
+            }
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for idempotent reads"""
+
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """Build from BITQUERY_MAX_RETRIES / BITQUERY_RETRY_BASE_DELAY / BITQUERY_RETRY_MAX_DELAY"""
+        return cls(
+            max_retries=int(os.getenv("BITQUERY_MAX_RETRIES", "2")),
+            base_delay=float(os.getenv("BITQUERY_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("BITQUERY_RETRY_MAX_DELAY", "8")),
+        )
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number `attempt` (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class LatencyTracker:
+    """Rolling window of successful query latencies per family, for hedging thresholds"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, family: Optional[str], seconds: float):
+        with self._lock:
+            samples = self._samples.get(family)
+            if samples is None:
+                samples = self._samples[family] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, family: Optional[str], q: float = 0.95) -> Optional[float]:
+        """Latency percentile for a family, or None until enough samples exist"""
+        with self._lock:
+            samples = self._samples.get(family)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.events: List[Tuple] = []
+        self.listeners: List[Callable[..., None]] = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, listener: Callable[..., None]):
+        """Replay the events published so far to listener, then deliver new ones"""
+        with self.lock:
+            for event in self.events:
+                listener(*event)
+            self.listeners.append(listener)
+
+    def publish(self, *event):
+        # Delivered under the lock so a subscriber sees every event exactly once, in order
+        with self.lock:
+            self.events.append(event)
+            for listener in self.listeners:
+                listener(*event)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller runs fn; callers arriving while it is in flight wait
+    for it and receive the same result or exception. Nothing is kept once
+    the call finishes, so this is deduplication, not caching.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        return self.do_with_events(key, lambda publish: fn())
+
+    def do_with_events(self, key: Hashable, fn: Callable[[Callable[..., None]], Any],
+                       listener: Optional[Callable[..., None]] = None) -> Any:
+        """Like do(), but fn(publish) can publish progress events to every caller
+
+        Each caller's listener receives every event of the flight it runs or
+        joins; a caller joining late first gets the events already published.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+            if listener is not None:
+                flight.subscribe(listener)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(flight.publish)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+            }
+
+
+class EndpointFlowControl:
+    """Rate limiter and concurrency governor for one Bitquery endpoint"""
+
+    def __init__(self, label: str, bucket: TokenBucket, governor: ConcurrencyGovernor):
+        self.label = label
+        self.bucket = bucket
+        self.governor = governor
+
+    @classmethod
+    def from_env(cls, label: str) -> "EndpointFlowControl":
+        """Build from BITQUERY_<LABEL>_RATE / _BURST / _CONCURRENCY / _MAX_CONCURRENCY"""
+        prefix = f"BITQUERY_{label.upper()}_"
+        rate = float(os.getenv(prefix + "RATE", "10"))
+        burst = os.getenv(prefix + "BURST")
+        return cls(
+            label,
+            TokenBucket(rate, float(burst) if burst else None),
+            ConcurrencyGovernor(
+                initial=float(os.getenv(prefix + "CONCURRENCY", "8")),
+                maximum=float(os.getenv(prefix + "MAX_CONCURRENCY", "64")),
+            ),
+        )
+
+    def stats(self) -> Dict:
+        return {"rate_limiter": self.bucket.stats(), "governor": self.governor.stats()}
+
+
+_flow_controls: Dict[str, EndpointFlowControl] = {}
+_flow_controls_lock = threading.Lock()
+
+
+def flow_control_for(label: str) -> EndpointFlowControl:
+    """Return the process-wide flow control for an endpoint label ("v1" or "v2")"""
+    with _flow_controls_lock:
+        flow = _flow_controls.get(label)
+        if flow is None:
+            flow = EndpointFlowControl.from_env(label)
+            _flow_controls[label] = flow
+        return flow
+
+
+def flow_control_stats() -> Dict[str, Dict]:
+    """Return limiter and governor stats for every endpoint used so far"""
+    with _flow_controls_lock:
+        flows = list(_flow_controls.values())
+    return {flow.label: flow.stats() for flow in flows}
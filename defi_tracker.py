@@ -6,98 +6,86 @@ DeFi Portfolio Tracker - Calculates DeFi Strategy Score for Ethereum addresses
 import os
 import sys
 import argparse
+import logging
 import requests
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed, wait
+import threading
 import time
 from dotenv import load_dotenv
+from cache import QueryCache, ScoreCache
+from checkpoints import CHECKPOINT_FAMILIES, CheckpointStore
+from leaderboard import LeaderboardStore
+from logging_config import configure_logging, log_payload
+from protocols import ProtocolRegistry, ReloadableRegistry
+from concurrency import LatencyTracker, RetryPolicy, SingleFlight, flow_control_for
+import metrics
 
 # Load environment variables
 load_dotenv()
 
+# Named explicitly so LOG_LEVELS=defi_tracker=... also applies when run as a script
+logger = logging.getLogger("defi_tracker")
+
+try:
+    import httpx  # Optional, only needed for HTTP/2
+except ImportError:
+    httpx = None
+
+try:
+    import ijson  # Optional, only needed for streamed responses
+except ImportError:
+    ijson = None
+
+T = TypeVar("T")
+
+# Transport-level failures raised by the HTTP sessions
+TRANSPORT_ERRORS = (requests.exceptions.RequestException,)
+if httpx is not None:
+    TRANSPORT_ERRORS += (httpx.HTTPError,)
+
 # Bitquery endpoints
-BITQUERY_ENDPOINT_V1 = "https://graphql.bitquery.io"  # For Ethereum v1 queries
-BITQUERY_ENDPOINT_V2 = "https://streaming.bitquery.io/graphql"  # For EVM v2 queries
-
-# Protocol addresses organized by category
-PROTOCOL_ADDRESSES = {
-    "lending": [
-        # Aave v3
-        "0xd01607c3C5eCABa394D8be377a08590149325722",
-        "0x87870Bca3F3fD6335C3F4ce8392D69350B4fA4E2",
-        # Aave v2
-        "0xa0d9C1E9E48Ca30c8d8C3B5D69FF5dc1f6DFfC24",
-        "0x7d2768dE32b0b80b7a3454c06BdAc94A69DDc7A9",
-        # Compound v2
-        "0xe65cdB6479BaC1e22340E4E755fAE7E509EcD06c",
-        "0x6C8c6b02E7b2BE14d4fA6022Dfd6d75921D90E4E",
-        "0x70e36f6BF80a52b3B46b3aF8e106CC0ed743E8e4",
-        "0x5d3a536E4D6DbD6114cc1Ead35777bAB948E3643",
-        "0x4Ddc2D193948926D02f9B1fE9e1daa0718270ED5",
-        "0x7713DD9Ca933848F6819F38B8352D9A15EA73F67",
-        "0xFAce851a4921ce59e912d19329929CE6da6EB0c7",
-        "0x95b4eF2869eBD94BEb4eEE400a99824BF5DC325b",
-        "0x158079Ee67Fce2f58472A96584A73C7Ab9AC95c1",
-        "0xF5DCe57282A584D2746FaF1593d3121Fcac444dC",
-        "0x4B0181102A0112A2ef11AbEE5563bb4a3176c9d7",
-        "0x12392F67bdf24faE0AF363c24aC620a2f67DAd86",
-        "0x35A18000230DA775CAc24873d00Ff85BccdeD550",
-        "0x39AA39c021dfbaE8faC545936693aC917d5E7563",
-        "0x041171993284df560249B57358F931D9eB7b925D",
-        "0xf650C3d88D12dB855b8bf7D11Be6C55A4e07dCC9",
-        "0xC11b1268C1A384e55C48c2391d8d480264A3A7F4",
-        "0xccF4429DB6322D5C611ee964527D42E5d685DD6a",
-        "0x80a2AE356fc9ef4305676f7a3E2Ed04e12C33946",
-        "0xB3319f5D18Bc0D84dD1b4825Dcde5d5f7266d407",
-        "0xc00e94Cb662C3520282E6f5717214004A7f26888",
-        "0x3d9819210A31b4961b30EF54bE2aeD79B9c9Cd3B",
-        "0xc0Da02939E1441F497fd74F78cE7Decb17B66529",
-        "0x6d903f6003cca6255D85CcA4D3B5E5146dC33925",
-        # Compound v3
-        "0xc3d688B66703497DAA19211EEdff47f25384cdc3",
-        "0xA17581A9E3356d9A858b789D68B4d866e593aE94",
-        "0x3Afdc9BCA9213A35503b077a6072F3D0d5AB0840",
-        "0x3D0bb1ccaB520A66e607822fC55BC921738fAFE3",
-        "0x5D409e56D886231aDAf00c8775665AD0f9897b56",
-        # Sparklend
-        "0xC13e21B648A5Ee794902342038FF3aDAB66BE987",
-        # Morpho
-        "0xBBBBBbbBBb9cC5e90e3b3Af64bdAF62C37EEFFCb",
-    ],
-    "staking": [
-        # Lido
-        "0xae7ab96520DE3A18E5e111B5EaAb095312D7fE84",
-        "0x7f39C581F595B53c5cb19bD0b3f8dA6c935E2Ca0",
-        # RocketPool
-        "0xDD3f50F8A6CafbE9b31a427582963f465E745AF8"
-    ],
-    "liquidity": [
-        # Uniswap v3
-        "0xC36442b4a4522E871399CD717aBDD847Ab11FE88",
-    ],
-    "bridging": [
-        # Across
-        "0x5c7BCd6E7De5423a257D81B442095A1a6ced35C5",
-        # Stargate
-        "0x8731d54E9D02c286767d56ac03e8037C07e01e98",
-        "0x150f94B44927F078737562f0fcF3C95c01Cc2376",
-    ],
-    "yield_farming": [
-        # Yearn Finance
-        "0xdA816459F1AB5631232FE5e97a05BBBb94970c95",
-        "0x5f18C75AbDAe578b483E5F43f12a39cF75b973a9",
-        "0x7Da96a3891Add058AdA2E826306D812C638D87A7",
-        "0xa258C4606Ca8206D8aA700cE2143D7db854D168c",
-        # Convex Finance
-        "0xF403C135812408BFbE8713b5A23a04b3D48AAE31",
-    ]
+# Overridable to point at a local replay server (see replay.py)
+BITQUERY_ENDPOINT_V1 = os.getenv("BITQUERY_ENDPOINT_V1", "https://graphql.bitquery.io")  # For Ethereum v1 queries
+BITQUERY_ENDPOINT_V2 = os.getenv("BITQUERY_ENDPOINT_V2", "https://streaming.bitquery.io/graphql")  # For EVM v2 queries
+
+# Compiled protocol whitelist (normalized address -> (category, protocol name)),
+# loaded from protocols.json and swapped when the file changes
+PROTOCOLS = ReloadableRegistry.from_env()
+
+# Protocol addresses organized by category (as loaded at startup; PROTOCOLS.current() is live)
+PROTOCOL_ADDRESSES = PROTOCOLS.current().addresses_by_category()
+
+# Parallel query families feeding the four pillars
+QUERY_FAMILIES = ("p1", "p2_p3", "dex_nft", "governance", "p4")
+
+# Query families each pillar depends on (a failed family makes the pillar partial)
+PILLAR_QUERY_FAMILIES = {
+    "p1": ("p1",),
+    "p2": ("p2_p3", "dex_nft", "governance"),
+    "p3": ("p2_p3", "dex_nft"),
+    "p4": ("p4",),
 }
 
-# Get all protocol addresses for P3
-ALL_PROTOCOL_ADDRESSES = []
-for addresses in PROTOCOL_ADDRESSES.values():
-    ALL_PROTOCOL_ADDRESSES.extend(addresses)
+# Get all protocol addresses for P3 (as loaded at startup)
+ALL_PROTOCOL_ADDRESSES = list(PROTOCOLS.current().addresses)
+
+
+# Families whose bounded (saturation) results are capped lower bounds
+BOUNDED_FAMILIES = ("p1", "p4")
+
+
+def registry_cache_version(name: str, registry: ProtocolRegistry, bounded: bool = False) -> Optional[str]:
+    """Cache version for a query family's results: the registry fingerprint for P2/P3, else None
+
+    Only P2/P3 results depend on the whitelist, so a registry change leaves
+    every other family's cached results in place. Bounded P1/P4 results are
+    kept apart so they never answer a request for exact counts.
+    """
+    if name == "p2_p3":
+        return registry.fingerprint
+    return "bounded" if bounded and name in BOUNDED_FAMILIES else None
 
 # Presaved response for sample wallet (to avoid API calls)
 SAMPLE_WALLET_ADDRESS = "0x6979B914f3A1d8C0fec2C1FD602f0e674cdf9862"
@@ -105,23 +93,30 @@ SAMPLE_WALLET_RESPONSE = {
     "address": SAMPLE_WALLET_ADDRESS,
     "p1": {
         "tx_count": 156,
-        "score": 100.0
+        "score": 100.0,
+        "partial": False
     },
     "p2": {
         "unique_types": 2,
-        "score": 25.0
+        "score": 25.0,
+        "partial": False
     },
     "p3": {
         "unique_protocols": 3,
-        "score": 28.57
+        "score": 28.57,
+        "partial": False
     },
     "p4": {
         "unique_assets": 29,
-        "score": 100.0
+        "score": 100.0,
+        "partial": False
     },
     "average_pillar_score": 63.3925,
     "final_score": 72.544375,
-    "final_score_rounded": 73
+    "final_score_rounded": 73,
+    "failed_queries": [],
+    "partial": False,
+    "bounded": False
 }
 
 
@@ -131,34 +126,458 @@ def get_time_3_years_ago() -> str:
     return three_years_ago.strftime("%Y-%m-%dT00:00:00Z")
 
 
+# Deadline (seconds) per query family, covering all retries of one query
+DEFAULT_QUERY_DEADLINE = 200
+DEFAULT_QUERY_DEADLINES = {
+    "p1": 60,
+    "p2_p3": 120,
+    "dex_nft": 60,
+    "governance": 30,  # Existence check; gives up early rather than holding P2 back
+    "p4_erc20": 45,
+    "p4_nft": 45,
+}
+
+
+def recorder_from_env():
+    """Fixture recorder writing to BITQUERY_RECORD_DIR, or None when unset"""
+    directory = os.getenv("BITQUERY_RECORD_DIR")
+    if not directory:
+        return None
+    from replay import FixtureRecorder
+    return FixtureRecorder(directory)
+
+
+def query_deadlines_from_env() -> Dict[str, float]:
+    """Read BITQUERY_DEADLINE_<FAMILY> overrides"""
+    deadlines = {}
+    for family in DEFAULT_QUERY_DEADLINES:
+        value = os.getenv(f"BITQUERY_DEADLINE_{family.upper()}")
+        if value:
+            deadlines[family] = float(value)
+    return deadlines
+
+
+# Slack added to the slowest family deadline for the default overall score
+# deadline, so a family stopped by its own deadline is reported first
+SCORE_DEADLINE_MARGIN = 5
+
+
+def score_deadline_from_env() -> Optional[float]:
+    """Overall per-wallet deadline from SCORE_DEADLINE (0 disables it)
+
+    Defaults to the longest family deadline plus SCORE_DEADLINE_MARGIN, so
+    a slow family is never cut off before its own deadline.
+    """
+    value = os.getenv("SCORE_DEADLINE")
+    if value:
+        return float(value) or None
+    deadlines = dict(DEFAULT_QUERY_DEADLINES, **query_deadlines_from_env())
+    # P4 runs its ERC-20 and NFT queries one after the other
+    p4 = deadlines.pop("p4_erc20") + deadlines.pop("p4_nft")
+    return max(max(deadlines.values()), p4) + SCORE_DEADLINE_MARGIN
+
+
+class BitqueryThrottledError(Exception):
+    """Bitquery rejected or timed out a request (HTTP 429, 5xx or timeout)"""
+
+
+class BitqueryTimeoutError(BitqueryThrottledError):
+    """A request, a concurrency-slot wait or a query deadline timed out"""
+
+
+class BitqueryGraphQLError(Exception):
+    """Bitquery answered with a GraphQL "errors" array"""
+
+
+class RowLimitError(Exception):
+    """A query returned as many rows as its limit, so its response may be truncated"""
+
+
+def endpoint_label(endpoint: str) -> str:
+    """Short label for an endpoint, used for flow control and stats"""
+    return "v1" if endpoint == BITQUERY_ENDPOINT_V1 else "v2"
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """True for transport errors that signal overload: 429, 5xx and timeouts"""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if httpx is not None and isinstance(error, (httpx.TimeoutException, httpx.NetworkError)):
+        return True
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def is_timeout_error(error: Exception) -> bool:
+    """True for transport-level timeouts"""
+    if isinstance(error, requests.exceptions.Timeout):
+        return True
+    return httpx is not None and isinstance(error, httpx.TimeoutException)
+
+
+def query_error_kind(error: Exception) -> str:
+    """Metrics label for a failed query: timeout, throttled or error"""
+    if isinstance(error, BitqueryTimeoutError):
+        return "timeout"
+    if isinstance(error, BitqueryThrottledError):
+        return "throttled"
+    return "error"
+
+
+def iter_response_rows(stream, path: str) -> Iterator[Dict]:
+    """Yield the rows of the array at `path` (e.g. "EVM.BalanceUpdates") as ijson parses them from a byte stream
+
+    Only one row is built at a time. A top-level "errors" array raises as
+    soon as it has been read.
+    """
+    row_prefix = f"data.{path}.item"
+    builder = None
+    depth = 0
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if builder is None:
+            if event not in ("start_map", "start_array") or prefix not in (row_prefix, "errors"):
+                continue
+            builder, target = ijson.ObjectBuilder(), prefix
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+        if depth == 0:
+            if target == "errors":
+                raise BitqueryGraphQLError(f"GraphQL errors: {builder.value}")
+            yield builder.value
+            builder = None
+
+
+def response_rows(data: Dict, path: str) -> Iterator[Dict]:
+    """Iterate the rows of the array at `path` in an already parsed response"""
+    rows = data
+    for key in path.split("."):
+        rows = rows.get(key) if isinstance(rows, dict) else None
+    return iter(rows or [])
+
+
+def limited_rows(rows: Iterable[Dict], limit: int, what: str) -> Iterator[Dict]:
+    """Yield rows, raising RowLimitError after the last one if there were `limit` or more
+
+    An unordered query that hits its limit silently drops rows, which would
+    undercount the affected wallets.
+    """
+    count = 0
+    for row in rows:
+        count += 1
+        yield row
+    if count >= limit:
+        raise RowLimitError(f"{what} returned {count} rows (limit {limit}); the response may be truncated")
+
+
 class BitqueryClient:
-    """Client for interacting with Bitquery GraphQL API"""
+    """Client for interacting with Bitquery GraphQL API
+
+    The client keeps one pooled, keep-alive HTTP session per endpoint and is
+    safe to share between threads, so a single long-lived instance should be
+    reused across score requests. With http2=True the sessions are built on
+    httpx (requires `pip install httpx[http2]`).
+
+    Each query family has a deadline covering all attempts. Throttling
+    failures (429, 5xx, timeouts) are retried with jittered exponential
+    backoff, and with hedge=True a duplicate request is sent once the first
+    has been outstanding longer than the family's observed p95 latency.
+    Hedges run on their own small pool (hedge_workers) and are skipped when
+    it is busy; the losing request is dropped before its body is read.
+    A recorder (see replay.FixtureRecorder) receives every successful
+    response, for offline replay. With stream=True (requires
+    `pip install ijson`), query_rows() parses large responses row by row
+    while they download instead of buffering the whole body.
+    """
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, query_cache: Optional[QueryCache] = None,
+                 pool_size: int = 10, keep_alive: bool = True, http2: bool = False,
+                 deadlines: Optional[Dict[str, float]] = None,
+                 retry_policy: Optional[RetryPolicy] = None, hedge: bool = False,
+                 recorder=None, stream: bool = False, hedge_workers: Optional[int] = None):
         self.api_key = api_key
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}",
         }
+        if not keep_alive:
+            self.headers["Connection"] = "close"
+        self.query_cache = query_cache
+        self.pool_size = pool_size
+        self.http2 = http2
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self.deadlines = dict(DEFAULT_QUERY_DEADLINES)
+        if deadlines:
+            self.deadlines.update(deadlines)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        # Hedged primaries and their backups run on separate pools, so a primary
+        # never queues behind backups; hedges beyond hedge_workers are skipped
+        self.hedge_workers = hedge_workers or max(1, pool_size // 4)
+        self._primary_executor = ThreadPoolExecutor(max_workers=pool_size) if hedge else None
+        self._hedge_executor = ThreadPoolExecutor(max_workers=self.hedge_workers) if hedge else None
+        self._hedge_slots = threading.BoundedSemaphore(self.hedge_workers)
+        self.recorder = recorder
+        if stream and (ijson is None or http2):
+            logger.warning("Streamed responses need ijson (pip install ijson) and HTTP/1.1; buffering responses instead")
+            stream = False
+        self.stream = stream
+        self._stats_lock = threading.Lock()
+        self.retries = 0
+        self.hedges = 0
+        # Identical queries already in flight are awaited instead of re-sent
+        self.single_flight = SingleFlight()
+    
+    @classmethod
+    def from_env(cls, api_key: str, query_cache: Optional[QueryCache] = None) -> "BitqueryClient":
+        """Build a client from BITQUERY_* environment variables"""
+        return cls(
+            api_key,
+            query_cache=query_cache,
+            pool_size=int(os.getenv("BITQUERY_POOL_SIZE", "10")),
+            keep_alive=os.getenv("BITQUERY_KEEPALIVE", "1").lower() not in ("0", "false", "no"),
+            http2=os.getenv("BITQUERY_HTTP2", "").lower() in ("1", "true", "yes"),
+            deadlines=query_deadlines_from_env(),
+            retry_policy=RetryPolicy.from_env(),
+            hedge=os.getenv("BITQUERY_HEDGE", "").lower() in ("1", "true", "yes"),
+            hedge_workers=int(os.getenv("BITQUERY_HEDGE_WORKERS", "0")) or None,
+            recorder=recorder_from_env(),
+            stream=os.getenv("BITQUERY_STREAM", "").lower() in ("1", "true", "yes"),
+        )
+    
+    def _session_for(self, endpoint: str):
+        """Return the pooled session for an endpoint, creating it on first use"""
+        session = self._sessions.get(endpoint)
+        if session is not None:
+            return session
+        with self._sessions_lock:
+            session = self._sessions.get(endpoint)
+            if session is None:
+                session = self._create_session()
+                self._sessions[endpoint] = session
+            return session
+    
+    def _create_session(self):
+        if self.http2:
+            if httpx is None:
+                raise Exception("HTTP/2 requested but httpx is not installed (pip install httpx[http2])")
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            return httpx.Client(http2=True, limits=limits)
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    def close(self):
+        """Close all pooled sessions"""
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+        if self._hedge_executor is not None:
+            self._primary_executor.shutdown(wait=False)
+            self._hedge_executor.shutdown(wait=False)
+    
+    def stats(self) -> Dict:
+        """Return retry, hedge and coalescing counters"""
+        with self._stats_lock:
+            return {"retries": self.retries, "hedges": self.hedges, "hedging_enabled": self.hedge,
+                    "coalesced": self.single_flight.stats()["coalesced"]}
+    
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def execute_query(self, query: str, variables: Optional[Dict] = None, endpoint: Optional[str] = None,
+                      family: Optional[str] = None) -> Tuple[Dict, float]:
+        """Execute a GraphQL query and return result with timing
+
+        family names the query family (e.g. "p1", "p4_erc20") and selects the
+        deadline and the TTL used by the query cache, if one is attached.
+        """
+        # Use v2 endpoint by default, or specified endpoint
+        endpoint = endpoint or BITQUERY_ENDPOINT_V2
+        key = QueryCache.make_key(endpoint, query, variables)
+        
+        if self.query_cache is None:
+            return self.single_flight.do(key, lambda: self._fetch(query, variables, endpoint, family))
+        
+        cached, state = self.query_cache.lookup(key, family)
+        if state == QueryCache.STALE:
+            self.query_cache.refresh_in_background(
+                key, lambda: self.single_flight.do(key, lambda: self._fetch(query, variables, endpoint, family))[0]
+            )
+        if cached is not None:
+            return cached, 0.0
+        
+        return self.single_flight.do(key, lambda: self._fetch_and_store(key, query, variables, endpoint, family))
+    
+    def query_rows(self, query: str, variables: Optional[Dict], endpoint: str, family: Optional[str],
+                   path: str, consume: Callable[[Iterator[Dict]], T]) -> Tuple[T, float]:
+        """Execute a query and return consume(rows) with timing, rows being the array at `path`
+
+        When streaming, consume() runs while the body downloads and sees one
+        row at a time. Streamed queries bypass the query cache and the
+        recorder, which both need the whole response, and are not hedged.
+        Otherwise the response is fetched by execute_query() as usual.
+        """
+        if not self.stream:
+            data, elapsed_time = self.execute_query(query, variables, endpoint=endpoint, family=family)
+            return consume(response_rows(data, path)), elapsed_time
+        key = (QueryCache.make_key(endpoint, query, variables), path, consume)
+        return self.single_flight.do(
+            key, lambda: self._fetch(query, variables, endpoint, family, stream=(path, consume))
+        )
+    
+    def _fetch_and_store(self, key: Tuple, query: str, variables: Optional[Dict], endpoint: str,
+                         family: Optional[str]) -> Tuple[Dict, float]:
+        data, elapsed_time = self._fetch(query, variables, endpoint, family)
+        self.query_cache.store(key, data)
+        return data, elapsed_time
+    
+    def _fetch(self, query: str, variables: Optional[Dict], endpoint: str,
+               family: Optional[str], stream: Optional[Tuple[str, Callable]] = None) -> Tuple[Dict, float]:
+        """Run a query within its family deadline, retrying throttling failures
+
+        stream is a (path, consume) pair for a streamed query (see query_rows).
+        """
+        deadline = time.monotonic() + self.deadlines.get(family, DEFAULT_QUERY_DEADLINE)
+        labels = {"family": metrics.family_label(family), "endpoint": endpoint_label(endpoint)}
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise BitqueryTimeoutError(f"API request failed: {family or 'query'} deadline exceeded")
+                if stream is None:
+                    data, elapsed_time = self._attempt(query, variables, endpoint, family, remaining)
+                else:
+                    data, elapsed_time = self._post_query(query, variables, endpoint, remaining, stream)
+            except BitqueryThrottledError as e:
+                delay = self.retry_policy.delay(attempt)
+                if (remaining <= 0 or attempt >= self.retry_policy.max_retries
+                        or time.monotonic() + delay >= deadline):
+                    metrics.QUERY_ERRORS.inc(kind=query_error_kind(e), **labels)
+                    raise
+                attempt += 1
+                self._count("retries")
+                metrics.QUERY_RETRIES.inc(**labels)
+                time.sleep(delay)
+                continue
+            except Exception as e:
+                metrics.QUERY_ERRORS.inc(kind=query_error_kind(e), **labels)
+                raise
+            self.latency.record(family, elapsed_time)
+            metrics.QUERY_DURATION.observe(elapsed_time, **labels)
+            if self.recorder is not None and stream is None:
+                self.recorder.record(labels["endpoint"], query, variables, family, data, elapsed_time)
+            return data, elapsed_time
+    
+    def _attempt(self, query: str, variables: Optional[Dict], endpoint: str,
+                 family: Optional[str], timeout: float) -> Tuple[Dict, float]:
+        """One attempt, hedged with a duplicate request once it outlives the p95 latency"""
+        hedge_after = self.latency.percentile(family) if self.hedge else None
+        if hedge_after is None or hedge_after >= timeout:
+            return self._post_query(query, variables, endpoint, timeout)
+        
+        # Set once one request has won, so the other is dropped before reading its body
+        abandon = threading.Event()
+        primary = self._primary_executor.submit(self._post_query, query, variables, endpoint, timeout,
+                                                None, abandon)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        if not self._hedge_slots.acquire(blocking=False):
+            # Every hedge slot is busy: wait for the primary instead of adding load
+            return primary.result()
+        
+        self._count("hedges")
+        metrics.QUERY_HEDGES.inc(family=metrics.family_label(family), endpoint=endpoint_label(endpoint))
+        try:
+            backup = self._hedge_executor.submit(self._post_query, query, variables, endpoint,
+                                                 timeout - hedge_after, None, abandon)
+        except RuntimeError:
+            self._hedge_slots.release()
+            return primary.result()
+        backup.add_done_callback(lambda future: self._hedge_slots.release())
+        errors = []
+        try:
+            for future in as_completed([primary, backup]):
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(e)
+        finally:
+            abandon.set()
+        raise errors[0]
     
-    def execute_query(self, query: str, variables: Optional[Dict] = None, endpoint: Optional[str] = None) -> Tuple[Dict, float]:
-        """Execute a GraphQL query and return result with timing"""
+    def _post_query(self, query: str, variables: Optional[Dict], endpoint: str,
+                    timeout: float = DEFAULT_QUERY_DEADLINE,
+                    stream: Optional[Tuple[str, Callable]] = None,
+                    abandon: Optional[threading.Event] = None) -> Tuple[Dict, float]:
+        """Send a GraphQL query to Bitquery, bypassing the query cache
+
+        Every request passes the endpoint's shared rate limiter and AIMD
+        concurrency governor; throttling responses shrink the governor.
+        With stream=(path, consume), returns consume() over the streamed rows.
+        A hedged request whose abandon event is set is not sent, or is closed
+        as soon as its headers arrive, without reading the body.
+        """
         payload = {
             "query": query,
             "variables": variables or {}
         }
         
-        # Use v2 endpoint by default, or specified endpoint
-        endpoint = endpoint or BITQUERY_ENDPOINT_V2
+        label = endpoint_label(endpoint)
+        flow = flow_control_for(label)
+        flow.bucket.acquire()
+        if not flow.governor.acquire(timeout):
+            raise BitqueryTimeoutError("API request failed: timed out waiting for a concurrency slot")
+        throttled = False
+        if abandon is not None and abandon.is_set():
+            flow.governor.release()
+            raise Exception("Hedged request abandoned: the other request already answered")
         
+        metrics.REQUESTS_IN_FLIGHT.inc(endpoint=label)
         start_time = time.time()
         try:
-            response = requests.post(
+            if stream is not None:
+                path, consume = stream
+                response = self._session_for(endpoint).post(
+                    endpoint,
+                    json=payload,
+                    headers=self.headers,
+                    timeout=timeout,
+                    stream=True
+                )
+                try:
+                    response.raise_for_status()
+                    # Decompress on the fly so ijson reads the JSON text
+                    response.raw.decode_content = True
+                    result = consume(iter_response_rows(response.raw, path))
+                finally:
+                    # A consumer that stopped early leaves the rest of the body unread
+                    response.close()
+                return result, time.time() - start_time
+            
+            # Hedged requests defer the body so the loser can drop it unread (requests only)
+            defer_body = abandon is not None and not self.http2
+            response = self._session_for(endpoint).post(
                 endpoint,
                 json=payload,
                 headers=self.headers,
-                timeout=200
+                timeout=timeout,
+                **({"stream": True} if defer_body else {})
             )
+            if abandon is not None and abandon.is_set():
+                response.close()
+                raise Exception("Hedged request abandoned: the other request already answered")
             response.raise_for_status()
             data = response.json()
             
@@ -166,155 +585,379 @@ class BitqueryClient:
             
             if "errors" in data:
                 error_msg = str(data['errors'])
-                raise Exception(f"GraphQL errors: {error_msg}")
+                raise BitqueryGraphQLError(f"GraphQL errors: {error_msg}")
             
             return data.get("data", {}), elapsed_time
-        except requests.exceptions.RequestException as e:
+        except (BitqueryGraphQLError, RowLimitError):
+            # Raised by Bitquery or by a streamed consumer; callers tell these apart by type
+            raise
+        except TRANSPORT_ERRORS as e:
             elapsed_time = time.time() - start_time
+            if is_throttling_error(e):
+                throttled = True
+                error_class = BitqueryTimeoutError if is_timeout_error(e) else BitqueryThrottledError
+                raise error_class(f"API request failed: {str(e)}")
             raise Exception(f"API request failed: {str(e)}")
         except Exception as e:
             elapsed_time = time.time() - start_time
             # Re-raise with proper error message
             raise Exception(f"Query execution failed: {str(e)}")
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec(endpoint=label)
+            flow.governor.release(throttled=throttled)
+
+
+# Pillar saturation points: each pillar scores 100 at (and above) these values
+P1_SATURATION = 100  # transactions
+P2_SATURATION = 5  # activity types
+P3_SATURATION = 8  # protocols
+P4_SATURATION = 15  # assets
 
 
 def calculate_p1_score(tx_count: int) -> float:
     """Calculate P1 score based on transaction count"""
     if tx_count <= 10:
         return 0.0
-    if tx_count >= 100:
+    if tx_count >= P1_SATURATION:
         return 100.0
     
     # Linear interpolation between 10 and 100
-    return min(100.0, ((tx_count - 10) / (100 - 10)) * 100.0)
+    return min(100.0, ((tx_count - 10) / (P1_SATURATION - 10)) * 100.0)
 
 
 def calculate_p2_score(unique_types: int) -> float:
     """Calculate P2 score based on unique transaction types"""
     if unique_types <= 1:
         return 0.0
-    if unique_types >= 5:
+    if unique_types >= P2_SATURATION:
         return 100.0
     
     # Linear interpolation between 1 and 5
-    return min(100.0, ((unique_types - 1) / (5 - 1)) * 100.0)
+    return min(100.0, ((unique_types - 1) / (P2_SATURATION - 1)) * 100.0)
 
 
 def calculate_p3_score(unique_protocols: int) -> float:
     """Calculate P3 score based on unique protocols used"""
     if unique_protocols <= 1:
         return 0.0
-    if unique_protocols >= 8:
+    if unique_protocols >= P3_SATURATION:
         return 100.0
     
     # Linear interpolation between 1 and 8
-    return min(100.0, ((unique_protocols - 1) / (8 - 1)) * 100.0)
+    return min(100.0, ((unique_protocols - 1) / (P3_SATURATION - 1)) * 100.0)
 
 
 def calculate_p4_score(unique_assets: int) -> float:
     """Calculate P4 score based on unique assets held"""
     if unique_assets <= 1:
         return 0.0
-    if unique_assets >= 15:
+    if unique_assets >= P4_SATURATION:
         return 100.0
     
     # Linear interpolation between 1 and 15
-    return min(100.0, ((unique_assets - 1) / (15 - 1)) * 100.0)
-
-
-def get_p1_transaction_count(client: BitqueryClient, address: str, time_3yr_ago: str) -> Tuple[int, float]:
-    """Get transaction count for P1 using v1 API"""
-    query = """
-    query MyQuery($address: String, $time3yr_ago: ISO8601DateTime) {
-      ethereum {
-        transactions(
-          txSender: {is: $address}
-          time: {since: $time3yr_ago}
-        ) {
-          count
+    return min(100.0, ((unique_assets - 1) / (P4_SATURATION - 1)) * 100.0)
+
+
+# Bounded ("saturation") mode: P1 and P4 only check whether the cap is reached,
+# so counts at the cap are lower bounds. Exact counts need detail=True.
+SATURATION_QUERIES = os.getenv("SATURATION_QUERIES", "false").lower() in ("1", "true", "yes", "on")
+
+
+def use_bounded_queries(detail: Optional[bool] = None) -> bool:
+    """Whether a score should use bounded queries: detail=True forces exact counts, None follows SATURATION_QUERIES"""
+    return SATURATION_QUERIES if detail is None else not detail
+
+
+P1_QUERY = """
+query MyQuery($address: String, $time3yr_ago: ISO8601DateTime) {
+  ethereum {
+    transactions(
+      txSender: {is: $address}
+      time: {since: $time3yr_ago}
+    ) {
+      count
+    }
+  }
+}
+"""
+
+# Bounded P1: lists at most $limit transaction hashes instead of counting the whole history
+P1_BOUNDED_QUERY = """
+query MyQuery($address: String, $time3yr_ago: ISO8601DateTime, $limit: Int) {
+  ethereum {
+    transactions(
+      txSender: {is: $address}
+      time: {since: $time3yr_ago}
+      options: {limit: $limit}
+    ) {
+      hash
+    }
+  }
+}
+"""
+
+P2_P3_QUERY = """
+query MyQuery($time3yr_ago: ISO8601DateTime, $protocols: [String!], $address: String) {
+  ethereum(network: ethereum) {
+    smartContractCalls(
+      txFrom: {is: $address}
+      smartContractAddress: {in: $protocols}
+      time: {since: $time3yr_ago}
+    ) {
+      smartContract {
+        address {
+          address
         }
       }
+      txc: count
     }
-    """
-    
-    variables = {
-        "address": address,
-        "time3yr_ago": time_3yr_ago
+  }
+}
+"""
+
+# Query: https://ide.bitquery.io/Get-DEX-swaps-and-NFT-trading-activity-using-v2-API
+DEX_NFT_QUERY = """
+query TraderDexMarketsEvm($network: evm_network!, $trader: String!) {
+  EVM(network: $network) {
+    DEXTradeByTokens(
+      where: {TransactionStatus: {Success: true}, Block: {Time: {since_relative: {years_ago: 3}}}, any: [{Trade: {Seller: {is: $trader}}}, {Trade: {Buyer: {is: $trader}}}]}
+    ) {
+      dex_count_fungible: count(
+        distinct: Trade_Dex_ProtocolName
+        if: {Trade: {Currency: {Fungible: true}}}
+      )
+      dex_count_nonfungible: count(
+        distinct: Trade_Dex_ProtocolName
+        if: {Trade: {Currency: {Fungible: false}}}
+      )
     }
-    
-    print(f"\n  [DEBUG] P1 Transaction Count Query (v1 API) for address: {address}")
-    print(f"  [DEBUG] Time filter: {time_3yr_ago}")
-    
-    try:
-        data, elapsed_time = client.execute_query(query, variables, endpoint=BITQUERY_ENDPOINT_V1)
-    except Exception as e:
-        print(f"  [DEBUG] Error executing P1 query: {str(e)}")
-        return 0, 0.0
-    
-    # Debug: Print raw response
-    import json
-    print(f"  [DEBUG] P1 Raw API Response:")
-    print(f"  {json.dumps(data, indent=2)}")
-    print(f"  [DEBUG] P1 Query took: {elapsed_time:.2f}s")
+  }
+}
+"""
+
+GOVERNANCE_QUERY = """
+query MyQuery($address: String) {
+  EVM(network: eth, dataset: combined) {
+    Calls(
+      where: {Block: {Time: {since_relative: {years_ago: 3}}}, Call: {Signature: {Name: {includesCaseInsensitive: "vote"}}}, Transaction:{From:{is:$address}}, TransactionStatus: {Success: true}}
+    ) {
+      count
+    }
+  }
+}
+"""
+
+# Existence check: returns at most one vote call instead of counting them all
+GOVERNANCE_EXISTS_QUERY = """
+query MyQuery($address: String) {
+  EVM(network: eth, dataset: combined) {
+    Calls(
+      limit: {count: 1}
+      where: {Block: {Time: {since_relative: {years_ago: 3}}}, Call: {Signature: {Name: {includesCaseInsensitive: "vote"}}}, Transaction:{From:{is:$address}}, TransactionStatus: {Success: true}}
+    ) {
+      Transaction {
+        Hash
+      }
+    }
+  }
+}
+"""
+
+# "exists" (default) stops at the first vote call; "count" counts all of them
+GOVERNANCE_QUERY_MODE = os.getenv("GOVERNANCE_QUERY_MODE", "exists").lower()
+
+# Get ERC-20 tokens with balance > $10 using BalanceUpdates
+P4_ERC20_QUERY = """
+query MyQuery($address: String) {
+  EVM(network: eth, dataset: combined) {
+    BalanceUpdates(
+      orderBy: {descendingByField: "Balance_usd"}
+      where: {BalanceUpdate: {Address: {is: $address}}, Currency: {Fungible: true}}
+    ) {
+      BalanceUpdate {
+        Address
+      }
+      Currency{
+        Name
+        Symbol
+        SmartContract
+      }
+      Balance:sum(of:BalanceUpdate_Amount selectWhere:{gt:"0"})
+      Balance_usd:sum(of:BalanceUpdate_AmountInUSD selectWhere:{ge:"10"})
+    }
+  }
+}
+"""
+
+# Get NFT balances
+P4_NFT_QUERY = """
+query MyQuery($address: String) {
+  EVM(dataset: combined, network: eth) {
+    BalanceUpdates(
+      where: {BalanceUpdate: {Address: {is: $address}}, Currency: {Fungible: false}}
+      orderBy: {descendingByField: "balance"}
+    ) {
+      Currency {
+        Name
+        Symbol
+        SmartContract
+      }
+      balance: sum(of: BalanceUpdate_Amount)
+    }
+  }
+}
+"""
+
+# Aggregate-mode P4 ERC-20 query: only the fields the count needs, one row per token
+P4_ERC20_TOKENS_QUERY = """
+query MyQuery($address: String) {
+  EVM(network: eth, dataset: combined) {
+    BalanceUpdates(
+      where: {BalanceUpdate: {Address: {is: $address}}, Currency: {Fungible: true}}
+    ) {
+      Currency{
+        SmartContract
+      }
+      Balance_usd:sum(of:BalanceUpdate_AmountInUSD selectWhere:{ge:"10"})
+    }
+  }
+}
+"""
+
+# Bounded P4 ERC-20 query: only the largest $limit balances, and only the fields the count needs
+P4_ERC20_LIMITED_QUERY = """
+query MyQuery($address: String, $limit: Int) {
+  EVM(network: eth, dataset: combined) {
+    BalanceUpdates(
+      limit: {count: $limit}
+      orderBy: {descendingByField: "Balance_usd"}
+      where: {BalanceUpdate: {Address: {is: $address}}, Currency: {Fungible: true}}
+    ) {
+      Currency{
+        SmartContract
+      }
+      Balance_usd:sum(of:BalanceUpdate_AmountInUSD selectWhere:{ge:"10"})
+    }
+  }
+}
+"""
+
+P4_NFT_BOUNDED_QUERY = """
+query MyQuery($address: String, $limit: Int) {
+  EVM(dataset: combined, network: eth) {
+    BalanceUpdates(
+      limit: {count: $limit}
+      where: {BalanceUpdate: {Address: {is: $address}}, Currency: {Fungible: false}}
+      orderBy: {descendingByField: "balance"}
+    ) {
+      Currency {
+        SmartContract
+      }
+      balance: sum(of: BalanceUpdate_Amount)
+    }
+  }
+}
+"""
+
+# Server-side NFT total: a single summed row however many NFTs the wallet holds
+P4_NFT_TOTAL_QUERY = """
+query MyQuery($address: String) {
+  EVM(dataset: combined, network: eth) {
+    BalanceUpdates(
+      where: {BalanceUpdate: {Address: {is: $address}}, Currency: {Fungible: false}}
+    ) {
+      balance: sum(of: BalanceUpdate_Amount)
+    }
+  }
+}
+"""
+
+# "aggregate" (default) sums NFTs server-side into one row and trims the ERC-20
+# rows to the contract and the $10-filtered USD sum; "rows" downloads every
+# balance row with all its fields. The ERC-20 side cannot be a server-side
+# count: the $10 threshold applies to each token's summed balance, and
+# Bitquery cannot count groups by an aggregate. So aggregate mode still lists
+# one row per token held, uncapped unless the request is bounded, so exact
+# requests get exact counts.
+P4_QUERY_MODE = os.getenv("P4_QUERY_MODE", "aggregate").lower()
+
+
+def parse_p1_response(data: Dict) -> int:
+    """Extract the transaction count from a P1 response"""
+    log_payload(logger, "P1", data)
     
     try:
         count = data.get("ethereum", {}).get("transactions", [{}])[0].get("count", 0)
         tx_count = int(count) if count else 0
-        print(f"  [DEBUG] Transaction count: {tx_count}")
-        return tx_count, elapsed_time
+        logger.debug("Transaction count: %s", tx_count)
+        return tx_count
     except (KeyError, IndexError, ValueError) as e:
-        print(f"  [DEBUG] Error parsing P1 data: {e}")
-        return 0, elapsed_time
+        logger.warning("Error parsing P1 data: %s", e)
+        return 0
 
 
-def get_p2_p3_data(client: BitqueryClient, address: str, time_3yr_ago: str) -> Tuple[Set[str], Set[str], float]:
-    """Get transaction types and protocols for P2 and P3 using v1 API"""
-    query = """
-    query MyQuery($time3yr_ago: ISO8601DateTime, $protocols: [String!], $address: String) {
-      ethereum(network: ethereum) {
-        smartContractCalls(
-          txFrom: {is: $address}
-          smartContractAddress: {in: $protocols}
-          time: {since: $time3yr_ago}
-        ) {
-          smartContract {
-            address {
-              address
-            }
-          }
-          txc: count
-        }
-      }
-    }
+def parse_p1_bounded_response(data: Dict) -> int:
+    """Count the transactions listed by a bounded P1 response (at most P1_SATURATION)"""
+    log_payload(logger, "P1 bounded", data)
+    transactions = (data.get("ethereum") or {}).get("transactions") or []
+    logger.debug("Bounded transaction count: %d", len(transactions))
+    return len(transactions)
+
+
+def p1_query_request(address: str, time_3yr_ago: str, bounded: bool = False) -> Tuple[str, Dict, Callable[[Dict], int]]:
+    """(query, variables, parser) for the full or bounded P1 query"""
+    variables = {"address": address, "time3yr_ago": time_3yr_ago}
+    if bounded:
+        return P1_BOUNDED_QUERY, dict(variables, limit=P1_SATURATION), parse_p1_bounded_response
+    return P1_QUERY, variables, parse_p1_response
+
+
+def get_p1_transaction_count(client: BitqueryClient, address: str, time_3yr_ago: str,
+                             bounded: bool = False) -> Tuple[int, float]:
+    """Get transaction count for P1 using v1 API
+
+    bounded lists at most P1_SATURATION transactions instead of counting
+    them all, so a busy wallet reports exactly the cap.
     """
+    query, variables, parse = p1_query_request(address, time_3yr_ago, bounded)
     
-    variables = {
-        "address": address,
-        "protocols": ALL_PROTOCOL_ADDRESSES,
-        "time3yr_ago": time_3yr_ago
-    }
-    
-    print(f"\n  [DEBUG] P2/P3 Query (v1 API) - Checking {len(ALL_PROTOCOL_ADDRESSES)} protocol addresses")
-    print(f"  [DEBUG] Time filter: {time_3yr_ago}")
+    logger.debug("P1 transaction count query (v1 API%s) for %s since %s",
+                 ", bounded" if bounded else "", address, time_3yr_ago)
     
     try:
-        data, elapsed_time = client.execute_query(query, variables, endpoint=BITQUERY_ENDPOINT_V1)
+        data, elapsed_time = client.execute_query(query, variables, endpoint=BITQUERY_ENDPOINT_V1, family="p1")
     except Exception as e:
-        print(f"  [DEBUG] Error executing P2/P3 query: {str(e)}")
-        return set(), set(), 0.0
+        logger.debug("Error executing P1 query: %s", e)
+        raise
     
-    # Debug: Print raw response
-    import json
-    print(f"  [DEBUG] P2/P3 Raw API Response:")
-    print(f"  {json.dumps(data, indent=2)}")
-    print(f"  [DEBUG] P2/P3 Query took: {elapsed_time:.2f}s")
+    logger.debug("P1 query took %.2fs", elapsed_time)
+    return parse(data), elapsed_time
+
+
+def classify_protocol(protocol_address_lower: str, registry: Optional[ProtocolRegistry] = None) -> Optional[str]:
+    """Return the P2 activity type for a lowercased protocol address, or None
+
+    An address registered under several categories returns one of them; use
+    ProtocolRegistry.activity_types() to get all of them.
+    """
+    registry = registry or PROTOCOLS.current()
+    return min(registry.activity_types(protocol_address_lower), default=None)
+
+
+def parse_p2_p3_response(data: Dict, registry: Optional[ProtocolRegistry] = None) -> Tuple[Set[str], Set[str]]:
+    """Extract (activity_types, interacted_protocols) from a P2/P3 response"""
+    log_payload(logger, "P2/P3", data)
+    registry = registry or PROTOCOLS.current()
+    # Checked once so the per-row loop does no logging work when DEBUG is off
+    debug = logger.isEnabledFor(logging.DEBUG)
     
     interacted_protocols = set()
     activity_types = set()
     
     try:
         calls = data.get("ethereum", {}).get("smartContractCalls", [])
-        print(f"  [DEBUG] Found {len(calls)} protocol interactions")
+        if debug:
+            logger.debug("Found %d protocol interactions", len(calls))
         
         for call in calls:
             protocol_address = call.get("smartContract", {}).get("address", {}).get("address", "")
@@ -324,74 +967,187 @@ def get_p2_p3_data(client: BitqueryClient, address: str, time_3yr_ago: str) -> T
                 protocol_address_lower = protocol_address.lower()
                 interacted_protocols.add(protocol_address_lower)
                 
-                print(f"    → Protocol: {protocol_address_lower} ({tx_count} transactions)")
-                
-                # Determine activity type based on protocol (check lowercase)
-                if any(addr.lower() == protocol_address_lower for addr in PROTOCOL_ADDRESSES["lending"]):
-                    activity_types.add("Lending")
-                    print(f"      ✓ Categorized as: Lending")
-                elif any(addr.lower() == protocol_address_lower for addr in PROTOCOL_ADDRESSES["staking"]):
-                    activity_types.add("Staking")
-                    print(f"      ✓ Categorized as: Staking")
-                elif any(addr.lower() == protocol_address_lower for addr in PROTOCOL_ADDRESSES["liquidity"]):
-                    activity_types.add("Liquidity")
-                    print(f"      ✓ Categorized as: Liquidity")
-                elif any(addr.lower() == protocol_address_lower for addr in PROTOCOL_ADDRESSES["bridging"]):
-                    activity_types.add("Bridging")
-                    print(f"      ✓ Categorized as: Bridging")
-                elif any(addr.lower() == protocol_address_lower for addr in PROTOCOL_ADDRESSES["yield_farming"]):
-                    activity_types.add("Yield Farming")
-                    print(f"      ✓ Categorized as: Yield Farming")
-                else:
-                    print(f"      ⚠ Not categorized (not in protocol list)")
+                # Determine activity types based on protocol (constant-time registry lookup)
+                protocol_types = registry.activity_types(protocol_address_lower)
+                activity_types.update(protocol_types)
+                if debug:
+                    logger.debug("Protocol %s (%s transactions): %s", protocol_address_lower, tx_count,
+                                 ", ".join(sorted(protocol_types)) or "not categorized")
     except (KeyError, TypeError) as e:
-        print(f"  [DEBUG] Error parsing P2/P3 data: {e}")
+        logger.warning("Error parsing P2/P3 data: %s", e)
     
-    print(f"  [DEBUG] Final P2 Activity Types: {list(activity_types)}")
-    print(f"  [DEBUG] Final P3 Protocols Count: {len(interacted_protocols)}")
-    print(f"  [DEBUG] P3 Protocol Addresses: {list(interacted_protocols)}")
+    if debug:
+        logger.debug("P2 activity types: %s; P3 protocols (%d): %s",
+                     sorted(activity_types), len(interacted_protocols), sorted(interacted_protocols))
     
-    return activity_types, interacted_protocols, elapsed_time
+    return activity_types, interacted_protocols
 
 
-def get_dex_and_nft_activity(client: BitqueryClient, address: str) -> Tuple[int, int, Set[str], float]:
-    """Get DEX swaps and NFT trading activity using v2 API
-    Returns: (dex_count_fungible, dex_count_nonfungible, dex_protocols, elapsed_time)
-    Query: https://ide.bitquery.io/Get-DEX-swaps-and-NFT-trading-activity-using-v2-API
+class P2P3Sharding:
+    """Splits the P2/P3 protocol whitelist into shards queried concurrently.
+
+    mode "category" makes one shard per registry category. mode "chunks"
+    makes `count` near-equal chunks; when adaptive, the count doubles
+    whenever the slowest shard exceeds target_latency (or a shard fails)
+    and steps back down while the slowest shard stays under half of it, so
+    the critical path tracks the widest shard rather than the whole list.
     """
-    query = """
-    query TraderDexMarketsEvm($network: evm_network!, $trader: String!) {
-      EVM(network: $network) {
-        DEXTradeByTokens(
-          where: {TransactionStatus: {Success: true}, Block: {Time: {since_relative: {years_ago: 3}}}, any: [{Trade: {Seller: {is: $trader}}}, {Trade: {Buyer: {is: $trader}}}]}
-        ) {
-          dex_count_fungible: count(
-            distinct: Trade_Dex_ProtocolName
-            if: {Trade: {Currency: {Fungible: true}}}
-          )
-          dex_count_nonfungible: count(
-            distinct: Trade_Dex_ProtocolName
-            if: {Trade: {Currency: {Fungible: false}}}
-          )
-        }
-      }
-    }
+
+    def __init__(self, mode: str = "chunks", count: int = 4, adaptive: bool = True,
+                 min_shards: int = 1, max_shards: int = 16, target_latency: float = 10.0):
+        if mode not in ("category", "chunks"):
+            raise ValueError(f"Unknown P2/P3 sharding mode: {mode}")
+        self.mode = mode
+        self.adaptive = adaptive and mode == "chunks"
+        self.min_shards = max(1, min_shards)
+        self.max_shards = max(self.min_shards, max_shards)
+        self.count = max(self.min_shards, min(count, self.max_shards))
+        self.target_latency = target_latency
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.grown = 0
+        self.shrunk = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["P2P3Sharding"]:
+        """Build from P2_P3_SHARDING ("off", "category", "adaptive" or a fixed shard count); None when off"""
+        setting = os.getenv("P2_P3_SHARDING", "off").strip().lower()
+        if setting in ("", "off", "0", "1"):
+            return None
+        max_shards = int(os.getenv("P2_P3_MAX_SHARDS", "16"))
+        target_latency = float(os.getenv("P2_P3_SHARD_TARGET_LATENCY", "10"))
+        if setting == "category":
+            return cls(mode="category", adaptive=False, target_latency=target_latency)
+        if setting == "adaptive":
+            return cls(mode="chunks", count=int(os.getenv("P2_P3_SHARDS", "4")), adaptive=True,
+                       max_shards=max_shards, target_latency=target_latency)
+        count = int(setting)
+        return cls(mode="chunks", count=count, adaptive=False, max_shards=max(count, max_shards),
+                   target_latency=target_latency)
+
+    def shards(self, registry: ProtocolRegistry) -> List[List[str]]:
+        """Partition the registry's addresses; every address lands in exactly one shard"""
+        if self.mode == "category":
+            placed = set()
+            shards = []
+            for addresses in registry.addresses_by_category().values():
+                shard = [a for a in addresses if a.lower() not in placed]
+                placed.update(a.lower() for a in shard)
+                if shard:
+                    shards.append(shard)
+            return shards
+        addresses = list(registry.addresses)
+        count = max(1, min(self.count, len(addresses)))
+        size, extra = divmod(len(addresses), count)
+        shards, start = [], 0
+        for i in range(count):
+            end = start + size + (1 if i < extra else 0)
+            shards.append(addresses[start:end])
+            start = end
+        return shards
+
+    def observe(self, slowest: float, failed: bool = False):
+        """Adapt the shard count to the slowest shard of the last sharded query"""
+        with self._lock:
+            self.queries += 1
+            if not self.adaptive:
+                return
+            if failed or slowest > self.target_latency:
+                if self.count < self.max_shards:
+                    self.count = min(self.max_shards, self.count * 2)
+                    self.grown += 1
+            elif slowest < self.target_latency / 2 and self.count > self.min_shards:
+                self.count -= 1
+                self.shrunk += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "adaptive": self.adaptive,
+                "shards": self.count if self.mode == "chunks" else None,
+                "target_latency": self.target_latency,
+                "queries": self.queries,
+                "grown": self.grown,
+                "shrunk": self.shrunk,
+            }
+
+
+# Optional sharding of the full-window P2/P3 query (P2_P3_SHARDING)
+P2_P3_SHARDING = P2P3Sharding.from_env()
+
+
+def merge_p2_p3_shards(parsed: List[Tuple[Set[str], Set[str]]]) -> Tuple[Set[str], Set[str]]:
+    """Union per-shard (activity_types, interacted_protocols)"""
+    activity_types, interacted_protocols = set(), set()
+    for shard_types, shard_protocols in parsed:
+        activity_types.update(shard_types)
+        interacted_protocols.update(shard_protocols)
+    return activity_types, interacted_protocols
+
+
+def get_p2_p3_data_sharded(client: BitqueryClient, address: str, time_3yr_ago: str,
+                           registry: ProtocolRegistry,
+                           sharding: P2P3Sharding) -> Tuple[Set[str], Set[str], float]:
+    """Run the P2/P3 query as concurrent per-shard sub-queries and merge the results
+
+    Any failed shard fails the family, since a partial union would
+    silently undercount. The reported time is the slowest shard's.
     """
+    shards = sharding.shards(registry)
+    logger.debug("P2/P3 query (v1 API) for %s in %d shards (%s)", address, len(shards), sharding.mode)
     
-    variables = {"network": "eth", "trader": address}
-    print(f"\n  [DEBUG] DEX/NFT Query (v2 API) for address: {address}")
+    def run_shard(shard: List[str]):
+        variables = {"address": address, "protocols": shard, "time3yr_ago": time_3yr_ago}
+        return client.execute_query(P2_P3_QUERY, variables, endpoint=BITQUERY_ENDPOINT_V1, family="p2_p3")
+    
+    with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="p2p3-shard") as executor:
+        futures = [executor.submit(run_shard, shard) for shard in shards]
+        wait(futures)
+    
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    timings = [future.result()[1] for future in futures if future.exception() is None]
+    slowest = max(timings, default=0.0)
+    sharding.observe(slowest, failed=bool(errors))
+    if errors:
+        raise errors[0]
+    
+    logger.debug("P2/P3 sharded query took %.2fs (slowest of %d shards)", slowest, len(shards))
+    activity_types, interacted_protocols = merge_p2_p3_shards(
+        [parse_p2_p3_response(future.result()[0], registry) for future in futures]
+    )
+    return activity_types, interacted_protocols, slowest
+
+
+def get_p2_p3_data(client: BitqueryClient, address: str, time_3yr_ago: str,
+                   registry: Optional[ProtocolRegistry] = None) -> Tuple[Set[str], Set[str], float]:
+    """Get transaction types and protocols for P2 and P3 using v1 API"""
+    registry = registry or PROTOCOLS.current()
+    if P2_P3_SHARDING is not None:
+        return get_p2_p3_data_sharded(client, address, time_3yr_ago, registry, P2_P3_SHARDING)
+    variables = {
+        "address": address,
+        "protocols": list(registry.addresses),
+        "time3yr_ago": time_3yr_ago
+    }
+    
+    logger.debug("P2/P3 query (v1 API) for %s: checking %d protocol addresses since %s",
+                 address, len(registry.addresses), time_3yr_ago)
     
     try:
-        data, elapsed_time = client.execute_query(query, variables, endpoint=BITQUERY_ENDPOINT_V2)
+        data, elapsed_time = client.execute_query(P2_P3_QUERY, variables, endpoint=BITQUERY_ENDPOINT_V1, family="p2_p3")
     except Exception as e:
-        print(f"  [DEBUG] Error executing DEX/NFT query: {str(e)}")
-        return 0, 0, set(), 0.0
+        logger.debug("Error executing P2/P3 query: %s", e)
+        raise
     
-    # Debug: Print raw response
-    import json
-    print(f"  [DEBUG] DEX/NFT Raw API Response:")
-    print(f"  {json.dumps(data, indent=2)}")
-    print(f"  [DEBUG] DEX/NFT Query took: {elapsed_time:.2f}s")
+    logger.debug("P2/P3 query took %.2fs", elapsed_time)
+    activity_types, interacted_protocols = parse_p2_p3_response(data, registry)
+    return activity_types, interacted_protocols, elapsed_time
+
+
+def parse_dex_nft_response(data: Dict) -> Tuple[int, int, Set[str]]:
+    """Extract (dex_count_fungible, dex_count_nonfungible, dex_protocols) from a DEX/NFT response"""
+    log_payload(logger, "DEX/NFT", data)
     
     dex_count_fungible = 0
     dex_count_nonfungible = 0
@@ -422,239 +1178,768 @@ def get_dex_and_nft_activity(client: BitqueryClient, address: str) -> Tuple[int,
             for i in range(dex_count_nonfungible):
                 dex_protocols.add(f"dex_nft_{i+1}")
         
-        print(f"  [DEBUG] DEX Count (Fungible): {dex_count_fungible}")
-        print(f"  [DEBUG] NFT Count (Non-Fungible): {dex_count_nonfungible}")
-        print(f"  [DEBUG] DEX Protocols: {list(dex_protocols)}")
-        
-        if dex_count_fungible > 0:
-            print(f"  [DEBUG] ✓ DEX Swaps detected!")
-        else:
-            print(f"  [DEBUG] ✗ No DEX swaps found")
-            
-        if dex_count_nonfungible > 0:
-            print(f"  [DEBUG] ✓ NFT Trading detected!")
-        else:
-            print(f"  [DEBUG] ✗ No NFT trading found")
+        logger.debug("DEX count (fungible): %d, NFT count (non-fungible): %d",
+                     dex_count_fungible, dex_count_nonfungible)
     except (KeyError, IndexError, TypeError) as e:
-        print(f"  [DEBUG] Error parsing DEX/NFT data: {e}")
+        logger.warning("Error parsing DEX/NFT data: %s", e)
     
-    return dex_count_fungible, dex_count_nonfungible, dex_protocols, elapsed_time
+    return dex_count_fungible, dex_count_nonfungible, dex_protocols
 
 
-def get_governance_activity(client: BitqueryClient, address: str) -> Tuple[bool, float]:
-    """Check for governance activity using v2 API"""
-    query = """
-    query MyQuery($address: String) {
-      EVM(network: eth, dataset: combined) {
-        Calls(
-          where: {Block: {Time: {since_relative: {years_ago: 3}}}, Call: {Signature: {Name: {includesCaseInsensitive: "vote"}}}, Transaction:{From:{is:$address}}, TransactionStatus: {Success: true}}
-        ) {
-          count
-        }
-      }
-    }
+def get_dex_and_nft_activity(client: BitqueryClient, address: str) -> Tuple[int, int, Set[str], float]:
+    """Get DEX swaps and NFT trading activity using v2 API
+    Returns: (dex_count_fungible, dex_count_nonfungible, dex_protocols, elapsed_time)
     """
-    
-    variables = {"address": address}
-    print(f"\n  [DEBUG] Governance Query (v2 API) for address: {address}")
+    variables = {"network": "eth", "trader": address}
+    logger.debug("DEX/NFT query (v2 API) for %s", address)
     
     try:
-        data, elapsed_time = client.execute_query(query, variables, endpoint=BITQUERY_ENDPOINT_V2)
+        data, elapsed_time = client.execute_query(DEX_NFT_QUERY, variables, endpoint=BITQUERY_ENDPOINT_V2, family="dex_nft")
     except Exception as e:
-        print(f"  [DEBUG] Error executing Governance query: {str(e)}")
-        return False, 0.0
+        logger.debug("Error executing DEX/NFT query: %s", e)
+        raise
     
-    # Debug: Print raw response
-    import json
-    print(f"  [DEBUG] Governance Raw API Response:")
-    print(f"  {json.dumps(data, indent=2)}")
-    print(f"  [DEBUG] Governance Query took: {elapsed_time:.2f}s")
+    logger.debug("DEX/NFT query took %.2fs", elapsed_time)
+    dex_count_fungible, dex_count_nonfungible, dex_protocols = parse_dex_nft_response(data)
+    return dex_count_fungible, dex_count_nonfungible, dex_protocols, elapsed_time
+
+
+def parse_governance_response(data: Dict) -> bool:
+    """Return True if a governance response (count or existence query) contains any vote calls"""
+    log_payload(logger, "Governance", data)
     
     try:
-        count = data.get("EVM", {}).get("Calls", [{}])[0].get("count", 0)
+        calls = data.get("EVM", {}).get("Calls", []) or []
+        if calls and "count" not in calls[0]:
+            # Existence query: any returned row is a vote call
+            logger.debug("Governance vote call found")
+            return True
+        count = calls[0].get("count", 0) if calls else 0
         has_governance = int(count) > 0 if count else False
-        print(f"  [DEBUG] Governance calls count: {count}")
-        if has_governance:
-            print(f"  [DEBUG] ✓ Governance activity detected!")
-        else:
-            print(f"  [DEBUG] ✗ No governance activity found")
-        return has_governance, elapsed_time
-    except (KeyError, IndexError, TypeError) as e:
-        print(f"  [DEBUG] Error parsing governance data: {e}")
-        return False, elapsed_time
-
-
-def get_p4_assets(client: BitqueryClient, address: str) -> Tuple[int, float]:
-    """Get unique assets count for P4 (ERC-20 > $10 + NFTs) using v2 API"""
-    # Get ERC-20 tokens with balance > $10 using BalanceUpdates
-    erc20_query = """
-    query MyQuery($address: String) {
-      EVM(network: eth, dataset: combined) {
-        BalanceUpdates(
-          orderBy: {descendingByField: "Balance_usd"}
-          where: {BalanceUpdate: {Address: {is: $address}}, Currency: {Fungible: true}}
-        ) {
-          BalanceUpdate {
-            Address
-          }
-          Currency{
-            Name
-            Symbol
-            SmartContract
-          }
-          Balance:sum(of:BalanceUpdate_Amount selectWhere:{gt:"0"})
-          Balance_usd:sum(of:BalanceUpdate_AmountInUSD selectWhere:{ge:"10"})
-        }
-      }
-    }
-    """
-    
-    # Get NFT balances
-    nft_query = """
-    query MyQuery($address: String) {
-      EVM(dataset: combined, network: eth) {
-        BalanceUpdates(
-          where: {BalanceUpdate: {Address: {is: $address}}, Currency: {Fungible: false}}
-          orderBy: {descendingByField: "balance"}
-        ) {
-          Currency {
-            Name
-            Symbol
-            SmartContract
-          }
-          balance: sum(of: BalanceUpdate_Amount)
-        }
-      }
-    }
-    """
+        logger.debug("Governance calls count: %s", count)
+        return has_governance
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        logger.warning("Error parsing governance data: %s", e)
+        return False
+
+
+def get_governance_activity(client: BitqueryClient, address: str) -> Tuple[bool, float]:
+    """Check for governance activity using v2 API"""
+    variables = {"address": address}
+    query = GOVERNANCE_QUERY if GOVERNANCE_QUERY_MODE == "count" else GOVERNANCE_EXISTS_QUERY
+    logger.debug("Governance query (v2 API, %s mode) for %s", GOVERNANCE_QUERY_MODE, address)
     
-    print(f"\n  [DEBUG] P4 Assets Query (v2 API) for address: {address}")
+    try:
+        data, elapsed_time = client.execute_query(query, variables, endpoint=BITQUERY_ENDPOINT_V2, family="governance")
+    except Exception as e:
+        logger.debug("Error executing governance query: %s", e)
+        raise
     
+    logger.debug("Governance query took %.2fs", elapsed_time)
+    return parse_governance_response(data), elapsed_time
+
+
+# Row array of every P4 (and other BalanceUpdates) response
+BALANCE_ROWS_PATH = "EVM.BalanceUpdates"
+
+
+def parse_p4_erc20_response(data: Dict) -> Set[str]:
+    """Extract contracts of ERC-20 tokens worth >= $10 from a P4 ERC-20 response"""
+    log_payload(logger, "P4 ERC-20", data)
+    return p4_erc20_contracts(response_rows(data, BALANCE_ROWS_PATH))
+
+
+def p4_erc20_contracts(balances: Iterable[Dict]) -> Set[str]:
+    """Contracts of ERC-20 tokens worth >= $10 among P4 balance rows"""
     unique_assets = set()
+    for balance in balances:
+        # Only count if Balance_usd exists (meaning >= $10)
+        balance_usd = balance.get("Balance_usd")
+        if balance_usd:
+            currency = balance.get("Currency", {})
+            contract = currency.get("SmartContract", "")
+            if contract:
+                unique_assets.add(contract)
+    return unique_assets
+
+
+def parse_p4_nft_response(data: Dict) -> int:
+    """Count individual NFTs (sum of balances, not collections) in a P4 NFT response"""
+    log_payload(logger, "P4 NFT", data)
+    return p4_nft_count(response_rows(data, BALANCE_ROWS_PATH))
+
+
+def p4_nft_count(nft_balances: Iterable[Dict]) -> int:
+    """Sum NFT balance rows into a count of individual NFTs"""
     nft_count = 0
+    for nft_balance in nft_balances:
+        balance_str = nft_balance.get("balance", "0")
+        try:
+            balance_value = int(float(balance_str))
+            nft_count += balance_value
+        except (ValueError, TypeError):
+            pass
+    return nft_count
+
+
+def p4_erc20_request(address: str, bounded: bool = False) -> Tuple[str, Dict]:
+    """(query, variables) for the P4 ERC-20 query in the configured mode"""
+    if bounded:
+        return P4_ERC20_LIMITED_QUERY, {"address": address, "limit": P4_SATURATION}
+    if P4_QUERY_MODE == "aggregate":
+        return P4_ERC20_TOKENS_QUERY, {"address": address}
+    return P4_ERC20_QUERY, {"address": address}
+
+
+def p4_nft_request(address: str, bounded: bool = False, held: int = 0) -> Tuple[str, Dict]:
+    """(query, variables) for the P4 NFT query; held ERC-20 tokens shrink a bounded query's limit"""
+    if P4_QUERY_MODE == "aggregate":
+        return P4_NFT_TOTAL_QUERY, {"address": address}
+    if bounded:
+        # Balances are sorted descending, so the largest `remaining` rows
+        # either reach the cap or are all the NFTs with a positive balance
+        return P4_NFT_BOUNDED_QUERY, {"address": address, "limit": P4_SATURATION - held}
+    return P4_NFT_QUERY, {"address": address}
+
+
+def get_p4_assets(client: BitqueryClient, address: str, bounded: bool = False) -> Tuple[int, float]:
+    """Get unique assets count for P4 (ERC-20 > $10 + NFTs) using v2 API
+
+    In the default aggregate mode (P4_QUERY_MODE) the $10 filter and the NFT
+    sum run server-side and the ERC-20 rows carry only the fields the count
+    needs. bounded fetches only the largest P4_SATURATION balances and skips
+    the NFT query once the ERC-20 tokens alone reach the cap.
+    """
+    logger.debug("P4 assets query (v2 API%s) for %s", ", bounded" if bounded else "", address)
+    
     total_time = 0.0
     
     # Get ERC-20 tokens
     try:
-        erc20_data, erc20_time = client.execute_query(erc20_query, {"address": address}, endpoint=BITQUERY_ENDPOINT_V2)
+        query, variables = p4_erc20_request(address, bounded)
+        unique_assets, erc20_time = client.query_rows(query, variables, BITQUERY_ENDPOINT_V2, "p4_erc20",
+                                                      BALANCE_ROWS_PATH, p4_erc20_contracts)
         total_time += erc20_time
-        print(f"  [DEBUG] ERC-20 Query took: {erc20_time:.2f}s")
-        balances = erc20_data.get("EVM", {}).get("BalanceUpdates", [])
-        for balance in balances:
-            # Only count if Balance_usd exists (meaning >= $10)
-            balance_usd = balance.get("Balance_usd")
-            if balance_usd:
-                currency = balance.get("Currency", {})
-                contract = currency.get("SmartContract", "")
-                if contract:
-                    unique_assets.add(contract)
+        logger.debug("ERC-20 query took %.2fs", erc20_time)
     except Exception as e:
-        print(f"  [DEBUG] Error getting ERC-20 tokens: {str(e)}")
-        # Return 0 for assets if query fails
-        erc20_time = 0.0
-        total_time += erc20_time
+        logger.debug("Error getting ERC-20 tokens: %s", e)
+        # Propagate so a failed query is not mistaken for an empty wallet
+        raise
+    
+    if bounded and len(unique_assets) >= P4_SATURATION:
+        logger.debug("P4 saturated by %d ERC-20 tokens; NFT query skipped", len(unique_assets))
+        return len(unique_assets), total_time
     
     # Get NFTs - count individual NFTs (sum of balances), not collections
     try:
-        nft_data, nft_time = client.execute_query(nft_query, {"address": address}, endpoint=BITQUERY_ENDPOINT_V2)
+        query, variables = p4_nft_request(address, bounded, len(unique_assets))
+        nft_count, nft_time = client.query_rows(query, variables, BITQUERY_ENDPOINT_V2, "p4_nft",
+                                                BALANCE_ROWS_PATH, p4_nft_count)
         total_time += nft_time
-        print(f"  [DEBUG] NFT Query took: {nft_time:.2f}s")
-        nft_balances = nft_data.get("EVM", {}).get("BalanceUpdates", [])
-        for nft_balance in nft_balances:
-            balance_str = nft_balance.get("balance", "0")
-            try:
-                balance_value = int(float(balance_str))
-                nft_count += balance_value
-            except (ValueError, TypeError):
-                pass
+        logger.debug("NFT query took %.2fs", nft_time)
     except Exception as e:
-        print(f"  [DEBUG] Error getting NFTs: {str(e)}")
-        # Continue with nft_count = 0 if query fails
-        nft_time = 0.0
-        total_time += nft_time
+        logger.debug("Error getting NFTs: %s", e)
+        raise
     
     # Total assets = ERC-20 tokens + individual NFT count
     total_assets = len(unique_assets) + nft_count
-    print(f"  [DEBUG] P4 Total Query Time: {total_time:.2f}s")
-    print(f"  [DEBUG] ERC-20 tokens (>= $10): {len(unique_assets)}, NFTs: {nft_count}, Total: {total_assets}")
+    logger.debug("P4 took %.2fs: ERC-20 tokens (>= $10): %d, NFTs: %d, total: %d",
+                 total_time, len(unique_assets), nft_count, total_assets)
     
     return total_assets, total_time
 
 
-def calculate_defi_score(address: str, api_key: str, verbose: bool = True) -> Dict:
-    """Calculate DeFi Strategy Score for an address"""
-    # Check if this is the sample wallet and return presaved response
-    if address.lower() == SAMPLE_WALLET_ADDRESS.lower():
-        if verbose:
-            print(f"Using presaved response for sample wallet: {address}")
-            print(f"  ✓ P1: {SAMPLE_WALLET_RESPONSE['p1']['tx_count']} transactions → {SAMPLE_WALLET_RESPONSE['p1']['score']:.2f} points")
-            print(f"  ✓ P2: {SAMPLE_WALLET_RESPONSE['p2']['unique_types']} types → {SAMPLE_WALLET_RESPONSE['p2']['score']:.2f} points")
-            print(f"  ✓ P3: {SAMPLE_WALLET_RESPONSE['p3']['unique_protocols']} protocols → {SAMPLE_WALLET_RESPONSE['p3']['score']:.2f} points")
-            print(f"  ✓ P4: {SAMPLE_WALLET_RESPONSE['p4']['unique_assets']} assets → {SAMPLE_WALLET_RESPONSE['p4']['score']:.2f} points")
-        return SAMPLE_WALLET_RESPONSE.copy()
+# ============================================================================
+# MULTI-ADDRESS FETCHERS - one query per family for a whole chunk of wallets
+# ============================================================================
+
+P1_MULTI_QUERY = """
+query MyQuery($addresses: [String!], $time3yr_ago: ISO8601DateTime, $limit: Int) {
+  ethereum {
+    transactions(
+      txSender: {in: $addresses}
+      time: {since: $time3yr_ago}
+      options: {limit: $limit}
+    ) {
+      sender {
+        address
+      }
+      count
+    }
+  }
+}
+"""
+
+P2_P3_MULTI_QUERY = """
+query MyQuery($time3yr_ago: ISO8601DateTime, $protocols: [String!], $addresses: [String!], $limit: Int) {
+  ethereum(network: ethereum) {
+    smartContractCalls(
+      txFrom: {in: $addresses}
+      smartContractAddress: {in: $protocols}
+      time: {since: $time3yr_ago}
+      options: {limit: $limit}
+    ) {
+      transaction {
+        txFrom {
+          address
+        }
+      }
+      smartContract {
+        address {
+          address
+        }
+      }
+      txc: count
+    }
+  }
+}
+"""
+
+# Buyer and seller sides are queried separately so each row carries the trader;
+# distinct protocol names are then unioned per wallet
+DEX_NFT_MULTI_QUERY = """
+query TraderDexMarketsEvm($network: evm_network!, $traders: [String!], $limit: Int) {
+  EVM(network: $network) {
+    buys: DEXTradeByTokens(
+      where: {TransactionStatus: {Success: true}, Block: {Time: {since_relative: {years_ago: 3}}}, Trade: {Buyer: {in: $traders}}}
+      limit: {count: $limit}
+    ) {
+      Trade {
+        Buyer
+        Dex {
+          ProtocolName
+        }
+        Currency {
+          Fungible
+        }
+      }
+      count
+    }
+    sells: DEXTradeByTokens(
+      where: {TransactionStatus: {Success: true}, Block: {Time: {since_relative: {years_ago: 3}}}, Trade: {Seller: {in: $traders}}}
+      limit: {count: $limit}
+    ) {
+      Trade {
+        Seller
+        Dex {
+          ProtocolName
+        }
+        Currency {
+          Fungible
+        }
+      }
+      count
+    }
+  }
+}
+"""
+
+P4_ERC20_MULTI_QUERY = """
+query MyQuery($addresses: [String!], $limit: Int) {
+  EVM(network: eth, dataset: combined) {
+    BalanceUpdates(
+      orderBy: {descendingByField: "Balance_usd"}
+      where: {BalanceUpdate: {Address: {in: $addresses}}, Currency: {Fungible: true}}
+      limit: {count: $limit}
+    ) {
+      BalanceUpdate {
+        Address
+      }
+      Currency{
+        SmartContract
+      }
+      Balance_usd:sum(of:BalanceUpdate_AmountInUSD selectWhere:{ge:"10"})
+    }
+  }
+}
+"""
+
+P4_NFT_MULTI_QUERY = """
+query MyQuery($addresses: [String!], $limit: Int) {
+  EVM(dataset: combined, network: eth) {
+    BalanceUpdates(
+      where: {BalanceUpdate: {Address: {in: $addresses}}, Currency: {Fungible: false}}
+      limit: {count: $limit}
+    ) {
+      BalanceUpdate {
+        Address
+      }
+      Currency {
+        SmartContract
+      }
+      balance: sum(of: BalanceUpdate_Amount)
+    }
+  }
+}
+"""
+
+# Aggregate mode: one summed NFT row per wallet
+P4_NFT_MULTI_TOTAL_QUERY = """
+query MyQuery($addresses: [String!], $limit: Int) {
+  EVM(dataset: combined, network: eth) {
+    BalanceUpdates(
+      where: {BalanceUpdate: {Address: {in: $addresses}}, Currency: {Fungible: false}}
+      limit: {count: $limit}
+    ) {
+      BalanceUpdate {
+        Address
+      }
+      balance: sum(of: BalanceUpdate_Amount)
+    }
+  }
+}
+"""
+
+GOVERNANCE_MULTI_QUERY = """
+query MyQuery($addresses: [String!], $limit: Int) {
+  EVM(network: eth, dataset: combined) {
+    Calls(
+      where: {Block: {Time: {since_relative: {years_ago: 3}}}, Call: {Signature: {Name: {includesCaseInsensitive: "vote"}}}, Transaction: {From: {in: $addresses}}, TransactionStatus: {Success: true}}
+      limit: {count: $limit}
+    ) {
+      Transaction {
+        From
+      }
+      count
+    }
+  }
+}
+"""
+
+# Row limit for multi-address queries; large enough that only whale-sized
+# portfolios reach it. A response with this many rows may be truncated, so it
+# raises RowLimitError and batch._fetch_family retries the chunk in halves
+MULTI_QUERY_ROW_LIMIT = 25000
+
+
+def get_p1_transaction_counts(client: BitqueryClient, addresses: List[str],
+                              time_3yr_ago: str) -> Dict[str, Tuple[int, float]]:
+    """Get P1 transaction counts for many addresses in one v1 query, keyed by lowercased address"""
+    variables = {
+        "addresses": addresses,
+        "time3yr_ago": time_3yr_ago,
+        "limit": len(addresses),
+    }
+    logger.debug("P1 multi-address query (v1 API) for %d addresses", len(addresses))
+    data, elapsed_time = client.execute_query(P1_MULTI_QUERY, variables, endpoint=BITQUERY_ENDPOINT_V1, family="p1")
     
-    client = BitqueryClient(api_key)
-    time_3yr_ago = get_time_3_years_ago()
+    counts = {address.lower(): 0 for address in addresses}
+    for row in data.get("ethereum", {}).get("transactions", []) or []:
+        sender = ((row.get("sender") or {}).get("address") or "").lower()
+        if sender in counts:
+            counts[sender] = int(row.get("count") or 0)
+    return {address: (count, elapsed_time) for address, count in counts.items()}
+
+
+def get_p2_p3_data_multi(client: BitqueryClient, addresses: List[str], time_3yr_ago: str,
+                         registry: Optional[ProtocolRegistry] = None) -> Dict[str, Tuple[Set[str], Set[str], float]]:
+    """Get P2/P3 activity types and protocols for many addresses in one v1 query"""
+    registry = registry or PROTOCOLS.current()
+    variables = {
+        "addresses": addresses,
+        "protocols": list(registry.addresses),
+        "time3yr_ago": time_3yr_ago,
+        "limit": len(addresses) * len(registry.addresses),
+    }
+    logger.debug("P2/P3 multi-address query (v1 API) for %d addresses", len(addresses))
     
-    if verbose:
-        print(f"Calculating DeFi Score for {address}...")
-        print(f"Time filter: 3 years ago ({time_3yr_ago})")
+    def collect_calls(calls: Iterator[Dict]) -> Dict[str, Tuple[Set[str], Set[str]]]:
+        per_wallet = {address.lower(): (set(), set()) for address in addresses}
+        for call in calls:
+            sender = (((call.get("transaction") or {}).get("txFrom") or {}).get("address") or "").lower()
+            protocol_address = ((call.get("smartContract") or {}).get("address") or {}).get("address", "")
+            if sender not in per_wallet or not protocol_address:
+                continue
+            activity_types, interacted_protocols = per_wallet[sender]
+            interacted_protocols.add(protocol_address.lower())
+            activity_types.update(registry.activity_types(protocol_address))
+        return per_wallet
     
-    overall_start = time.time()
+    per_wallet, elapsed_time = client.query_rows(P2_P3_MULTI_QUERY, variables, BITQUERY_ENDPOINT_V1, "p2_p3",
+                                                 "ethereum.smartContractCalls", collect_calls)
+    return {address: (types, protocols, elapsed_time) for address, (types, protocols) in per_wallet.items()}
+
+
+def get_dex_and_nft_activity_multi(client: BitqueryClient,
+                                   addresses: List[str]) -> Dict[str, Tuple[int, int, Set[str], float]]:
+    """Get DEX/NFT trading activity for many addresses in one v2 query"""
+    variables = {
+        "network": "eth",
+        "traders": addresses,
+        "limit": MULTI_QUERY_ROW_LIMIT,
+    }
+    logger.debug("DEX/NFT multi-address query (v2 API) for %d addresses", len(addresses))
+    data, elapsed_time = client.execute_query(DEX_NFT_MULTI_QUERY, variables, endpoint=BITQUERY_ENDPOINT_V2, family="dex_nft")
     
-    # Run queries in parallel
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        # Submit all queries
-        futures = {
-            "p1": executor.submit(get_p1_transaction_count, client, address, time_3yr_ago),
-            "p2_p3": executor.submit(get_p2_p3_data, client, address, time_3yr_ago),
-            "dex_nft": executor.submit(get_dex_and_nft_activity, client, address),
-            "p4": executor.submit(get_p4_assets, client, address),
-        }
-        
-        # Create reverse mapping from future to name
-        future_to_name = {future: name for name, future in futures.items()}
-        
-        # Collect results as they complete
-        results = {}
-        for future in as_completed(futures.values()):
-            name = future_to_name[future]
+    # wallet -> {fungible flag -> distinct DEX protocol names}
+    names = {address.lower(): {True: set(), False: set()} for address in addresses}
+    evm = data.get("EVM", {}) or {}
+    for side, trader_field in (("buys", "Buyer"), ("sells", "Seller")):
+        for row in limited_rows(evm.get(side, []) or [], MULTI_QUERY_ROW_LIMIT, f"DEX/NFT multi-address {side}"):
+            trade = row.get("Trade") or {}
+            trader = (trade.get(trader_field) or "").lower()
+            protocol_name = (trade.get("Dex") or {}).get("ProtocolName")
+            if trader not in names or not protocol_name:
+                continue
+            fungible = bool((trade.get("Currency") or {}).get("Fungible"))
+            names[trader][fungible].add(protocol_name)
+    
+    results = {}
+    for address, by_kind in names.items():
+        dex_count_fungible = len(by_kind[True])
+        dex_count_nonfungible = len(by_kind[False])
+        # Same generic identifiers as the single-address path
+        dex_protocols = {f"dex_erc20_{i+1}" for i in range(dex_count_fungible)}
+        dex_protocols.update(f"dex_nft_{i+1}" for i in range(dex_count_nonfungible))
+        results[address] = (dex_count_fungible, dex_count_nonfungible, dex_protocols, elapsed_time)
+    return results
+
+
+def get_governance_activity_multi(client: BitqueryClient, addresses: List[str]) -> Dict[str, Tuple[bool, float]]:
+    """Check governance activity for many addresses in one v2 query (one row per voting wallet)"""
+    variables = {"addresses": addresses, "limit": len(addresses)}
+    logger.debug("Governance multi-address query (v2 API) for %d addresses", len(addresses))
+    data, elapsed_time = client.execute_query(GOVERNANCE_MULTI_QUERY, variables, endpoint=BITQUERY_ENDPOINT_V2, family="governance")
+    
+    voted = {address.lower(): False for address in addresses}
+    for row in data.get("EVM", {}).get("Calls", []) or []:
+        sender = ((row.get("Transaction") or {}).get("From") or "").lower()
+        if sender in voted:
             try:
-                result = future.result()
-                results[name] = result
-            except Exception as e:
-                if verbose:
-                    error_msg = str(e)
-                    print(f"  ✗ Error in {name} query: {error_msg}")
-                # Set default values based on query type
-                if name == "p1":
-                    results[name] = (0, 0.0)  # (tx_count, time)
-                elif name == "p2_p3":
-                    results[name] = (set(), set(), 0.0)  # (activity_types, protocols, time)
-                elif name == "dex_nft":
-                    results[name] = (0, 0, set(), 0.0)  # (dex_count, nft_count, protocols, time)
-                elif name == "p4":
-                    results[name] = (0, 0.0)  # (asset_count, time)
-                else:
-                    results[name] = None
+                voted[sender] = int(row.get("count") or 0) > 0
+            except (ValueError, TypeError):
+                pass
+    return {address: (has_governance, elapsed_time) for address, has_governance in voted.items()}
+
+
+def get_p4_assets_multi(client: BitqueryClient, addresses: List[str]) -> Dict[str, Tuple[int, float]]:
+    """Get P4 asset counts (ERC-20 >= $10 + individual NFTs) for many addresses in two v2 queries"""
+    variables = {"addresses": addresses, "limit": MULTI_QUERY_ROW_LIMIT}
+    logger.debug("P4 multi-address query (v2 API, %s mode) for %d addresses", P4_QUERY_MODE, len(addresses))
+    if P4_QUERY_MODE == "aggregate":
+        nft_query = P4_NFT_MULTI_TOTAL_QUERY
+    else:
+        nft_query = P4_NFT_MULTI_QUERY
     
-    # Process P1 results
-    if verbose:
-        print("\n  → Processing results...")
+    # Consumers build fresh totals, so a retried (or streamed) query starts from scratch
+    def collect_tokens(balances: Iterator[Dict]) -> Dict[str, Set[str]]:
+        tokens = {address.lower(): set() for address in addresses}
+        for balance in limited_rows(balances, MULTI_QUERY_ROW_LIMIT, "P4 ERC-20 multi-address query"):
+            holder = ((balance.get("BalanceUpdate") or {}).get("Address") or "").lower()
+            contract = (balance.get("Currency") or {}).get("SmartContract", "")
+            # Only count if Balance_usd exists (meaning >= $10)
+            if holder in tokens and contract and balance.get("Balance_usd"):
+                tokens[holder].add(contract)
+        return tokens
+    
+    def collect_nfts(nft_balances: Iterator[Dict]) -> Dict[str, int]:
+        nft_counts = {address.lower(): 0 for address in addresses}
+        for nft_balance in limited_rows(nft_balances, MULTI_QUERY_ROW_LIMIT, "P4 NFT multi-address query"):
+            holder = ((nft_balance.get("BalanceUpdate") or {}).get("Address") or "").lower()
+            if holder not in nft_counts:
+                continue
+            try:
+                nft_counts[holder] += int(float(nft_balance.get("balance", "0")))
+            except (ValueError, TypeError):
+                pass
+        return nft_counts
+    
+    tokens, erc20_time = client.query_rows(P4_ERC20_MULTI_QUERY, variables, BITQUERY_ENDPOINT_V2, "p4_erc20",
+                                           BALANCE_ROWS_PATH, collect_tokens)
+    nft_counts, nft_time = client.query_rows(nft_query, variables, BITQUERY_ENDPOINT_V2, "p4_nft",
+                                             BALANCE_ROWS_PATH, collect_nfts)
+    
+    total_time = erc20_time + nft_time
+    return {address: (len(tokens[address]) + nft_counts[address], total_time) for address in tokens}
+
+
+# Daily-bucketed variants of the P1, P2/P3 and DEX/NFT queries, used with a
+# CheckpointStore so a known wallet only fetches the days since its checkpoint
+P1_DAILY_QUERY = """
+query MyQuery($address: String, $since: ISO8601DateTime, $limit: Int) {
+  ethereum {
+    transactions(
+      txSender: {is: $address}
+      time: {since: $since}
+      options: {limit: $limit}
+    ) {
+      date {
+        date
+      }
+      count
+    }
+  }
+}
+"""
+
+P2_P3_DAILY_QUERY = """
+query MyQuery($since: ISO8601DateTime, $protocols: [String!], $address: String, $limit: Int) {
+  ethereum(network: ethereum) {
+    smartContractCalls(
+      txFrom: {is: $address}
+      smartContractAddress: {in: $protocols}
+      time: {since: $since}
+      options: {limit: $limit}
+    ) {
+      date {
+        date
+      }
+      smartContract {
+        address {
+          address
+        }
+      }
+      txc: count
+    }
+  }
+}
+"""
+
+DEX_NFT_DAILY_QUERY = """
+query TraderDexMarketsEvm($network: evm_network!, $trader: String!, $since: String, $limit: Int) {
+  EVM(network: $network) {
+    buys: DEXTradeByTokens(
+      where: {TransactionStatus: {Success: true}, Block: {Date: {since: $since}}, Trade: {Buyer: {is: $trader}}}
+      limit: {count: $limit}
+    ) {
+      Block {
+        Date
+      }
+      Trade {
+        Dex {
+          ProtocolName
+        }
+        Currency {
+          Fungible
+        }
+      }
+      count
+    }
+    sells: DEXTradeByTokens(
+      where: {TransactionStatus: {Success: true}, Block: {Date: {since: $since}}, Trade: {Seller: {is: $trader}}}
+      limit: {count: $limit}
+    ) {
+      Block {
+        Date
+      }
+      Trade {
+        Dex {
+          ProtocolName
+        }
+        Currency {
+          Fungible
+        }
+      }
+      count
+    }
+  }
+}
+"""
+
+
+def _add_bucket_count(buckets: Dict[str, Dict[str, int]], day: Optional[str], key: str, count) -> None:
+    if not day or not key:
+        return
+    try:
+        count = int(count or 0)
+    except (ValueError, TypeError):
+        return
+    counts = buckets.setdefault(day[:10], {})
+    counts[key] = counts.get(key, 0) + count
+
+
+def daily_query_request(family: str, address: str, since: str,
+                        registry: Optional[ProtocolRegistry] = None) -> Tuple[str, Dict, str]:
+    """Return (query, variables, endpoint) fetching a family's daily buckets from `since` (YYYY-MM-DD)"""
+    if family == "p1":
+        variables = {"address": address, "since": f"{since}T00:00:00Z", "limit": MULTI_QUERY_ROW_LIMIT}
+        return P1_DAILY_QUERY, variables, BITQUERY_ENDPOINT_V1
+    if family == "p2_p3":
+        registry = registry or PROTOCOLS.current()
+        variables = {"address": address, "protocols": list(registry.addresses),
+                     "since": f"{since}T00:00:00Z", "limit": MULTI_QUERY_ROW_LIMIT}
+        return P2_P3_DAILY_QUERY, variables, BITQUERY_ENDPOINT_V1
+    if family == "dex_nft":
+        variables = {"network": "eth", "trader": address, "since": since, "limit": MULTI_QUERY_ROW_LIMIT}
+        return DEX_NFT_DAILY_QUERY, variables, BITQUERY_ENDPOINT_V2
+    raise ValueError(f"Query family has no daily variant: {family}")
+
+
+def parse_daily_buckets(family: str, data: Dict) -> Dict[str, Dict[str, int]]:
+    """Extract day -> {key: count} buckets from a daily query response
+
+    Keys are "tx" for P1, lowercased protocol addresses for P2/P3 and
+    "erc20:<name>" / "nft:<name>" DEX protocol names for DEX/NFT.
+    """
+    log_payload(logger, f"{family} daily", data)
+    buckets: Dict[str, Dict[str, int]] = {}
+    if family == "p1":
+        for row in data.get("ethereum", {}).get("transactions", []) or []:
+            _add_bucket_count(buckets, (row.get("date") or {}).get("date"), "tx", row.get("count"))
+    elif family == "p2_p3":
+        for row in data.get("ethereum", {}).get("smartContractCalls", []) or []:
+            protocol_address = ((row.get("smartContract") or {}).get("address") or {}).get("address") or ""
+            _add_bucket_count(buckets, (row.get("date") or {}).get("date"), protocol_address.lower(), row.get("txc"))
+    elif family == "dex_nft":
+        evm = data.get("EVM", {}) or {}
+        for row in (evm.get("buys") or []) + (evm.get("sells") or []):
+            trade = row.get("Trade") or {}
+            protocol_name = (trade.get("Dex") or {}).get("ProtocolName")
+            if not protocol_name:
+                continue
+            kind = "erc20" if (trade.get("Currency") or {}).get("Fungible") else "nft"
+            _add_bucket_count(buckets, (row.get("Block") or {}).get("Date"), f"{kind}:{protocol_name}", row.get("count"))
+    else:
+        raise ValueError(f"Query family has no daily variant: {family}")
+    return buckets
+
+
+def daily_response_truncated(family: str, data: Dict) -> bool:
+    """Whether a daily query returned as many rows as its limit, so some day buckets may be missing"""
+    if family == "p1":
+        row_lists = [(data.get("ethereum") or {}).get("transactions")]
+    elif family == "p2_p3":
+        row_lists = [(data.get("ethereum") or {}).get("smartContractCalls")]
+    elif family == "dex_nft":
+        evm = data.get("EVM") or {}
+        row_lists = [evm.get("buys"), evm.get("sells")]
+    else:
+        raise ValueError(f"Query family has no daily variant: {family}")
+    return any(len(rows or []) >= MULTI_QUERY_ROW_LIMIT for rows in row_lists)
+
+
+def result_from_totals(family: str, totals: Dict[str, int], elapsed_time: float,
+                       registry: Optional[ProtocolRegistry] = None) -> Tuple:
+    """Turn window totals from a CheckpointStore into the regular fetcher result shape"""
+    if family == "p1":
+        return totals.get("tx", 0), elapsed_time
+    if family == "p2_p3":
+        interacted_protocols = {protocol for protocol, count in totals.items() if count > 0}
+        registry = registry or PROTOCOLS.current()
+        activity_types = set()
+        for protocol in interacted_protocols:
+            activity_types.update(registry.activity_types(protocol))
+        return activity_types, interacted_protocols, elapsed_time
+    if family == "dex_nft":
+        dex_count_fungible = sum(1 for key, count in totals.items() if key.startswith("erc20:") and count > 0)
+        dex_count_nonfungible = sum(1 for key, count in totals.items() if key.startswith("nft:") and count > 0)
+        # Same generic identifiers as the full-scan path
+        dex_protocols = {f"dex_erc20_{i+1}" for i in range(dex_count_fungible)}
+        dex_protocols.update(f"dex_nft_{i+1}" for i in range(dex_count_nonfungible))
+        return dex_count_fungible, dex_count_nonfungible, dex_protocols, elapsed_time
+    raise ValueError(f"Query family has no daily variant: {family}")
+
+
+def checkpoint_version(family: str, registry: ProtocolRegistry) -> Optional[str]:
+    """Checkpoint version for a family: P2/P3 buckets are only valid for the same address set
+
+    Buckets hold raw per-address counts and are classified when totalled, so
+    re-categorizing a protocol keeps them; adding or removing one does not.
+    """
+    return registry.addresses_fingerprint if family == "p2_p3" else None
+
+
+def get_checkpointed_result(client: BitqueryClient, checkpoints: CheckpointStore,
+                            family: str, address: str, registry: Optional[ProtocolRegistry] = None) -> Tuple:
+    """Fetch only the days since the wallet's checkpoint, merge them and return the family's result"""
+    registry = registry or PROTOCOLS.current()
+    version = checkpoint_version(family, registry)
+    since, is_delta = checkpoints.delta_since(address, family, version)
+    query, variables, endpoint = daily_query_request(family, address, since, registry)
+    logger.debug("%s %s query for %s since %s", family, "delta" if is_delta else "full daily", address, since)
+    data, elapsed_time = client.execute_query(query, variables, endpoint=endpoint, family=family)
+    if daily_response_truncated(family, data):
+        # Merging would checkpoint the missing days as empty; the checkpoint is left as it was
+        logger.warning("%s daily query for %s hit the %d-row limit; using the full-range query",
+                       family, address, MULTI_QUERY_ROW_LIMIT, extra={"family": family, "address": address})
+        return get_full_range_result(client, family, address, registry)
+    totals = checkpoints.merge(address, family, since, parse_daily_buckets(family, data), version)
+    return result_from_totals(family, totals, elapsed_time, registry)
+
+
+def get_full_range_result(client: BitqueryClient, family: str, address: str,
+                          registry: Optional[ProtocolRegistry] = None) -> Tuple:
+    """Fetch a checkpointed family with its regular query over the whole window, bypassing checkpoints"""
+    time_3yr_ago = get_time_3_years_ago()
+    if family == "p1":
+        return get_p1_transaction_count(client, address, time_3yr_ago)
+    if family == "p2_p3":
+        return get_p2_p3_data(client, address, time_3yr_ago, registry)
+    if family == "dex_nft":
+        return get_dex_and_nft_activity(client, address)
+    raise ValueError(f"Query family has no daily variant: {family}")
+
+
+def default_query_result(name: str) -> Tuple:
+    """Fallback result for a query family that failed"""
+    if name == "p1":
+        return (0, 0.0)  # (tx_count, time)
+    if name == "p2_p3":
+        return (set(), set(), 0.0)  # (activity_types, protocols, time)
+    if name == "dex_nft":
+        return (0, 0, set(), 0.0)  # (dex_count, nft_count, protocols, time)
+    if name == "governance":
+        return (False, 0.0)  # (has_governance, time)
+    if name == "p4":
+        return (0, 0.0)  # (asset_count, time)
+    return None
+
+
+def encode_query_result(name: str, result: Tuple) -> Dict:
+    """Convert a fetcher result into a JSON-serializable cache payload (timing dropped)"""
+    if name == "p1":
+        return {"tx_count": result[0]}
+    if name == "p2_p3":
+        return {"activity_types": sorted(result[0]), "protocols": sorted(result[1])}
+    if name == "dex_nft":
+        return {
+            "dex_count_fungible": result[0],
+            "dex_count_nonfungible": result[1],
+            "dex_protocols": sorted(result[2]),
+        }
+    if name == "governance":
+        return {"has_governance": result[0]}
+    if name == "p4":
+        return {"unique_assets": result[0]}
+    raise ValueError(f"Unknown query family: {name}")
+
+
+def decode_query_result(name: str, payload: Dict) -> Tuple:
+    """Convert a cache payload back into the fetcher result shape"""
+    if name == "p1":
+        return (payload["tx_count"], 0.0)
+    if name == "p2_p3":
+        return (set(payload["activity_types"]), set(payload["protocols"]), 0.0)
+    if name == "dex_nft":
+        return (payload["dex_count_fungible"], payload["dex_count_nonfungible"],
+                set(payload["dex_protocols"]), 0.0)
+    if name == "governance":
+        return (payload["has_governance"], 0.0)
+    if name == "p4":
+        return (payload["unique_assets"], 0.0)
+    raise ValueError(f"Unknown query family: {name}")
+
+
+def build_score_result(address: str, results: Dict[str, Tuple], verbose: bool = True,
+                       total_time: float = 0.0, failed_queries: Optional[List[str]] = None,
+                       bounded: bool = False) -> Dict:
+    """Turn per-family query results into pillar scores and the final score
+
+    failed_queries lists the families that fell back to default results, so
+    callers can tell a genuinely empty wallet from a failed lookup. With
+    verbose, the per-pillar breakdown is logged at INFO instead of DEBUG.
+    bounded marks results from saturation queries, whose tx_count and
+    unique_assets stop at the pillar caps.
+    """
+    log = logger.info if verbose else logger.debug
     
+    # Process P1 results
     try:
-        if results.get("p1") is not None:
-            tx_count, p1_time = results["p1"]
+        tx_count, p1_time = results["p1"]
         p1_score = calculate_p1_score(tx_count)
-        if verbose:
-                print(f"  ✓ P1 calculated: {tx_count} transactions → {p1_score:.2f} points (took {p1_time:.2f}s)")
-        else:
-            tx_count = 0
-            p1_score = 0.0
-            p1_time = 0.0
+        log("P1 calculated: %s transactions -> %.2f points (took %.2fs)", tx_count, p1_score, p1_time)
     except Exception as e:
-        if verbose:
-            print(f"  ✗ Error processing P1: {str(e)}")
+        logger.warning("Error processing P1: %s", e)
         tx_count = 0
         p1_score = 0.0
         p1_time = 0.0
@@ -662,10 +1947,14 @@ def calculate_defi_score(address: str, api_key: str, verbose: bool = True) -> Di
     # Process P2/P3 results
     dex_nft_time = 0.0
     p2_p3_time = 0.0
+    governance_time = 0.0
     
     try:
         if results.get("p2_p3") is not None:
             activity_types, interacted_protocols, p2_p3_time = results["p2_p3"]
+            # Copy so merging DEX results never mutates the caller's (or cache's) sets
+            activity_types = set(activity_types)
+            interacted_protocols = set(interacted_protocols)
         else:
             activity_types = set()
             interacted_protocols = set()
@@ -678,8 +1967,7 @@ def calculate_defi_score(address: str, api_key: str, verbose: bool = True) -> Di
                 # Add DEX protocols to interacted_protocols for P3
                 if dex_protocols:
                     interacted_protocols.update(dex_protocols)
-                    if verbose:
-                        print(f"  [DEBUG] Added {len(dex_protocols)} DEX protocols to P3")
+                    logger.debug("Added %d DEX protocols to P3", len(dex_protocols))
                 
                 # Add activity types based on counts
                 if dex_count_fungible > 0:
@@ -688,26 +1976,29 @@ def calculate_defi_score(address: str, api_key: str, verbose: bool = True) -> Di
                     activity_types.add("NFT Trading")
         
             except (ValueError, TypeError) as e:
-                if verbose:
-                    print(f"  ⚠ Error unpacking DEX/NFT results: {str(e)}")
+                logger.warning("Error unpacking DEX/NFT results: %s", e)
                 dex_nft_time = 0.0
         
+        # Add governance (vote calls) as a P2 activity type
+        if results.get("governance") is not None:
+            try:
+                has_governance, governance_time = results["governance"]
+                if has_governance:
+                    activity_types.add("Governance")
+            except (ValueError, TypeError) as e:
+                logger.warning("Error unpacking governance results: %s", e)
+                governance_time = 0.0
+        
         unique_types = len(activity_types)
         unique_protocols = len(interacted_protocols)
         
         p2_score = calculate_p2_score(unique_types)
         p3_score = calculate_p3_score(unique_protocols)
         
-        if verbose:
-            print(f"  ✓ P2 calculated: {unique_types} types → {p2_score:.2f} points")
-            print(f"    Activity types: {list(activity_types)}")
-            print(f"  ✓ P3 calculated: {unique_protocols} protocols → {p3_score:.2f} points")
-            print(f"  ✓ P2/P3 queries took: {p2_p3_time:.2f}s + DEX/NFT: {dex_nft_time:.2f}s")
-    except Exception as e:
-        if verbose:
-            print(f"  ✗ Error processing P2/P3: {str(e)}")
-            import traceback
-            print(f"  Traceback: {traceback.format_exc()}")
+        log("P2 calculated: %d types -> %.2f points %s", unique_types, p2_score, sorted(activity_types))
+        log("P3 calculated: %d protocols -> %.2f points", unique_protocols, p3_score)
+    except Exception:
+        logger.warning("Error processing P2/P3", exc_info=True)
         unique_types = 0
         unique_protocols = 0
         p2_score = 0.0
@@ -715,18 +2006,11 @@ def calculate_defi_score(address: str, api_key: str, verbose: bool = True) -> Di
     
     # Process P4 results
     try:
-        if results.get("p4") is not None:
-            unique_assets, p4_time = results["p4"]
+        unique_assets, p4_time = results["p4"]
         p4_score = calculate_p4_score(unique_assets)
-        if verbose:
-                print(f"  ✓ P4 calculated: {unique_assets} assets → {p4_score:.2f} points (took {p4_time:.2f}s)")
-        else:
-            unique_assets = 0
-            p4_score = 0.0
-            p4_time = 0.0
+        log("P4 calculated: %s assets -> %.2f points (took %.2fs)", unique_assets, p4_score, p4_time)
     except Exception as e:
-        if verbose:
-            print(f"  ✗ Error processing P4: {str(e)}")
+        logger.warning("Error processing P4: %s", e)
         unique_assets = 0
         p4_score = 0.0
         p4_time = 0.0
@@ -736,61 +2020,268 @@ def calculate_defi_score(address: str, api_key: str, verbose: bool = True) -> Di
     final_score = 25 + (avg_pillar_score * 0.75)
     final_score_rounded = round(final_score)
     
-    total_time = time.time() - overall_start
+    log("Query timing: P1 %.2fs, P2/P3 %.2fs, DEX/NFT %.2fs, governance %.2fs, P4 %.2fs, total %.2fs",
+        p1_time, p2_p3_time, dex_nft_time, governance_time, p4_time, total_time)
     
-    if verbose:
-        print(f"\n  {'='*60}")
-        print(f"  Query Timing Summary:")
-        print(f"  {'='*60}")
-        print(f"  P1 (Transaction Count):     {p1_time:.2f}s")
-        print(f"  P2/P3 (Protocols):          {p2_p3_time:.2f}s")
-        print(f"  DEX/NFT:                    {dex_nft_time:.2f}s")
-        print(f"  P4 (Assets):                {p4_time:.2f}s")
-        print(f"  {'='*60}")
-        print(f"  Total Time:                  {total_time:.2f}s")
-        print(f"  {'='*60}\n")
+    failed = set(failed_queries or [])
+    partial = {pillar: bool(failed.intersection(families)) for pillar, families in PILLAR_QUERY_FAMILIES.items()}
     
     return {
         "address": address,
         "p1": {
             "tx_count": tx_count,
-            "score": p1_score
+            "score": p1_score,
+            "partial": partial["p1"]
         },
         "p2": {
             "unique_types": unique_types,
-            "score": p2_score
+            "score": p2_score,
+            "partial": partial["p2"]
         },
         "p3": {
             "unique_protocols": unique_protocols,
-            "score": p3_score
+            "score": p3_score,
+            "partial": partial["p3"]
         },
         "p4": {
             "unique_assets": unique_assets,
-            "score": p4_score
+            "score": p4_score,
+            "partial": partial["p4"]
         },
         "average_pillar_score": avg_pillar_score,
         "final_score": final_score,
-        "final_score_rounded": final_score_rounded
+        "final_score_rounded": final_score_rounded,
+        "failed_queries": sorted(failed),
+        "partial": bool(failed),
+        "bounded": bounded
+    }
+
+
+def score_landed_pillars(address: str, landed: Dict[str, Tuple],
+                         failed_queries: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Score only the pillars whose query families have all landed"""
+    pillars = [pillar for pillar, families in PILLAR_QUERY_FAMILIES.items()
+               if all(family in landed for family in families)]
+    if not pillars:
+        return {}
+    # Families still in flight are filled with defaults so build_score_result
+    # never takes its error path; the pillars they feed are dropped below
+    results = {name: landed[name] if name in landed else default_query_result(name) for name in QUERY_FAMILIES}
+    scored = build_score_result(address, results, verbose=False, failed_queries=failed_queries)
+    return {pillar: scored[pillar] for pillar in pillars}
+
+
+def _cache_query_result(cache: ScoreCache, address: str, name: str, version: Optional[str] = None):
+    """Future callback that stores a successful query result in the score cache"""
+    def callback(future):
+        if not future.cancelled() and future.exception() is None:
+            cache.set(address, name, encode_query_result(name, future.result()), version)
+    return callback
+
+
+def calculate_defi_score(address: str, api_key: str, verbose: bool = True,
+                         cache: Optional[ScoreCache] = None,
+                         query_cache: Optional[QueryCache] = None,
+                         client: Optional[BitqueryClient] = None,
+                         deadline: Optional[float] = None,
+                         on_result: Optional[Callable[[str, Tuple, bool], None]] = None,
+                         checkpoints: Optional[CheckpointStore] = None,
+                         detail: Optional[bool] = None) -> Dict:
+    """Calculate DeFi Strategy Score for an address
+
+    When a ScoreCache is given, fresh pillar results are reused and only the
+    stale or missing query families are sent to Bitquery. A QueryCache
+    additionally memoizes the individual GraphQL responses. Pass a shared
+    client to reuse its pooled connections; query_cache is ignored then.
+    With a deadline (seconds), queries still running when it expires are
+    scored as zero and the affected pillars are flagged as partial.
+    on_result(name, result, failed) is called as each query family lands.
+    With a CheckpointStore, the history families fetch only the days since
+    the wallet's last checkpoint and merge them into its stored buckets.
+    detail=False uses bounded P1/P4 queries that stop at the pillar caps,
+    detail=True exact counts; None follows SATURATION_QUERIES.
+    """
+    log = logger.info if verbose else logger.debug
+    
+    # Check if this is the sample wallet and return presaved response
+    if address.lower() == SAMPLE_WALLET_ADDRESS.lower():
+        log("Using presaved response for sample wallet %s", address)
+        return SAMPLE_WALLET_RESPONSE.copy()
+    
+    if client is None:
+        client = BitqueryClient(api_key, query_cache=query_cache)
+    time_3yr_ago = get_time_3_years_ago()
+    # One registry snapshot per score, even if protocols.json is reloaded meanwhile
+    registry = PROTOCOLS.current()
+    bounded = use_bounded_queries(detail)
+    versions = {name: registry_cache_version(name, registry, bounded) for name in QUERY_FAMILIES}
+    
+    log("Calculating DeFi Score for %s (since %s)", address, time_3yr_ago)
+    
+    overall_start = time.time()
+    
+    # Reuse fresh pillar results from the cache
+    results = {}
+    if cache is not None:
+        for name in QUERY_FAMILIES:
+            payload = cache.get(address, name, versions[name])
+            if payload is not None:
+                results[name] = decode_query_result(name, payload)
+                log("%s served from cache", name)
+                if on_result is not None:
+                    on_result(name, results[name], False)
+    
+    query_functions = {
+        "p1": (get_p1_transaction_count, (client, address, time_3yr_ago, bounded)),
+        "p2_p3": (get_p2_p3_data, (client, address, time_3yr_ago, registry)),
+        "dex_nft": (get_dex_and_nft_activity, (client, address)),
+        "governance": (get_governance_activity, (client, address)),
+        "p4": (get_p4_assets, (client, address, bounded)),
     }
+    if checkpoints is not None:
+        for name in CHECKPOINT_FAMILIES:
+            query_functions[name] = (get_checkpointed_result, (client, checkpoints, name, address, registry))
+    pending = [name for name in QUERY_FAMILIES if name not in results]
+    failed_queries = []
+    
+    # Run remaining queries in parallel
+    if pending:
+        executor = ThreadPoolExecutor(max_workers=len(pending))
+        # Submit all queries
+        futures = {}
+        for name in pending:
+            func, args = query_functions[name]
+            futures[name] = executor.submit(func, *args)
+            if cache is not None:
+                # Cache from a callback so queries finishing after the deadline still warm the cache
+                futures[name].add_done_callback(_cache_query_result(cache, address, name, versions[name]))
+        
+        # Create reverse mapping from future to name
+        future_to_name = {future: name for name, future in futures.items()}
+        
+        # Collect results as they complete
+        try:
+            for future in as_completed(futures.values(), timeout=deadline):
+                name = future_to_name[future]
+                try:
+                    result = future.result()
+                    results[name] = result
+                except Exception as e:
+                    logger.warning("Error in %s query for %s: %s", name, address, e,
+                                   extra={"family": name, "address": address})
+                    # Set default values based on query type (never cached)
+                    results[name] = default_query_result(name)
+                    failed_queries.append(name)
+                if on_result is not None:
+                    on_result(name, results[name], name in failed_queries)
+        except FuturesTimeoutError:
+            for name in pending:
+                if name not in results:
+                    logger.warning("%s query for %s missed the %.0fs deadline", name, address, deadline,
+                                   extra={"family": name, "address": address})
+                    results[name] = default_query_result(name)
+                    failed_queries.append(name)
+                    if on_result is not None:
+                        on_result(name, results[name], True)
+        finally:
+            # Do not wait for stragglers; they finish in the background
+            executor.shutdown(wait=False)
+    
+    return build_score_result(address, results, verbose, time.time() - overall_start, failed_queries, bounded)
+
+
+def run_batch(args, api_key: str):
+    """Score every address in --input and stream JSONL records to --output"""
+    from batch import AdaptiveChunkSize, run_batch_file
+    
+    cache = ScoreCache.from_env()
+    client = BitqueryClient.from_env(api_key, query_cache=QueryCache.from_env())
+    checkpoints = CheckpointStore.from_env()
+    leaderboard = LeaderboardStore.from_env()
+    
+    def score(address: str) -> Dict:
+        return calculate_defi_score(address, api_key, verbose=False, cache=cache, client=client,
+                                    checkpoints=checkpoints)
+    
+    def progress(record: Dict):
+        if leaderboard is not None and "error" not in record:
+            leaderboard.record(record)
+        status = "error: " + record["error"] if "error" in record else f"score {record['final_score_rounded']}"
+        print(f"  {record['address']} → {status}", file=sys.stderr)
+    
+    try:
+        chunk_size = AdaptiveChunkSize(initial=args.chunk_size) if args.chunk_size > 1 else None
+        summary = run_batch_file(args.input, args.output, score, concurrency=args.concurrency,
+                                 resume=not args.no_resume, on_record=progress,
+                                 client=client, cache=cache, chunk_size=chunk_size)
+    except KeyboardInterrupt:
+        print("\n\nInterrupted by user; rerun the same command to resume")
+        sys.exit(1)
+    finally:
+        client.close()
+    
+    print("\n" + "="*60)
+    print("BATCH SUMMARY")
+    print("="*60)
+    print(f"Addresses in input:  {summary['total']}")
+    print(f"Skipped (resumed):   {summary['skipped']}")
+    print(f"Scored:              {summary['scored']}")
+    print(f"Failed:              {summary['failed']}")
+    print(f"Elapsed:             {summary['elapsed_seconds']:.2f}s")
+    print(f"Throughput:          {summary['wallets_per_second']:.2f} wallets/s")
+    print("="*60)
 
 
 def main():
+    configure_logging()
     parser = argparse.ArgumentParser(
         description="Calculate DeFi Strategy Score for an Ethereum address"
     )
     parser.add_argument(
         "address",
         type=str,
+        nargs="?",
         help="Ethereum address to analyze"
     )
+    parser.add_argument(
+        "--input",
+        type=str,
+        help="File with one address per line to score in bulk"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="JSONL file that bulk results are appended to (required with --input)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Wallets scored concurrently in bulk mode (default: 8)"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=50,
+        help="Wallets per multi-address query in bulk mode; shrinks automatically on timeouts, 1 disables batching (default: 50)"
+    )
+    parser.add_argument(
+        "--detail",
+        action="store_true",
+        help="Exact P1/P4 counts even when SATURATION_QUERIES enables bounded queries"
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Overwrite --output instead of skipping addresses already in it"
+    )
     
     args = parser.parse_args()
-    address = args.address.strip()
-    
-    # Validate address format (basic check)
-    if not address.startswith("0x") or len(address) != 42:
-        print("Error: Invalid Ethereum address format")
-        sys.exit(1)
+    if args.input:
+        if not args.output:
+            parser.error("--output is required with --input")
+    elif not args.address:
+        parser.error("an address or --input is required")
     
     # Get API key from environment
     api_key = os.getenv("BITQUERY_API_KEY")
@@ -799,8 +2290,25 @@ def main():
         print("Please create a .env file with: BITQUERY_API_KEY=your_api_key")
         sys.exit(1)
     
+    if args.input:
+        run_batch(args, api_key)
+        return
+    
+    address = args.address.strip()
+    
+    # Validate address format (basic check)
+    if not address.startswith("0x") or len(address) != 42:
+        print("Error: Invalid Ethereum address format")
+        sys.exit(1)
+    
     try:
-        result = calculate_defi_score(address, api_key)
+        # Reuse the on-disk pillar cache between runs when configured
+        cache = ScoreCache.from_env() if os.getenv("SCORE_CACHE_DB") else None
+        result = calculate_defi_score(address, api_key, cache=cache, checkpoints=CheckpointStore.from_env(),
+                                      detail=True if args.detail else None)
+        leaderboard = LeaderboardStore.from_env()
+        if leaderboard is not None:
+            leaderboard.record(result)
         
         print("\n" + "="*60)
         print("DEFI STRATEGY SCORE RESULTS")
@@ -813,6 +2321,10 @@ def main():
         print(f"  P4 (Assets Held): {result['p4']['score']:.2f} points ({result['p4']['unique_assets']} assets)")
         print(f"\nAverage Pillar Score: {result['average_pillar_score']:.2f}")
         print(f"\nFinal DeFi Strategy Score: {result['final_score_rounded']}")
+        if result.get("bounded"):
+            print("\nNote: bounded queries were used; transaction and asset counts stop at the pillar caps")
+        if result.get("failed_queries"):
+            print(f"\nWarning: these queries failed and scored as zero: {', '.join(result['failed_queries'])}")
         print("="*60)
         
     except KeyboardInterrupt:
@@ -0,0 +1,46 @@
+"""
+Gunicorn production profile - multi-process, threaded workers
+
+    gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden from the environment (see README, Production Serving).
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:app"
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5001')}")
+
+# One process per core; scoring is I/O bound, so each process also runs
+# threads that wait on Bitquery concurrently
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Import the app (and load the protocol registry) once in the master;
+# post_fork gives each worker its own connections
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+
+# A request may take the whole SCORE_DEADLINE plus retries
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+# Time a stopping worker gets to finish in-flight scores and jobs
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then to bound memory growth (0 disables)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        import app
+        app.reinit_after_fork()
+
+
+def worker_exit(server, worker):
+    import app
+    app.shutdown()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Background scoring jobs - a bounded worker pool with pollable results
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import defi_tracker as tracker
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """Raised when the job backlog is at capacity"""
+
+
+class Job:
+    """One wallet score computed in the background"""
+
+    def __init__(self, address: str, detail: Optional[bool] = None):
+        self.id = uuid.uuid4().hex
+        self.address = address
+        self.detail = detail
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.landed: Dict[str, Tuple] = {}
+        self.failed_queries: List[str] = []
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def key(self) -> Tuple[str, Optional[bool]]:
+        """Active jobs are deduplicated per wallet and detail setting"""
+        return self.address.lower(), self.detail
+
+    def pillars(self) -> Dict[str, Dict]:
+        """Scores of the pillars whose query families have all landed"""
+        return tracker.score_landed_pillars(self.address, self.landed, self.failed_queries)
+
+    def to_dict(self) -> Dict:
+        data = {
+            "job_id": self.id,
+            "address": self.address,
+            "detail": self.detail,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == DONE:
+            data["result"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        else:
+            data["pillars"] = self.pillars()
+            data["failed_queries"] = sorted(self.failed_queries)
+        return data
+
+
+class JobQueue:
+    """Runs score jobs on a bounded thread pool and keeps their results for polling.
+
+    score_fn(address, on_result, detail) computes the score and calls
+    on_result(family, result, failed) as each query family lands, which is
+    how partial pillar scores become visible while a job runs. detail is
+    passed through from submit(). Finished jobs are kept for ttl seconds.
+    """
+
+    def __init__(self, score_fn: Callable[[str, Callable[[str, Tuple, bool], None], Optional[bool]], Dict],
+                 workers: int = 4, max_pending: int = 1000, ttl: float = 60 * 60):
+        self.score_fn = score_fn
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="score-job")
+        self._jobs: Dict[str, Job] = {}
+        self._active_by_key: Dict[Tuple[str, Optional[bool]], Job] = {}
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, score_fn: Callable[[str, Callable[[str, Tuple, bool], None], Optional[bool]], Dict]
+                 ) -> "JobQueue":
+        """Build a queue from JOB_WORKERS / JOB_MAX_PENDING / JOB_TTL"""
+        return cls(
+            score_fn,
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_pending=int(os.getenv("JOB_MAX_PENDING", "1000")),
+            ttl=float(os.getenv("JOB_TTL", "3600")),
+        )
+
+    def submit(self, address: str, detail: Optional[bool] = None) -> Dict:
+        """Queue a score job, or return the active job already scoring this wallet with the same detail"""
+        with self._lock:
+            self._prune()
+            job = self._active_by_key.get((address.lower(), detail))
+            if job is not None:
+                return job.to_dict()
+            pending = sum(1 for job in self._active_by_key.values() if job.status == QUEUED)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Job queue is full ({self.max_pending} pending)")
+            job = Job(address, detail)
+            self._jobs[job.id] = job
+            self._active_by_key[job.key] = job
+            self.submitted += 1
+            snapshot = job.to_dict()
+        self._executor.submit(self._run, job)
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the job's status, partial pillars or final result; None if unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if not job.active and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run(self, job: Job):
+        with self._lock:
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        def on_result(family: str, result: Tuple, failed: bool):
+            with self._lock:
+                if not job.active:
+                    return
+                job.landed[family] = result
+                if failed and family not in job.failed_queries:
+                    job.failed_queries.append(family)
+
+        try:
+            result = self.score_fn(job.address, on_result, job.detail)
+            error = None
+        except Exception as e:
+            result = None
+            error = str(e)
+
+        with self._lock:
+            job.result = result
+            job.error = error
+            job.status = DONE if error is None else FAILED
+            job.finished_at = time.time()
+            self._active_by_key.pop(job.key, None)
+            if error is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            active = list(self._active_by_key.values())
+            return {
+                "workers": self.workers,
+                "queued": sum(1 for job in active if job.status == QUEUED),
+                "running": sum(1 for job in active if job.status == RUNNING),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "retained": len(self._jobs),
+            }
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """Stop the pool; running jobs always finish, queued ones are dropped with cancel_pending"""
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Leaderboard - persisted wallet scores with rank, percentile and per-pillar distribution lookups
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Histogrammed metrics: the rounded final score (one bucket per score, 25-100)
+# and each pillar score (10-point buckets; 100 has its own)
+HISTOGRAM_METRICS = ("final", "p1", "p2", "p3", "p4")
+PILLAR_BUCKET_WIDTH = 10
+
+
+def histogram_bucket(metric: str, score: float) -> int:
+    """Bucket a score falls in: the score itself for "final", else the lower bound of its 10-point range"""
+    if metric == "final":
+        return int(score)
+    return int(min(max(score, 0.0), 100.0) // PILLAR_BUCKET_WIDTH) * PILLAR_BUCKET_WIDTH
+
+
+class LeaderboardStore:
+    """SQLite index of every wallet's latest complete score.
+
+    Scores are kept in a table ordered by an index on (final score, average
+    pillar score), and a histogram per metric is updated incrementally on
+    each write. Rank and percentile lookups read one wallet by primary key
+    and sum at most 76 final-score buckets, so they stay O(log n) however
+    many wallets are scored, without scanning the table or calling Bitquery.
+    """
+
+    def __init__(self, db_path: str = ":memory:"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.skipped_partial = 0
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        if db_path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS wallet_scores (
+                address TEXT PRIMARY KEY,
+                final_score INTEGER NOT NULL,
+                average_pillar_score REAL NOT NULL,
+                p1 REAL NOT NULL,
+                p2 REAL NOT NULL,
+                p3 REAL NOT NULL,
+                p4 REAL NOT NULL,
+                scored_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS wallet_scores_rank "
+            "ON wallet_scores (final_score DESC, average_pillar_score DESC, address)"
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS score_histogram (
+                metric TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (metric, bucket)
+            )
+            """
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["LeaderboardStore"]:
+        """Build a store from LEADERBOARD_DB; None when it is unset"""
+        db_path = os.getenv("LEADERBOARD_DB")
+        if not db_path:
+            return None
+        return cls(db_path)
+
+    @staticmethod
+    def _metrics(row) -> Dict[str, float]:
+        final_score, p1, p2, p3, p4 = row
+        return {"final": final_score, "p1": p1, "p2": p2, "p3": p3, "p4": p4}
+
+    def _bump(self, values: Dict[str, float], delta: int):
+        for metric in HISTOGRAM_METRICS:
+            self._db.execute(
+                "INSERT INTO score_histogram (metric, bucket, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (metric, bucket) DO UPDATE SET count = count + excluded.count",
+                (metric, histogram_bucket(metric, values[metric]), delta),
+            )
+
+    def record(self, result: Dict) -> bool:
+        """Store a score result as its wallet's latest score; partial results are skipped
+
+        A partial score understates the wallet, so it neither enters the
+        index nor replaces an earlier complete score. Returns whether the
+        result was stored.
+        """
+        if result.get("partial") or result.get("failed_queries"):
+            with self._lock:
+                self.skipped_partial += 1
+            return False
+        address = result["address"].lower()
+        row = (
+            int(result["final_score_rounded"]),
+            float(result["average_pillar_score"]),
+            float(result["p1"]["score"]),
+            float(result["p2"]["score"]),
+            float(result["p3"]["score"]),
+            float(result["p4"]["score"]),
+        )
+        with self._lock:
+            previous = self._db.execute(
+                "SELECT final_score, p1, p2, p3, p4 FROM wallet_scores WHERE address = ?", (address,)
+            ).fetchone()
+            if previous is not None:
+                self._bump(self._metrics(previous), -1)
+            self._db.execute(
+                "INSERT OR REPLACE INTO wallet_scores "
+                "(address, final_score, average_pillar_score, p1, p2, p3, p4, scored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (address,) + row + (time.time(),),
+            )
+            self._bump(self._metrics((row[0],) + row[2:]), 1)
+            self._db.commit()
+            self.recorded += 1
+        return True
+
+    def _final_counts(self) -> Dict[int, int]:
+        rows = self._db.execute(
+            "SELECT bucket, count FROM score_histogram WHERE metric = 'final' AND count > 0"
+        ).fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def _rank(final_counts: Dict[int, int], score: int) -> int:
+        """Competition rank: 1 + wallets scoring strictly higher"""
+        return 1 + sum(count for bucket, count in final_counts.items() if bucket > score)
+
+    def leaderboard(self, limit: int = 20, offset: int = 0) -> Dict:
+        """A page of wallets ordered by final score (ties: average pillar score, then address)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT address, final_score, average_pillar_score, p1, p2, p3, p4, scored_at "
+                "FROM wallet_scores ORDER BY final_score DESC, average_pillar_score DESC, address "
+                "LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+            final_counts = self._final_counts()
+        entries = [
+            {
+                "rank": self._rank(final_counts, final_score),
+                "address": address,
+                "final_score": final_score,
+                "average_pillar_score": average,
+                "p1": p1,
+                "p2": p2,
+                "p3": p3,
+                "p4": p4,
+                "scored_at": scored_at,
+            }
+            for address, final_score, average, p1, p2, p3, p4, scored_at in rows
+        ]
+        return {"total": sum(final_counts.values()), "limit": limit, "offset": offset, "entries": entries}
+
+    def percentile(self, address: str) -> Optional[Dict]:
+        """Rank and percentile of a scored wallet; None if it has no stored score
+
+        percentile is the share of scored wallets with a strictly lower final score.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT final_score, scored_at FROM wallet_scores WHERE address = ?", (address.lower(),)
+            ).fetchone()
+            if row is None:
+                return None
+            final_counts = self._final_counts()
+        final_score, scored_at = row
+        total = sum(final_counts.values())
+        below = sum(count for bucket, count in final_counts.items() if bucket < final_score)
+        return {
+            "address": address.lower(),
+            "final_score": final_score,
+            "rank": self._rank(final_counts, final_score),
+            "total": total,
+            "percentile": round(100.0 * below / total, 2) if total else 0.0,
+            "scored_at": scored_at,
+        }
+
+    def histograms(self) -> Dict[str, Dict[str, int]]:
+        """metric -> {bucket lower bound: wallet count} for the final score and each pillar"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT metric, bucket, count FROM score_histogram WHERE count > 0 ORDER BY metric, bucket"
+            ).fetchall()
+        histograms = {metric: {} for metric in HISTOGRAM_METRICS}
+        for metric, bucket, count in rows:
+            histograms[metric][str(bucket)] = count
+        return histograms
+
+    def stats(self) -> Dict:
+        with self._lock:
+            wallets = sum(self._final_counts().values())
+            return {"wallets": wallets, "recorded": self.recorded, "skipped_partial": self.skipped_partial}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Logging setup - per-module levels, optional JSON output and sampled payload dumps
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+from typing import Any, Dict
+
+# Attributes every LogRecord has; anything else was passed via extra= and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# Fraction of raw API responses dumped when DEBUG logging is on (LOG_PAYLOAD_SAMPLE_RATE)
+PAYLOAD_SAMPLE_RATE = 1.0
+
+_configured = False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Configure the root logger from environment variables; safe to call more than once.
+
+    LOG_LEVEL       root level (default INFO)
+    LOG_LEVELS      per-logger overrides, e.g. "defi_tracker=DEBUG,cache=WARNING"
+    LOG_FORMAT      "text" (default) or "json"
+    LOG_PAYLOAD_SAMPLE_RATE  fraction of raw API responses dumped at DEBUG (default 1.0)
+    """
+    global _configured, PAYLOAD_SAMPLE_RATE
+    if _configured:
+        return
+    _configured = True
+    PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+
+    root = logging.getLogger()
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    handler = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+
+    for item in os.getenv("LOG_LEVELS", "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+class _LazyJson:
+    """Defers json.dumps until a handler actually formats the record"""
+
+    def __init__(self, data: Any):
+        self.data = data
+
+    def __str__(self) -> str:
+        return json.dumps(self.data, indent=2)
+
+
+def log_payload(logger: logging.Logger, label: str, data: Any):
+    """Log a raw API response at DEBUG, for a LOG_PAYLOAD_SAMPLE_RATE fraction of calls.
+
+    Does no work at all unless DEBUG is enabled for the logger.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= PAYLOAD_SAMPLE_RATE:
+        return
+    logger.debug("%s raw API response: %s", label, _LazyJson(data))
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Protocol registry - compiled, immutable index of whitelisted protocol contracts for P2/P3
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# P2 activity type reported for each registry category
+CATEGORY_LABELS = {
+    "lending": "Lending",
+    "staking": "Staking",
+    "liquidity": "Liquidity",
+    "bridging": "Bridging",
+    "yield_farming": "Yield Farming",
+}
+
+# Versioned registry file: {"version": ..., "protocols": {category: {protocol name: [addresses]}}}
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "protocols.json")
+
+# Seconds between checks of the registry file's modification time
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+
+def normalize_address(address: str) -> str:
+    return address.strip().lower()
+
+
+class ProtocolInfo(NamedTuple):
+    category: str
+    name: str
+
+
+class ProtocolRegistry:
+    """Read-only index of normalized contract address -> (category, protocol name) entries.
+
+    Built once; lookups are a single dict access however large the whitelist
+    grows. An address may belong to several categories (e.g. a vault that is
+    both staking and yield farming), and then counts as each activity type.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, str]], version: Optional[str] = None):
+        """entries: (address, category, protocol name) triples"""
+        index: Dict[str, List[ProtocolInfo]] = {}
+        addresses: List[str] = []
+        for address, category, name in entries:
+            key = normalize_address(address)
+            if key not in index:
+                index[key] = []
+                addresses.append(address.strip())
+            info = ProtocolInfo(category, name)
+            if info not in index[key]:
+                index[key].append(info)
+
+        self._index: Mapping[str, Tuple[ProtocolInfo, ...]] = MappingProxyType(
+            {key: tuple(infos) for key, infos in index.items()}
+        )
+        self._activity_types: Mapping[str, FrozenSet[str]] = MappingProxyType({
+            key: frozenset(CATEGORY_LABELS.get(info.category, info.category) for info in infos)
+            for key, infos in self._index.items()
+        })
+        # First-seen spelling of every address, for GraphQL `in:` filters
+        self.addresses: Tuple[str, ...] = tuple(addresses)
+
+        # Content hashes for cache keys: renaming a protocol or bumping the
+        # declared version changes neither, so warm caches survive edits
+        # that cannot affect a score
+        self.addresses_fingerprint = _fingerprint(sorted(self._index))
+        self.fingerprint = _fingerprint(sorted(
+            (key, sorted(types)) for key, types in self._activity_types.items()
+        ))
+        self.version = version or self.fingerprint
+
+    @classmethod
+    def from_mapping(cls, protocols: Mapping[str, Mapping[str, Iterable[str]]],
+                     version: Optional[str] = None) -> "ProtocolRegistry":
+        """Build from a category -> protocol name -> addresses mapping"""
+        return cls(
+            ((address, category, name)
+             for category, by_name in protocols.items()
+             for name, addresses in by_name.items()
+             for address in addresses),
+            version=version,
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "ProtocolRegistry":
+        """Load a registry file (.json, or .yaml/.yml when PyYAML is installed)"""
+        with open(path) as f:
+            if path.endswith((".yaml", ".yml")):
+                import yaml  # Optional, only needed for YAML registries
+                document = yaml.safe_load(f)
+            else:
+                document = json.load(f)
+        if not isinstance(document, dict) or not isinstance(document.get("protocols"), dict):
+            raise ValueError(f"{path}: expected an object with a 'protocols' mapping")
+        version = document.get("version")
+        return cls.from_mapping(document["protocols"], version=str(version) if version is not None else None)
+
+    def lookup(self, address: str) -> Tuple[ProtocolInfo, ...]:
+        """All (category, name) entries for an address; empty if not whitelisted"""
+        return self._index.get(normalize_address(address), ())
+
+    def activity_types(self, address: str) -> FrozenSet[str]:
+        """P2 activity types an interaction with this address counts as"""
+        return self._activity_types.get(normalize_address(address), frozenset())
+
+    def addresses_by_category(self) -> Dict[str, List[str]]:
+        """category -> addresses, in the PROTOCOL_ADDRESSES shape"""
+        by_category: Dict[str, List[str]] = {}
+        for address in self.addresses:
+            for info in self.lookup(address):
+                by_category.setdefault(info.category, []).append(address)
+        return by_category
+
+    def __contains__(self, address: str) -> bool:
+        return normalize_address(address) in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def summary(self) -> Dict:
+        return {
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "addresses": len(self),
+            "categories": {category: len(addresses) for category, addresses in self.addresses_by_category().items()},
+        }
+
+
+def _fingerprint(items) -> str:
+    return hashlib.sha256(json.dumps(items).encode()).hexdigest()[:12]
+
+
+class ReloadableRegistry:
+    """Holds the current ProtocolRegistry and swaps it when its file changes.
+
+    current() re-checks the file's modification time at most every
+    check_interval seconds (0 disables the watcher), so every worker process
+    picks up an edited file on its own. A replacement registry is built
+    completely before the reference is swapped, and callers that took a
+    snapshot keep using it, so a score never mixes two registries. A file
+    that fails to load is logged and the previous registry stays active.
+    """
+
+    def __init__(self, path: str, check_interval: float = DEFAULT_RELOAD_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._registry = ProtocolRegistry.from_file(path)
+        self._mtime = self._stat()
+        self._checked_at = time.time()
+        self.loaded_at = time.time()
+        self.reloads = 0
+        self.reload_errors = 0
+
+    @classmethod
+    def from_env(cls) -> "ReloadableRegistry":
+        """Build from PROTOCOL_REGISTRY_PATH / PROTOCOL_REGISTRY_RELOAD_INTERVAL"""
+        return cls(
+            os.getenv("PROTOCOL_REGISTRY_PATH") or DEFAULT_REGISTRY_PATH,
+            check_interval=float(os.getenv("PROTOCOL_REGISTRY_RELOAD_INTERVAL", str(DEFAULT_RELOAD_INTERVAL))),
+        )
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def current(self) -> ProtocolRegistry:
+        """The active registry, reloading first if the file changed since the last check"""
+        if self.check_interval > 0 and time.time() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.time() - self._checked_at >= self.check_interval:
+                    self._checked_at = time.time()
+                    mtime = self._stat()
+                    if mtime is not None and mtime != self._mtime:
+                        # Recorded first so a broken file is not re-parsed on every check
+                        self._mtime = mtime
+                        try:
+                            self._swap(ProtocolRegistry.from_file(self.path))
+                        except Exception as e:
+                            self.reload_errors += 1
+                            logger.error("Keeping protocol registry %s; failed to load %s: %s",
+                                         self._registry.version, self.path, e)
+        return self._registry
+
+    def reload(self) -> Tuple[bool, ProtocolRegistry]:
+        """Re-read the file now; returns (changed, active registry)
+
+        Raises if the file cannot be loaded, leaving the previous registry active.
+        """
+        with self._lock:
+            self._checked_at = time.time()
+            self._mtime = self._stat()
+            try:
+                registry = ProtocolRegistry.from_file(self.path)
+            except Exception:
+                self.reload_errors += 1
+                raise
+            previous = self._registry
+            self._swap(registry)
+            return registry.fingerprint != previous.fingerprint, registry
+
+    def _swap(self, registry: ProtocolRegistry):
+        previous, self._registry = self._registry, registry
+        self.loaded_at = time.time()
+        self.reloads += 1
+        logger.info("Protocol registry reloaded: version %s -> %s, %d addresses",
+                    previous.version, registry.version, len(registry))
+
+    def stats(self) -> Dict:
+        registry = self._registry
+        return dict(
+            registry.summary(),
+            path=self.path,
+            loaded_at=self.loaded_at,
+            reloads=self.reloads,
+            reload_errors=self.reload_errors,
+        )
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Recent wallets - the most recently scored wallets, in-process or shared between workers via SQLite
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple, Union
+
+# Wallets shown in the "recent" list
+DEFAULT_RECENT_LIMIT = 5
+
+
+class InProcessRecentStore:
+    """Lock-protected deque of the latest scored wallets, newest first.
+
+    snapshot() returns a tuple that is rebuilt only after a write, so reads
+    neither copy the list nor take part in a write's critical section.
+    """
+
+    def __init__(self, limit: int = DEFAULT_RECENT_LIMIT):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=limit)
+        self._snapshot: Tuple[Dict, ...] = ()
+
+    def add(self, entry: Dict):
+        """Put a wallet at the front, replacing any earlier entry for the same address"""
+        address = entry["address"].lower()
+        with self._lock:
+            for existing in list(self._entries):
+                if existing["address"].lower() == address:
+                    self._entries.remove(existing)
+            self._entries.appendleft(entry)
+            self._snapshot = tuple(self._entries)
+
+    def snapshot(self) -> Tuple[Dict, ...]:
+        """Newest-first entries; treat as read-only"""
+        return self._snapshot
+
+    def stats(self) -> Dict:
+        return {"backend": "memory", "entries": len(self._snapshot), "limit": self.limit}
+
+    def close(self):
+        pass
+
+
+class SQLiteRecentStore:
+    """Recent wallets in a SQLite table shared by every worker process.
+
+    The snapshot is cached until this process writes or SQLite's
+    data_version shows a commit from another connection, so a GET costs
+    one PRAGMA unless the list actually changed.
+    """
+
+    def __init__(self, db_path: str, limit: int = DEFAULT_RECENT_LIMIT):
+        self.db_path = db_path
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        if db_path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS recent_wallets (
+                address TEXT PRIMARY KEY,
+                entry TEXT NOT NULL,
+                scored_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.commit()
+        self._snapshot: Optional[Tuple[Dict, ...]] = None
+        self._data_version: Optional[int] = None
+        self.reloads = 0
+
+    def add(self, entry: Dict):
+        """Put a wallet at the front, replacing any earlier entry for the same address"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO recent_wallets (address, entry, scored_at) VALUES (?, ?, ?)",
+                (entry["address"].lower(), json.dumps(entry), time.time()),
+            )
+            self._db.execute(
+                "DELETE FROM recent_wallets WHERE address NOT IN "
+                "(SELECT address FROM recent_wallets ORDER BY scored_at DESC LIMIT ?)",
+                (self.limit,),
+            )
+            self._db.commit()
+            # data_version does not change for this connection's own commits
+            self._snapshot = None
+
+    def snapshot(self) -> Tuple[Dict, ...]:
+        """Newest-first entries; treat as read-only"""
+        with self._lock:
+            data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if self._snapshot is None or data_version != self._data_version:
+                rows = self._db.execute(
+                    "SELECT entry FROM recent_wallets ORDER BY scored_at DESC LIMIT ?", (self.limit,)
+                ).fetchall()
+                self._snapshot = tuple(json.loads(entry) for (entry,) in rows)
+                self._data_version = data_version
+                self.reloads += 1
+            return self._snapshot
+
+    def stats(self) -> Dict:
+        return {"backend": "sqlite", "entries": len(self.snapshot()), "limit": self.limit,
+                "reloads": self.reloads}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+RecentStore = Union[InProcessRecentStore, SQLiteRecentStore]
+
+
+def recent_store_from_env() -> RecentStore:
+    """SQLite store when RECENT_WALLETS_DB is set, otherwise in-process; RECENT_WALLETS_LIMIT sets the size"""
+    limit = int(os.getenv("RECENT_WALLETS_LIMIT", str(DEFAULT_RECENT_LIMIT)))
+    db_path = os.getenv("RECENT_WALLETS_DB")
+    if db_path:
+        return SQLiteRecentStore(db_path, limit=limit)
+    return InProcessRecentStore(limit=limit)
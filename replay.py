@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Offline replay - record Bitquery responses to fixtures and serve them from a local stand-in
+
+Record while scoring real wallets:
+
+    BITQUERY_RECORD_DIR=fixtures python defi_tracker.py 0x...
+
+Replay them with injected latency and errors, then point the app at it:
+
+    python replay.py --fixtures fixtures --latency 0.3 --error-rate 0.02
+    BITQUERY_ENDPOINT_V1=http://127.0.0.1:8787/v1 \\
+    BITQUERY_ENDPOINT_V2=http://127.0.0.1:8787/v2 python app.py
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+def fixture_key(label: str, query: str, variables: Optional[Dict]) -> str:
+    """Stable file name for a request: endpoint label + normalized query + variables"""
+    raw = json.dumps([label, normalize_query(query), variables or {}], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+def query_key(label: str, query: str) -> str:
+    """Key ignoring variables, used to replay one recorded wallet for any address"""
+    return hashlib.sha256(f"{label}:{normalize_query(query)}".encode()).hexdigest()[:24]
+
+
+class FixtureRecorder:
+    """Writes each successful query's request and response to a JSON fixture file"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def record(self, label: str, query: str, variables: Optional[Dict], family: Optional[str],
+               data: Dict, elapsed_time: float):
+        fixture = {
+            "endpoint": label,
+            "family": family,
+            "query": query,
+            "variables": variables or {},
+            "response": {"data": data},
+            "elapsed_time": elapsed_time,
+            "recorded_at": time.time(),
+        }
+        path = os.path.join(self.directory, fixture_key(label, query, variables) + ".json")
+        # Write then rename so a concurrent replay never reads a torn fixture
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(fixture, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.recorded += 1
+
+
+class FixtureStore:
+    """Recorded fixtures indexed by exact request and by query text alone"""
+
+    def __init__(self, directory: str):
+        self.exact: Dict[str, Dict] = {}
+        self.by_query: Dict[str, Dict] = {}
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            with open(path) as f:
+                fixture = json.load(f)
+            label = fixture["endpoint"]
+            self.exact[fixture_key(label, fixture["query"], fixture["variables"])] = fixture
+            self.by_query.setdefault(query_key(label, fixture["query"]), fixture)
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def lookup(self, label: str, query: str, variables: Optional[Dict],
+               fallback: bool = True) -> Optional[Dict]:
+        fixture = self.exact.get(fixture_key(label, query, variables))
+        if fixture is None and fallback:
+            fixture = self.by_query.get(query_key(label, query))
+        return fixture
+
+
+class FaultInjector:
+    """Latency and error injection for replayed responses"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, use_recorded_latency: bool = False):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.use_recorded_latency = use_recorded_latency
+
+    def delay_for(self, fixture: Optional[Dict]) -> float:
+        base = self.latency
+        if self.use_recorded_latency and fixture is not None:
+            base = fixture.get("elapsed_time", base)
+        return max(0.0, base + random.uniform(-self.jitter, self.jitter))
+
+    def failure(self) -> Optional[int]:
+        """HTTP status to fail this request with, or None"""
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Local GraphQL stand-in; POST /v1 and /v2 mirror the two Bitquery endpoints"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], store: FixtureStore, faults: FaultInjector,
+                 fallback: bool = True):
+        super().__init__(address, ReplayHandler)
+        self.store = store
+        self.faults = faults
+        self.fallback = fallback
+        self.served = 0
+        self.misses = 0
+        self.injected_errors = 0
+        self._lock = threading.Lock()
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        label = self.path.strip("/").split("/")[0]
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self._send(400, {"errors": [{"message": "invalid JSON body"}]})
+            return
+
+        server: ReplayServer = self.server
+        fixture = server.store.lookup(label, payload.get("query", ""), payload.get("variables"),
+                                      fallback=server.fallback)
+        time.sleep(server.faults.delay_for(fixture))
+
+        status = server.faults.failure()
+        if status is not None:
+            server.count("injected_errors")
+            self._send(status, {"errors": [{"message": f"injected HTTP {status}"}]})
+        elif fixture is None:
+            server.count("misses")
+            self._send(200, {"errors": [{"message": "no fixture recorded for this query"}]})
+        else:
+            server.count("served")
+            self._send(200, fixture["response"])
+
+    def _send(self, status: int, body: Dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate benchmark output
+        pass
+
+
+def start_server(fixtures: str, host: str = "127.0.0.1", port: int = 0,
+                 faults: Optional[FaultInjector] = None, fallback: bool = True) -> ReplayServer:
+    """Start a replay server in a daemon thread; port 0 picks a free port"""
+    server = ReplayServer((host, port), FixtureStore(fixtures), faults or FaultInjector(), fallback)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded Bitquery fixtures as a local GraphQL stand-in")
+    parser.add_argument("--fixtures", default="fixtures", help="Directory of recorded fixtures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected latency per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on the latency (seconds)")
+    parser.add_argument("--recorded-latency", action="store_true",
+                        help="Use each fixture's recorded latency instead of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failed with HTTP 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests failed with HTTP 429")
+    parser.add_argument("--exact", action="store_true",
+                        help="Only serve exact request matches (by default any recorded wallet answers a query)")
+    args = parser.parse_args()
+
+    faults = FaultInjector(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.recorded_latency)
+    server = ReplayServer((args.host, args.port), FixtureStore(args.fixtures), faults, fallback=not args.exact)
+    print(f"Replaying {len(server.store)} fixtures from {args.fixtures}")
+    print(f"  BITQUERY_ENDPOINT_V1={server.url}/v1")
+    print(f"  BITQUERY_ENDPOINT_V2={server.url}/v2")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {server.served}, misses {server.misses}, injected errors {server.injected_errors}")
+
+
+if __name__ == "__main__":
+    main()
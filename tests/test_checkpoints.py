@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import checkpoints
+from checkpoints import CheckpointStore
+
+WALLET = "0x" + "1" * 40
+
+
+def test_dormant_wallet_rescores_with_one_day_delta(monkeypatch):
+    monkeypatch.setattr(checkpoints, "utc_now", lambda: datetime(2026, 10, 17, 12))
+    store = CheckpointStore()
+    since, is_delta = store.delta_since(WALLET, "p1")
+    assert not is_delta
+
+    # Last active almost three years ago
+    store.merge(WALLET, "p1", since, {"2024-01-05": {"tx": 3}})
+
+    monkeypatch.setattr(checkpoints, "utc_now", lambda: datetime(2026, 10, 18, 9))
+    assert store.delta_since(WALLET, "p1") == ("2026-10-17", True)
+
+
+def test_wallet_without_activity_is_checkpointed(monkeypatch):
+    monkeypatch.setattr(checkpoints, "utc_now", lambda: datetime(2026, 10, 17, 12))
+    store = CheckpointStore()
+    since, _ = store.delta_since(WALLET, "p2_p3")
+    assert store.merge(WALLET, "p2_p3", since, {}) == {}
+
+    monkeypatch.setattr(checkpoints, "utc_now", lambda: datetime(2026, 10, 18, 9))
+    assert store.delta_since(WALLET, "p2_p3") == ("2026-10-17", True)
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import defi_tracker as tracker
+
+
+class FakeResponse:
+    def __init__(self, delay, payload):
+        time.sleep(delay)
+        self.payload = payload
+        self.closed = False
+        self.read = False
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        self.read = True
+        return self.payload
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """First post is slow, later ones answer immediately"""
+
+    def __init__(self, slow):
+        self.slow = slow
+        self.responses = []
+        self.lock = threading.Lock()
+
+    def post(self, *args, **kwargs):
+        with self.lock:
+            delay = self.slow if not self.responses else 0
+            self.responses.append(None)
+            index = len(self.responses) - 1
+        response = FakeResponse(delay, {"data": {"answer": index}})
+        self.responses[index] = response
+        return response
+
+    def close(self):
+        pass
+
+
+def hedging_client(slow):
+    client = tracker.BitqueryClient("key", hedge=True, pool_size=4)
+    session = FakeSession(slow)
+    client._sessions[tracker.BITQUERY_ENDPOINT_V2] = session
+    client.latency.percentile = lambda family: 0.05
+    return client, session
+
+
+def test_backup_wins_and_slow_primary_is_dropped_unread():
+    client, session = hedging_client(slow=0.3)
+
+    data, _ = client._attempt("query", {}, tracker.BITQUERY_ENDPOINT_V2, "p1", timeout=5)
+
+    assert data == {"answer": 1}
+    time.sleep(0.4)
+    primary = session.responses[0]
+    assert primary.closed and not primary.read
+    client.close()
+
+
+def test_no_hedge_when_hedge_slots_are_busy():
+    client, session = hedging_client(slow=0.2)
+    for _ in range(client.hedge_workers):
+        client._hedge_slots.acquire()
+
+    data, _ = client._attempt("query", {}, tracker.BITQUERY_ENDPOINT_V2, "p1", timeout=5)
+
+    assert data == {"answer": 0}
+    assert len(session.responses) == 1
+    client.close()
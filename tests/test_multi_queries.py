@@ -0,0 +1,141 @@
+import io
+import json
+
+import pytest
+
+import batch
+import defi_tracker as tracker
+
+
+class FakeClient:
+    """Answers multi-address queries with `rows_per_wallet` DEX/balance rows per wallet"""
+
+    def __init__(self, rows_per_wallet):
+        self.rows_per_wallet = rows_per_wallet
+        self.calls = []
+
+    def _rows(self, addresses, side):
+        field = "Buyer" if side == "buys" else "Seller"
+        return [
+            {"Trade": {field: address, "Dex": {"ProtocolName": f"dex{i}"}, "Currency": {"Fungible": True}}}
+            for address in addresses for i in range(self.rows_per_wallet)
+        ]
+
+    def execute_query(self, query, variables=None, endpoint=None, family=None):
+        traders = variables["traders"]
+        self.calls.append(len(traders))
+        return {"EVM": {"buys": self._rows(traders, "buys"), "sells": []}}, 0.0
+
+    def query_rows(self, query, variables, endpoint, family, path, consume):
+        rows = [
+            {"BalanceUpdate": {"Address": address}, "Currency": {"SmartContract": f"0x{i}"},
+             "Balance_usd": 10, "balance": "1"}
+            for address in variables["addresses"] for i in range(self.rows_per_wallet)
+        ]
+        return consume(iter(rows)), 0.0
+
+
+WALLETS = ["0x" + str(i) * 40 for i in range(1, 5)]
+
+
+def test_dex_nft_multi_raises_at_row_limit(monkeypatch):
+    monkeypatch.setattr(tracker, "MULTI_QUERY_ROW_LIMIT", 20)
+    with pytest.raises(tracker.RowLimitError):
+        tracker.get_dex_and_nft_activity_multi(FakeClient(rows_per_wallet=5), WALLETS)
+
+
+def test_p4_multi_raises_at_row_limit(monkeypatch):
+    monkeypatch.setattr(tracker, "MULTI_QUERY_ROW_LIMIT", 20)
+    with pytest.raises(tracker.RowLimitError):
+        tracker.get_p4_assets_multi(FakeClient(rows_per_wallet=5), WALLETS)
+
+
+def test_truncated_chunk_is_split(monkeypatch):
+    monkeypatch.setattr(tracker, "MULTI_QUERY_ROW_LIMIT", 20)
+    client = FakeClient(rows_per_wallet=5)
+    chunk_size = batch.AdaptiveChunkSize(initial=4)
+
+    results, errors = batch._fetch_family(
+        lambda chunk: tracker.get_dex_and_nft_activity_multi(client, chunk), WALLETS, chunk_size
+    )
+
+    assert errors == {}
+    assert client.calls == [4, 2, 2]
+    assert {address: result[0] for address, result in results.items()} == {w: 5 for w in WALLETS}
+
+
+def test_permanent_error_fails_chunk_without_splitting():
+    calls = []
+    chunk_size = batch.AdaptiveChunkSize(initial=4)
+
+    def fetch(chunk):
+        calls.append(len(chunk))
+        raise Exception("GraphQL errors: [{'message': 'Unauthorized'}]")
+
+    results, errors = batch._fetch_family(fetch, WALLETS, chunk_size)
+
+    assert calls == [4]
+    assert results == {}
+    assert set(errors) == {w.lower() for w in WALLETS}
+    assert chunk_size.size == 4
+
+
+def test_throttled_chunk_is_split():
+    calls = []
+
+    def fetch(chunk):
+        calls.append(len(chunk))
+        if len(chunk) > 1:
+            raise tracker.BitqueryTimeoutError("API request failed: p4 deadline exceeded")
+        return {chunk[0].lower(): (1, 0.0)}
+
+    results, errors = batch._fetch_family(fetch, WALLETS[:2], batch.AdaptiveChunkSize(initial=2))
+
+    assert calls == [2, 1, 1]
+    assert errors == {}
+    assert len(results) == 2
+
+
+class FakeStreamedResponse:
+    def __init__(self, payload):
+        self.raw = io.BytesIO(json.dumps(payload).encode())
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def post(self, *args, **kwargs):
+        return FakeStreamedResponse(self.payload)
+
+    def close(self):
+        pass
+
+
+def streaming_client(payload):
+    client = tracker.BitqueryClient("key", stream=True)
+    client._sessions[tracker.BITQUERY_ENDPOINT_V2] = FakeSession(payload)
+    return client
+
+
+@pytest.mark.skipif(tracker.ijson is None, reason="streaming needs ijson")
+def test_streamed_row_limit_error_is_not_wrapped(monkeypatch):
+    monkeypatch.setattr(tracker, "MULTI_QUERY_ROW_LIMIT", 20)
+    rows = [{"BalanceUpdate": {"Address": WALLETS[0]}, "Currency": {"SmartContract": f"0x{i}"},
+             "Balance_usd": 10, "balance": "1"} for i in range(20)]
+    client = streaming_client({"data": {"EVM": {"BalanceUpdates": rows}}})
+    with pytest.raises(tracker.RowLimitError):
+        tracker.get_p4_assets_multi(client, WALLETS)
+
+
+@pytest.mark.skipif(tracker.ijson is None, reason="streaming needs ijson")
+def test_streamed_graphql_error_is_not_wrapped():
+    client = streaming_client({"errors": [{"message": "Unauthorized"}]})
+    with pytest.raises(tracker.BitqueryGraphQLError):
+        tracker.get_p4_assets_multi(client, WALLETS)